@@ -0,0 +1,2 @@
+# File: benchmarks/__init__.py
+# Este arquivo torna a pasta "benchmarks" um pacote Python.
@@ -0,0 +1,57 @@
+# File: benchmarks/compare.py
+"""
+Compara dois resultados de `benchmarks.run` (ex.: commit base x atual) e
+aponta regressões no tempo mediano por operação.
+
+Uso:
+    python -m benchmarks.compare base.json atual.json [--threshold 10]
+
+Sai com código 1 se algum caso ficar mais lento que `threshold` por cento.
+"""
+import argparse
+import json
+import sys
+
+
+def load(path: str) -> dict:
+    with open(path, "r", encoding="utf8") as f:
+        return json.load(f)
+
+
+def compare(base: dict, current: dict, threshold: float) -> tuple[list[str], bool]:
+    lines = []
+    regressed = False
+    base_results = base["results"]
+    for name, result in current["results"].items():
+        if name not in base_results:
+            lines.append(f"  {name:<45} {result['p50_us']:>12.2f} µs   (novo)")
+            continue
+        old = base_results[name]["p50_us"]
+        new = result["p50_us"]
+        change = (new - old) / old * 100 if old else 0.0
+        flag = ""
+        if change > threshold:
+            flag = "  <-- regressão"
+            regressed = True
+        elif change < -threshold:
+            flag = "  (melhora)"
+        lines.append(f"  {name:<45} {old:>12.2f} -> {new:>12.2f} µs  {change:+7.1f}%{flag}")
+    return lines, regressed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compara dois resultados de benchmark")
+    parser.add_argument("base")
+    parser.add_argument("current")
+    parser.add_argument("--threshold", type=float, default=10.0, help="Variação tolerada (%%) do p50")
+    args = parser.parse_args()
+
+    base, current = load(args.base), load(args.current)
+    print(f"base: {base['meta'].get('commit')}  atual: {current['meta'].get('commit')}  (p50 por operação)")
+    lines, regressed = compare(base, current, args.threshold)
+    print("\n".join(lines))
+    sys.exit(1 if regressed else 0)
+
+
+if __name__ == "__main__":
+    main()
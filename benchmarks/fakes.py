@@ -0,0 +1,465 @@
+# File: benchmarks/fakes.py
+"""
+Dublês do Discord e dos backends usados pelos benchmarks: interações, guilds,
+canais e clientes de voz falsos, além de um motor de extração e um cliente do
+Spotify que respondem com fixtures gravadas. Nada aqui acessa a rede nem
+inicia o FFmpeg.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import base64
+import copy
+import hashlib
+import itertools
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+import discord
+
+from services import match_service, rate_governor, spotify_service, youtube_service
+from services.match_service import MatchIndex, TrackMatcher
+from services.resource_governor import ResourceGovernor, get_resource_governor, set_resource_governor
+from services.spotify_service import SpotifyClient
+from utils.cache import SongInfoCache, get_song_cache, normalize_key, set_song_cache
+from utils.guild_player import GuildPlayer
+from utils.player_store import PlayerStore, get_player_store, set_player_store
+from utils.track_index import TrackIndex, get_track_index, set_track_index
+from utils.track import Track
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+# Um quadro Opus de 20 ms (o conteúdo não importa para o cliente de voz falso)
+OPUS_FRAME = b"\xfc\xff\xfe" + bytes(157)
+FRAME_SECONDS = 0.02
+
+
+def load_fixture(name: str) -> dict:
+    with open(os.path.join(FIXTURES_DIR, f"{name}.json"), "r", encoding="utf8") as f:
+        return json.load(f)
+
+
+def fake_id(text: str, length: int = 11) -> str:
+    """ID estável no formato do YouTube/Spotify derivado de um texto."""
+    digest = base64.urlsafe_b64encode(hashlib.sha1(text.encode()).digest()).decode()
+    return digest.replace("=", "")[:length]
+
+
+# ---------------------------------------------------------------------- #
+# Backends
+# ---------------------------------------------------------------------- #
+class FixtureExtractionEngine:
+    """
+    Substitui o `ExtractionEngine`: responde como o yt-dlp responderia,
+    usando as fixtures gravadas. Links de vídeo devolvem o próprio vídeo,
+    termos de busca uma lista com um vídeo (ID derivado do termo) e buscas
+    "flat" (`ytsearchN:`) a lista de candidatos. `latency` simula o tempo de
+    extração e `duration` substitui a duração dos vídeos (faixas curtas
+    aceleram os testes de carga).
+    """
+
+    def __init__(self, latency: float = 0.0, duration: int | None = None):
+        self.fixtures = load_fixture("youtube")
+        self.latency = latency
+        self.calls = 0
+        if duration is not None:
+            self.fixtures["video"]["duration"] = duration
+
+    async def extract(self, query: str, params: dict | None = None, timeout: float | None = None) -> dict:
+        self.calls += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        if query.startswith("ytsearch") and params:
+            return {"entries": copy.deepcopy(self.fixtures["search"])}
+        key = normalize_key(query)
+        video_id = key[3:] if key.startswith("yt:") else fake_id(query)
+        video = copy.deepcopy(self.fixtures["video"])
+        video.update(id=video_id, webpage_url=f"https://www.youtube.com/watch?v={video_id}")
+        video["url"] += f"&id={video_id}"
+        return video if key.startswith("yt:") else {"entries": [video]}
+
+    async def close(self):
+        pass
+
+    def stats(self) -> dict:
+        return {"workers": 0, "queue_depth": 0, "in_flight": 0, "completed": self.calls, "failed": 0,
+                "timeouts": 0, "recycles": 0, "wait_p50": 0.0, "wait_p95": 0.0, "run_p50": 0.0, "run_p95": 0.0}
+
+
+class FixtureSpotifyClient(SpotifyClient):
+    """Cliente do Spotify cujas requisições são respondidas pelas fixtures."""
+
+    def __init__(self, latency: float = 0.0):
+        super().__init__("benchmark", "benchmark")
+        self.fixtures = load_fixture("spotify")
+        self.latency = latency
+
+    def _fixture_track(self, track_id: str) -> dict:
+        track = copy.deepcopy(self.fixtures["track"])
+        track["id"] = track_id
+        return track
+
+    async def _request(self, path: str, params: dict | None) -> dict:
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        if path.startswith("/tracks/"):
+            return self._fixture_track(path.rsplit("/", 1)[1])
+        if path == "/tracks":
+            return {"tracks": [self._fixture_track(track_id) for track_id in params["ids"].split(",")]}
+        if path == "/search":
+            return {"tracks": {"items": [self._fixture_track(fake_id(params["q"], 22))]}}
+        raise Exception(f"Sem fixture para {path}")
+
+    async def close(self):
+        pass
+
+
+class FakeFFmpegAudio(discord.FFmpegAudio):
+    """
+    Fonte Opus sem processo: entrega quadros de 20 ms por `duration` segundos.
+    Conta como um FFmpeg (vaga no governador, `kali_ffmpeg_processes`).
+    """
+
+    def __init__(self, duration: float = 213.0):
+        self.frames = int(duration * 50)
+
+    def read(self) -> bytes:
+        if self.frames <= 0:
+            return b""
+        self.frames -= 1
+        return OPUS_FRAME
+
+    def is_opus(self) -> bool:
+        return True
+
+    def cleanup(self):
+        self.frames = 0
+
+
+async def _fake_spawn_ffmpeg(self: GuildPlayer, song: Track, local_path: str | None,
+                             offset: float) -> tuple[discord.FFmpegAudio, str]:
+    duration = song.duration or 1
+    return FakeFFmpegAudio(max(duration - offset, 0)), "opus_copy"
+
+
+async def _fake_probe(source, **kwargs):
+    return "opus", 128
+
+
+@contextmanager
+def offline_backends(extract_latency: float = 0.0, spotify_latency: float = 0.0, duration: int | None = None,
+                     max_ffmpeg: int | None = None):
+    """
+    Instala os backends falsos (motor de extração, Spotify, matcher com índice
+    em memória, um cache e um índice de autocomplete novos e o log de filas
+    em memória) e troca o FFmpeg do `GuildPlayer` por `FakeFFmpegAudio`. As
+    vagas passam por um governador de recursos novo, só deste processo, com
+    `max_ffmpeg` vagas (sem limite efetivo por padrão). Tudo é restaurado na
+    saída.
+    """
+    saved_cache = get_song_cache()
+    saved_store = get_player_store()
+    saved_index = get_track_index()
+    saved_governor = get_resource_governor()
+    saved_spawn_ffmpeg = GuildPlayer._spawn_ffmpeg
+    saved_probe = discord.FFmpegOpusAudio.probe
+    engine = FixtureExtractionEngine(extract_latency, duration)
+    youtube_service.set_extraction_engine(engine)
+    spotify_service.set_spotify_client(FixtureSpotifyClient(spotify_latency))
+    match_service.set_track_matcher(TrackMatcher(MatchIndex(":memory:")))
+    # Governador real, mas sem limite efetivo: mede só o custo da fila de prioridade
+    rate_governor.set_rate_governor("spotify", rate_governor.RateGovernor("spotify", rate=1e9, burst=10**9))
+    set_song_cache(SongInfoCache())
+    # O log de filas continua ativo (o custo entra na medição), mas em memória
+    set_player_store(PlayerStore(":memory:"))
+    set_track_index(TrackIndex())
+    set_resource_governor(ResourceGovernor(max_processes=max_ffmpeg or 10**9))
+    GuildPlayer._spawn_ffmpeg = _fake_spawn_ffmpeg
+    discord.FFmpegOpusAudio.probe = _fake_probe
+    try:
+        yield engine
+    finally:
+        GuildPlayer._spawn_ffmpeg = saved_spawn_ffmpeg
+        discord.FFmpegOpusAudio.probe = saved_probe
+        match_service.close_track_matcher()
+        youtube_service.set_extraction_engine(None)
+        spotify_service.set_spotify_client(None)
+        rate_governor.set_rate_governor("spotify", None)
+        set_song_cache(saved_cache)
+        set_player_store(saved_store)
+        set_track_index(saved_index)
+        set_resource_governor(saved_governor)
+
+
+# ---------------------------------------------------------------------- #
+# Discord
+# ---------------------------------------------------------------------- #
+class FakeVoiceClient:
+    """
+    Cliente de voz falso. `play` apenas guarda a fonte; `stop` encerra a
+    faixa e chama o callback `after`, como o discord.py faz.
+    """
+
+    def __init__(self, channel: "FakeVoiceChannel"):
+        self.channel = channel
+        self.guild = channel.guild
+        self.source: discord.AudioSource | None = None
+        self._after = None
+        self._connected = True
+
+    def is_connected(self) -> bool:
+        return self._connected
+
+    def is_playing(self) -> bool:
+        return self.source is not None
+
+    def is_paused(self) -> bool:
+        return False
+
+    def play(self, source: discord.AudioSource, *, after=None):
+        if self.source is not None:
+            raise discord.ClientException("Already playing audio.")
+        self.source = source
+        self._after = after
+        # Lê o primeiro quadro, como a thread do AudioPlayer faria
+        source.read()
+
+    def _finish(self, error: Exception | None = None):
+        source, after = self.source, self._after
+        self.source = None
+        self._after = None
+        if source is not None:
+            source.cleanup()
+        if after is not None:
+            after(error)
+
+    def stop(self):
+        self._finish()
+
+    async def move_to(self, channel: "FakeVoiceChannel"):
+        self.channel = channel
+
+    async def disconnect(self, *, force: bool = False):
+        self.stop()
+        self._connected = False
+        self.guild.voice_client = None
+        self.guild.bot.voice_clients.remove(self)
+
+
+class VoiceClock(threading.Thread):
+    """
+    Thread única que consome um quadro de cada cliente de voz ativo a cada
+    20 ms, no ritmo real, e chama o `after` da faixa quando a fonte acaba,
+    fora do event loop, como o `AudioPlayer` do discord.py faz.
+    """
+
+    def __init__(self):
+        super().__init__(name="voice-clock", daemon=True)
+        self._clients: set["RealtimeVoiceClient"] = set()
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+        self.late_ticks = 0
+
+    def add(self, client: "RealtimeVoiceClient"):
+        with self._lock:
+            self._clients.add(client)
+
+    def discard(self, client: "RealtimeVoiceClient"):
+        with self._lock:
+            self._clients.discard(client)
+
+    def run(self):
+        next_tick = time.perf_counter()
+        while not self._stopped.is_set():
+            with self._lock:
+                clients = list(self._clients)
+            for client in clients:
+                client._tick()
+            next_tick += FRAME_SECONDS
+            delay = next_tick - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            else:
+                self.late_ticks += 1
+                next_tick = time.perf_counter()
+
+    def stop(self):
+        self._stopped.set()
+
+
+class RealtimeVoiceClient(FakeVoiceClient):
+    """Cliente de voz falso que consome a fonte em tempo real pelo `VoiceClock` do bot."""
+
+    def __init__(self, channel: "FakeVoiceChannel"):
+        super().__init__(channel)
+        self.clock: VoiceClock = channel.guild.bot.voice_clock
+        self._lock = threading.Lock()
+
+    def play(self, source: discord.AudioSource, *, after=None):
+        with self._lock:
+            if self.source is not None:
+                raise discord.ClientException("Already playing audio.")
+            self.source = source
+            self._after = after
+        self.clock.add(self)
+
+    def _tick(self):
+        source = self.source
+        if source is not None and not source.read():
+            self._finish()
+
+    def _finish(self, error: Exception | None = None):
+        self.clock.discard(self)
+        with self._lock:
+            source, after = self.source, self._after
+            self.source = None
+            self._after = None
+        if source is not None:
+            source.cleanup()
+        if after is not None:
+            after(error)
+
+
+class FakeVoiceChannel:
+    _ids = itertools.count(1)
+
+    def __init__(self, guild: "FakeGuild", name: str = "Geral"):
+        self.id = next(self._ids)
+        self.guild = guild
+        self.name = name
+
+    async def connect(self, **kwargs) -> FakeVoiceClient:
+        voice_client = self.guild.bot.voice_client_class(self)
+        self.guild.voice_client = voice_client
+        self.guild.bot.voice_clients.append(voice_client)
+        return voice_client
+
+
+class FakeMessage:
+    def __init__(self, channel: "FakeTextChannel", **kwargs):
+        self.channel = channel
+        self.kwargs = kwargs
+        self.edits = 0
+        self.deleted = False
+
+    async def edit(self, **kwargs):
+        self.kwargs.update(kwargs)
+        self.edits += 1
+
+    async def delete(self):
+        self.deleted = True
+
+
+class FakeTextChannel:
+    """Canal de texto falso: guarda as mensagens enviadas (a mensagem de status)."""
+
+    _ids = itertools.count(1)
+
+    def __init__(self, name: str = "musica"):
+        self.id = next(self._ids)
+        self.name = name
+        self.messages: list[FakeMessage] = []
+
+    async def send(self, content=None, **kwargs) -> FakeMessage:
+        message = FakeMessage(self, content=content, **kwargs)
+        self.messages.append(message)
+        return message
+
+
+class FakeAvatar:
+    def __init__(self, url: str):
+        self.url = url
+
+
+class FakeVoiceState:
+    def __init__(self, channel: FakeVoiceChannel | None):
+        self.channel = channel
+
+
+class FakeMember:
+    def __init__(self, member_id: int, name: str, channel: FakeVoiceChannel | None):
+        self.id = member_id
+        self.name = name
+        self.display_avatar = FakeAvatar(f"https://cdn.discordapp.com/embed/avatars/{member_id % 5}.png")
+        self.voice = FakeVoiceState(channel)
+
+
+class FakeGuild:
+    def __init__(self, bot: "FakeBot", guild_id: int):
+        self.bot = bot
+        self.id = guild_id
+        self.voice_client: FakeVoiceClient | None = None
+        self.voice_channel = FakeVoiceChannel(self)
+        self.text_channel = FakeTextChannel()
+        self.member = FakeMember(guild_id * 10, f"usuario{guild_id}", self.voice_channel)
+
+    def get_member(self, member_id: int) -> FakeMember | None:
+        return self.member if member_id == self.member.id else None
+
+
+class FakeResponse:
+    def __init__(self):
+        self.deferred = False
+        self.messages: list = []
+
+    async def defer(self, **kwargs):
+        self.deferred = True
+
+    async def send_message(self, content=None, **kwargs):
+        self.messages.append((content, kwargs))
+
+    async def edit_message(self, **kwargs):
+        self.messages.append((None, kwargs))
+
+    def is_done(self) -> bool:
+        return self.deferred or bool(self.messages)
+
+
+class FakeFollowup:
+    def __init__(self):
+        self.messages: list = []
+
+    async def send(self, content=None, **kwargs):
+        self.messages.append((content, kwargs))
+
+
+class FakeInteraction:
+    """Interação de slash command vinda do único membro da guild falsa."""
+
+    def __init__(self, guild: FakeGuild):
+        self.guild = guild
+        self.channel = guild.text_channel
+        self.user = guild.member
+        self.response = FakeResponse()
+        self.followup = FakeFollowup()
+
+
+class FakeBot:
+    """O mínimo do `commands.Bot` que o `PlayerRegistry` e a cog usam."""
+
+    def __init__(self, voice_client_class=FakeVoiceClient):
+        self.loop = asyncio.get_running_loop()
+        self.voice_clients: list[FakeVoiceClient] = []
+        self.voice_client_class = voice_client_class
+        self._guilds: dict[int, FakeGuild] = {}
+        self.voice_clock: VoiceClock | None = None
+        if issubclass(voice_client_class, RealtimeVoiceClient):
+            self.voice_clock = VoiceClock()
+            self.voice_clock.start()
+
+    def get_guild(self, guild_id: int) -> FakeGuild | None:
+        return self._guilds.get(guild_id)
+
+    def guild(self, guild_id: int) -> FakeGuild:
+        guild = self._guilds.get(guild_id)
+        if guild is None:
+            guild = FakeGuild(self, guild_id)
+            self._guilds[guild_id] = guild
+        return guild
+
+    def close(self):
+        if self.voice_clock is not None:
+            self.voice_clock.stop()
@@ -0,0 +1,384 @@
+# File: benchmarks/run.py
+"""
+Microbenchmarks offline dos caminhos críticos do bot (fila, embeds,
+resolução e o /play completo). Nenhuma chamada acessa a rede: o yt-dlp e o
+Spotify são substituídos por fixtures gravadas (benchmarks/fixtures/).
+
+Uso:
+    python -m benchmarks.run                       # imprime o JSON
+    python -m benchmarks.run --output atual.json   # grava o resultado
+    python -m benchmarks.run --filter queue --quick
+    python -m benchmarks.compare base.json atual.json
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import datetime
+import gc
+import itertools
+import json
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import time
+import tracemalloc
+
+from benchmarks.fakes import FakeBot, FakeInteraction, FakeTextChannel, load_fixture, offline_backends
+
+QUEUE_SIZES = (10, 1_000, 50_000)
+# Faixas na fila do caso de memória (playlists enormes de várias guilds)
+MEMORY_QUEUE_SIZE = 100_000
+# Faixas no índice do autocomplete (o limite padrão de autocomplete.max_tracks)
+INDEX_SIZE = 5_000
+# Chamadas simultâneas do mesmo link no caso de rajada de extract_song_info
+BURST_SIZE = 50
+
+_cases: list[tuple[str, object]] = []
+
+
+def case(name: str):
+    """Registra uma função de benchmark (síncrona ou assíncrona)."""
+    def decorator(func):
+        _cases.append((name, func))
+        return func
+    return decorator
+
+
+def _summarize(batch_times: list[float], number: int) -> dict:
+    per_op = sorted(t / number for t in batch_times)
+    mean = statistics.fmean(per_op)
+    return {
+        "number": number,
+        "repeat": len(batch_times),
+        "mean_us": mean * 1e6,
+        "p50_us": per_op[len(per_op) // 2] * 1e6,
+        "p95_us": per_op[min(int(round(0.95 * (len(per_op) - 1))), len(per_op) - 1)] * 1e6,
+        "min_us": per_op[0] * 1e6,
+        "ops_per_sec": 1 / mean if mean else 0.0,
+    }
+
+
+def measure(func, number: int, repeat: int) -> dict:
+    """Executa `func()` `number` vezes por rodada, em `repeat` rodadas."""
+    func()  # aquecimento
+    batches = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        for _ in range(number):
+            func()
+        batches.append(time.perf_counter() - started)
+    return _summarize(batches, number)
+
+
+async def ameasure(func, number: int, repeat: int) -> dict:
+    """Versão assíncrona de `measure` para corrotinas (`await func()`)."""
+    await func()
+    batches = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        for _ in range(number):
+            await func()
+        batches.append(time.perf_counter() - started)
+    return _summarize(batches, number)
+
+
+def _fixture_songs(count: int) -> list:
+    from utils.track import Platform, Track
+
+    video = load_fixture("youtube")["video"]
+    rng = random.Random(count)
+    return [
+        Track(f"{video['title']} #{i}", Platform.YOUTUBE, rng.randint(90, 600),
+              url=f"https://www.youtube.com/watch?v={i:011d}", thumbnail=video["thumbnail"])
+        for i in range(count)
+    ]
+
+
+def _legacy_songs(count: int) -> list[tuple[int, dict]]:
+    """As mesmas faixas no formato antigo da fila: pares (duração, dicionário)."""
+    video = load_fixture("youtube")["video"]
+    rng = random.Random(count)
+    songs = []
+    for i in range(count):
+        duration = rng.randint(90, 600)
+        songs.append((duration, {
+            "title": f"{video['title']} #{i}",
+            "platform": "YouTube",
+            "estimated_time": "00:00",
+            "duration": f"{duration} sec",
+            "thumbnail": video["thumbnail"],
+            "url": f"https://www.youtube.com/watch?v={i:011d}",
+            "audio_url": "",
+        }))
+    return songs
+
+
+def _allocated_bytes(build) -> tuple[object, int]:
+    """Retorna (resultado de `build()`, bytes alocados e ainda vivos ao final)."""
+    gc.collect()
+    tracemalloc.start()
+    try:
+        result = build()
+        return result, tracemalloc.get_traced_memory()[0]
+    finally:
+        tracemalloc.stop()
+
+
+# ---------------------------------------------------------------------- #
+# Casos
+# ---------------------------------------------------------------------- #
+@case("queue")
+def bench_queue(scale: float) -> dict:
+    from utils.song_queue import SongQueue
+
+    results = {}
+    for size in QUEUE_SIZES:
+        queue = SongQueue(_fixture_songs(size))
+        positions = itertools.cycle(random.Random(size).sample(range(size), min(size, 1000)))
+        results[f"queue_eta[{size}]"] = measure(lambda: queue.eta(next(positions)),
+                                                number=int(2000 * scale) or 1, repeat=20)
+    return results
+
+
+@case("paginator")
+async def bench_paginator(scale: float) -> dict:
+    from cogs.music import ITEMS_PER_PAGE, QueuePaginator
+    from utils.guild_player import PlayerRegistry
+
+    results = {}
+    with offline_backends():
+        registry = PlayerRegistry(FakeBot())
+        for size in QUEUE_SIZES:
+            # A view lê a fila do player (sem cópia), como no /queue
+            player = registry.get(size)
+            player.queue.extend(_fixture_songs(size))
+            player.currently_playing = player.queue[0]
+            player.start_time = datetime.datetime.utcnow() - datetime.timedelta(seconds=30)
+            paginator = QueuePaginator(player)
+            # Página do meio: o pior caso da versão antiga, que somava a fila até ali
+            paginator.page = (size - 1) // ITEMS_PER_PAGE // 2
+            results[f"paginator_build_embed[{size}]"] = measure(
+                lambda: paginator.build_embed("usuario", "https://cdn.discordapp.com/embed/avatars/0.png"),
+                number=int(200 * scale) or 1, repeat=20)
+            paginator.stop()
+        registry.close()
+    return results
+
+
+@case("status")
+async def bench_status(scale: float) -> dict:
+    from utils.embed_utils import create_status_embed
+    from utils.song_queue import SongQueue
+    from utils.status_board import StatusBoard
+
+    results = {}
+    for size in QUEUE_SIZES:
+        queue = SongQueue(_fixture_songs(size))
+        results[f"status_render[{size}]"] = measure(
+            lambda: create_status_embed(queue[0], queue, 120.0, False), number=int(500 * scale) or 1, repeat=20)
+
+    # Rajada de mudanças (ex.: playlist enfileirada faixa a faixa): quantas edições chegam ao Discord
+    queue = SongQueue(_fixture_songs(QUEUE_SIZES[1]))
+    channel = FakeTextChannel()
+    board = StatusBoard(lambda: create_status_embed(queue[0], queue, 120.0, False), asyncio.ensure_future,
+                        min_interval=0.05, settle=0.01)
+    board.bind(channel)
+    changes = int(2000 * scale) or 1
+
+    async def burst():
+        for _ in range(changes):
+            board.invalidate()
+            await asyncio.sleep(0)
+
+    started = time.perf_counter()
+    result = await ameasure(burst, number=1, repeat=5)
+    while board.stats()["pending"]:
+        await asyncio.sleep(board.min_interval)
+    elapsed = time.perf_counter() - started
+    board.close()
+    result.update({
+        "changes": changes * 6,
+        "edits": board.edits,
+        "max_edits": int(elapsed / board.min_interval) + 1,
+    })
+    results["status_burst"] = result
+    return results
+
+
+@case("embeds")
+def bench_embeds(scale: float) -> dict:
+    from utils.embed_utils import create_now_playing_embed, create_queue_added_embed
+
+    song = _fixture_songs(1)[0]
+    avatar = "https://cdn.discordapp.com/embed/avatars/0.png"
+    number = int(2000 * scale) or 1
+    return {
+        "create_queue_added_embed": measure(
+            lambda: create_queue_added_embed(song, 754, "03:33", 5, "usuario", avatar), number=number, repeat=20),
+        "create_now_playing_embed": measure(
+            lambda: create_now_playing_embed(song, "usuario", avatar), number=number, repeat=20),
+    }
+
+
+@case("memory")
+def bench_memory(scale: float) -> dict:
+    from utils.song_queue import SongQueue
+
+    size = int(MEMORY_QUEUE_SIZE * scale) or 1
+    queue, track_bytes = _allocated_bytes(lambda: SongQueue(_fixture_songs(size)))
+    legacy, dict_bytes = _allocated_bytes(lambda: _legacy_songs(size))
+    serialized = sum(len(track.to_bytes()) for track in queue)
+    del legacy
+    result = measure(lambda: SongQueue(_fixture_songs(size)), number=1, repeat=3)
+    result.update({
+        "tracks": size,
+        "bytes_per_track": track_bytes / size,
+        "dict_bytes_per_track": dict_bytes / size,
+        "serialized_bytes_per_track": serialized / size,
+    })
+    return {f"queue_memory[{size}]": result}
+
+
+@case("autocomplete")
+def bench_autocomplete(scale: float) -> dict:
+    from utils.track_index import TrackIndex
+
+    size = int(INDEX_SIZE * scale) or 1
+    index = TrackIndex(max_tracks=size)
+    rng = random.Random(size)
+    songs = _fixture_songs(size)
+    for song in songs:
+        index.add(song)
+    # Reproduções espalhadas entre algumas guilds, para a ordenação ter o que ordenar
+    for song in rng.choices(songs, k=size):
+        index.record_play(rng.randint(1, 10), song)
+
+    number = int(500 * scale) or 1
+    results = {}
+    # As fixtures têm todas o mesmo título (mais o número): o pior caso para o prefixo
+    for name, query in (("empty", ""), ("prefix", "never gon"), ("selective", f"gonna {size - 1}")):
+        results[f"autocomplete[{name},{size}]"] = measure(lambda: index.suggest(query, 1), number=number, repeat=20)
+    return results
+
+
+@case("extract")
+async def bench_extract(scale: float) -> dict:
+    from utils.music_utils import extract_song_info
+
+    number = int(500 * scale) or 1
+    counter = itertools.count()
+    queries = {
+        "youtube_url": "https://www.youtube.com/watch?v=dQw4w9WgXcQ",
+        "search": "never gonna give you up",
+        "spotify_url": "https://open.spotify.com/track/4PTG3Z6ehGkBFwjybzWkR8",
+    }
+    results = {}
+    with offline_backends() as engine:
+        for name, query in queries.items():
+            # Cache quente: mede só o roteamento e a consulta ao cache
+            results[f"extract_song_info[{name},warm]"] = await ameasure(
+                lambda: extract_song_info(query), number=number, repeat=20)
+        # Cache frio: cada consulta é nova e passa pelo backend (fixture)
+        results["extract_song_info[search,cold]"] = await ameasure(
+            lambda: extract_song_info(f"never gonna give you up {next(counter)}"), number=number, repeat=20)
+        results["extract_song_info[spotify_url,cold]"] = await ameasure(
+            lambda: extract_song_info(f"https://open.spotify.com/track/{next(counter):022d}"),
+            number=number, repeat=20)
+
+        # Rajada: BURST_SIZE chamadas simultâneas do mesmo link novo (um link
+        # compartilhado em um servidor movimentado) agrupadas em uma extração
+        async def burst():
+            query = f"https://www.youtube.com/watch?v={next(counter):011d}"
+            await asyncio.gather(*(extract_song_info(query) for _ in range(BURST_SIZE)))
+
+        rounds = max(number // BURST_SIZE, 1)
+        calls_before = engine.calls
+        result = await ameasure(burst, number=rounds, repeat=20)
+        # +1 pela rodada de aquecimento de ameasure
+        result["backend_calls_per_burst"] = (engine.calls - calls_before) / (rounds * 20 + 1)
+        results[f"extract_song_info[burst{BURST_SIZE},cold]"] = result
+    return results
+
+
+@case("play")
+async def bench_play(scale: float) -> dict:
+    from cogs.music import Music
+
+    number = int(200 * scale) or 1
+    guild_ids = itertools.count(1)
+    results = {}
+    with offline_backends():
+        bot = FakeBot()
+        cog = Music(bot)
+        query = "https://www.youtube.com/watch?v=dQw4w9WgXcQ"
+
+        async def play_new_guild():
+            # Guild nova: conecta ao canal de voz e inicia a reprodução
+            await cog.play.callback(cog, FakeInteraction(bot.guild(next(guild_ids))), query)
+
+        async def play_enqueue():
+            # Guild já tocando: a música só entra na fila
+            await cog.play.callback(cog, FakeInteraction(bot.guild(0)), query)
+
+        results["music_play[start]"] = await ameasure(play_new_guild, number=number, repeat=10)
+        await cog.play.callback(cog, FakeInteraction(bot.guild(0)), query)
+        results["music_play[enqueue]"] = await ameasure(play_enqueue, number=number, repeat=10)
+        await cog.cog_unload()
+    return results
+
+
+# ---------------------------------------------------------------------- #
+# Execução
+# ---------------------------------------------------------------------- #
+def _git_commit() -> str | None:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+async def run(filters: list[str], scale: float) -> dict:
+    results = {}
+    for name, func in _cases:
+        if filters and not any(f in name for f in filters):
+            continue
+        print(f"Executando {name}...", file=sys.stderr)
+        outcome = func(scale)
+        if asyncio.iscoroutine(outcome):
+            outcome = await outcome
+        results.update(outcome)
+    return {
+        "meta": {
+            "commit": _git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "timestamp": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+            "scale": scale,
+        },
+        "results": results,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks offline do bot")
+    parser.add_argument("--output", "-o", help="Arquivo JSON de saída (padrão: stdout)")
+    parser.add_argument("--filter", "-k", action="append", default=[], help="Executa só os casos com esse nome")
+    parser.add_argument("--quick", action="store_true", help="Menos iterações (útil em CI)")
+    args = parser.parse_args()
+
+    report = asyncio.run(run(args.filter, 0.1 if args.quick else 1.0))
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf8") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,259 @@
+# File: benchmarks/soak.py
+"""
+Teste de carga/soak com várias guilds simuladas em um único processo.
+
+Cada guild é uma corrotina que dispara os callbacks reais da cog `Music`
+(`play`, `skip`, `queue`, `stop`) com interações falsas, em intervalos
+aleatórios. O áudio é consumido em tempo real por `RealtimeVoiceClient` e as
+extrações respondem com fixtures após uma latência simulada; nenhum acesso à
+rede nem FFmpeg é usado.
+
+A cada `--report-interval` segundos é impressa uma linha JSON com o atraso do
+event loop, a latência p50/p99 de cada comando, o crescimento de memória
+(RSS), as tasks asyncio, os processos FFmpeg/filhos abertos e as vagas do
+governador de FFmpeg (em uso, pico e fila; `--max-ffmpeg` limita as vagas). No fim, depois
+de parar todas as guilds, o relatório indica o que vazou.
+
+Uso:
+    python -m benchmarks.soak --guilds 300 --duration 7200 --output soak.json
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import time
+
+from benchmarks.fakes import FakeBot, FakeInteraction, RealtimeVoiceClient, offline_backends
+from services.resource_governor import get_resource_governor
+from utils.metrics import FFMPEG_PROCESSES, LOOP_LAG_SECONDS, monitor_event_loop
+
+COMMANDS = ("play", "queue", "skip", "stop")
+# Peso de cada comando na escolha aleatória
+COMMAND_WEIGHTS = (0.55, 0.25, 0.15, 0.05)
+# Amostras guardadas por comando para os percentis do relatório final
+RESERVOIR_SIZE = 20_000
+
+
+class Reservoir:
+    """Amostragem uniforme de tamanho fixo (memória constante em testes longos)."""
+
+    def __init__(self, size: int, rng: random.Random):
+        self.size = size
+        self.rng = rng
+        self.samples: list[float] = []
+        self.seen = 0
+
+    def add(self, value: float):
+        self.seen += 1
+        if len(self.samples) < self.size:
+            self.samples.append(value)
+        else:
+            index = self.rng.randrange(self.seen)
+            if index < self.size:
+                self.samples[index] = value
+
+
+def _percentiles(values: list[float]) -> dict:
+    if not values:
+        return {"count": 0, "p50_ms": 0.0, "p99_ms": 0.0, "max_ms": 0.0}
+    ordered = sorted(values)
+
+    def pct(p: float) -> float:
+        return ordered[min(int(round(p / 100 * (len(ordered) - 1))), len(ordered) - 1)] * 1000
+
+    return {"count": len(ordered), "p50_ms": pct(50), "p99_ms": pct(99), "max_ms": ordered[-1] * 1000}
+
+
+def _rss_bytes() -> int:
+    try:
+        with open("/proc/self/statm", "r") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return 0
+
+
+def _child_processes() -> int:
+    """Processos cujo pai é este processo (FFmpeg, workers do yt-dlp...)."""
+    pid = str(os.getpid())
+    count = 0
+    try:
+        entries = os.listdir("/proc")
+    except OSError:
+        return 0
+    for entry in entries:
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat", "r") as f:
+                if f.read().rsplit(")", 1)[1].split()[1] == pid:
+                    count += 1
+        except (OSError, IndexError):
+            continue
+    return count
+
+
+class SoakTest:
+    """Executa as guilds simuladas e coleta os relatórios periódicos e o final."""
+
+    def __init__(self, guilds: int, duration: float, think_time: float, track_seconds: int,
+                 extract_latency: float, report_interval: float, seed: int, max_ffmpeg: int | None = None):
+        self.guilds = guilds
+        self.duration = duration
+        self.think_time = think_time
+        self.track_seconds = track_seconds
+        self.extract_latency = extract_latency
+        self.report_interval = report_interval
+        self.max_ffmpeg = max_ffmpeg
+        self.rng = random.Random(seed)
+        self.interval_latencies = {command: [] for command in COMMANDS}
+        self.latencies = {command: Reservoir(RESERVOIR_SIZE, self.rng) for command in COMMANDS}
+        self.errors = {command: 0 for command in COMMANDS}
+        self.reports: list[dict] = []
+        # Catálogo de vídeos: repetições geram acertos de cache, como em produção
+        self.catalog = [f"https://www.youtube.com/watch?v={i:011d}" for i in range(max(guilds * 5, 100))]
+
+    def _query(self) -> str:
+        if self.rng.random() < 0.2:
+            return f"musica de teste {self.rng.randrange(10_000)}"
+        return self.rng.choice(self.catalog)
+
+    async def _command(self, cog, bot: FakeBot, guild_id: int, command: str):
+        interaction = FakeInteraction(bot.guild(guild_id))
+        callback = getattr(cog, "queue_command" if command == "queue" else command).callback
+        args = (self._query(),) if command == "play" else ()
+        started = time.perf_counter()
+        try:
+            await callback(cog, interaction, *args)
+        except Exception as e:
+            self.errors[command] += 1
+            print(f"Erro em /{command} (guild {guild_id}): {e!r}", file=sys.stderr)
+            return
+        elapsed = time.perf_counter() - started
+        self.interval_latencies[command].append(elapsed)
+        self.latencies[command].add(elapsed)
+
+    async def _guild_loop(self, cog, bot: FakeBot, guild_id: int, deadline: float):
+        # Entrada escalonada para não disparar todas as guilds no mesmo instante
+        await asyncio.sleep(self.rng.uniform(0, self.think_time))
+        for _ in range(self.rng.randint(1, 3)):
+            await self._command(cog, bot, guild_id, "play")
+        while time.monotonic() < deadline:
+            await asyncio.sleep(self.rng.expovariate(1 / self.think_time))
+            command = self.rng.choices(COMMANDS, COMMAND_WEIGHTS)[0]
+            await self._command(cog, bot, guild_id, command)
+
+    def _snapshot(self, started: float, baseline_rss: int, cog, bot: FakeBot) -> dict:
+        lag = LOOP_LAG_SECONDS.snapshot()
+        registry = cog.players.stats()
+        rss = _rss_bytes()
+        report = {
+            "elapsed_s": round(time.monotonic() - started),
+            "loop_lag_p50_ms": lag["p50"] * 1000,
+            "loop_lag_p99_ms": lag["p99"] * 1000,
+            "commands": {command: _percentiles(values) for command, values in self.interval_latencies.items()},
+            "errors": dict(self.errors),
+            "rss_mb": rss / 2**20,
+            "rss_growth_mb": (rss - baseline_rss) / 2**20,
+            "asyncio_tasks": len(asyncio.all_tasks()),
+            "player_tasks": registry["tasks"],
+            "players": registry["players"],
+            "voice_clients": len(bot.voice_clients),
+            "ffmpeg_processes": FFMPEG_PROCESSES.value(),
+            "ffmpeg_slots": get_resource_governor().stats(),
+            "peak_voice_clients": registry["peak_voice_clients"],
+            "child_processes": _child_processes(),
+            "voice_clock_late_ticks": bot.voice_clock.late_ticks,
+        }
+        for values in self.interval_latencies.values():
+            values.clear()
+        return report
+
+    async def _reporter(self, started: float, baseline_rss: int, cog, bot: FakeBot):
+        while True:
+            await asyncio.sleep(self.report_interval)
+            report = self._snapshot(started, baseline_rss, cog, bot)
+            self.reports.append(report)
+            print(json.dumps(report), flush=True)
+
+    async def run(self) -> dict:
+        from cogs.music import Music
+
+        with offline_backends(extract_latency=self.extract_latency, duration=self.track_seconds,
+                              max_ffmpeg=self.max_ffmpeg):
+            bot = FakeBot(voice_client_class=RealtimeVoiceClient)
+            cog = Music(bot)
+            lag_task = asyncio.create_task(monitor_event_loop(0.1))
+            baseline_tasks = asyncio.all_tasks()
+            baseline_rss = _rss_bytes()
+            started = time.monotonic()
+            deadline = started + self.duration
+            reporter = asyncio.create_task(self._reporter(started, baseline_rss, cog, bot))
+            try:
+                await asyncio.gather(*(self._guild_loop(cog, bot, guild_id, deadline)
+                                       for guild_id in range(1, self.guilds + 1)))
+            finally:
+                reporter.cancel()
+            final = self._snapshot(started, baseline_rss, cog, bot)
+
+            # Encerramento: para tudo e verifica o que sobrou
+            for voice_client in list(bot.voice_clients):
+                await voice_client.disconnect()
+            await cog.cog_unload()
+            await asyncio.sleep(1)
+            leaked_tasks = [task for task in asyncio.all_tasks() - baseline_tasks if not task.done()]
+            lag_task.cancel()
+            bot.close()
+
+        return {
+            "config": {
+                "guilds": self.guilds,
+                "duration_s": self.duration,
+                "think_time_s": self.think_time,
+                "track_seconds": self.track_seconds,
+                "extract_latency_s": self.extract_latency,
+                "max_ffmpeg": self.max_ffmpeg,
+            },
+            "commands": {command: _percentiles(reservoir.samples) | {"total": reservoir.seen}
+                         for command, reservoir in self.latencies.items()},
+            "errors": self.errors,
+            "final": final,
+            "leaks": {
+                "asyncio_tasks": len(leaked_tasks),
+                "task_names": sorted({task.get_coro().__qualname__ for task in leaked_tasks})[:20],
+                "ffmpeg_processes": FFMPEG_PROCESSES.value(),
+                "child_processes": _child_processes(),
+            },
+            "intervals": self.reports,
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Teste de carga/soak do bot com guilds simuladas")
+    parser.add_argument("--guilds", type=int, default=200, help="Guilds simuladas em paralelo")
+    parser.add_argument("--duration", type=float, default=3600, help="Duração do teste em segundos")
+    parser.add_argument("--think-time", type=float, default=20, help="Intervalo médio entre comandos de uma guild (s)")
+    parser.add_argument("--track-seconds", type=int, default=60, help="Duração das faixas simuladas (s)")
+    parser.add_argument("--extract-latency", type=float, default=0.3, help="Latência simulada de extração (s)")
+    parser.add_argument("--report-interval", type=float, default=60, help="Intervalo entre relatórios (s)")
+    parser.add_argument("--max-ffmpeg", type=int, help="Vagas de FFmpeg no governador (padrão: sem limite)")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", "-o", help="Arquivo JSON com o relatório final")
+    args = parser.parse_args()
+
+    test = SoakTest(args.guilds, args.duration, args.think_time, args.track_seconds,
+                    args.extract_latency, args.report_interval, args.seed, args.max_ffmpeg)
+    report = asyncio.run(test.run())
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf8") as f:
+            f.write(text + "\n")
+    print(json.dumps({"commands": report["commands"], "leaks": report["leaks"]}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
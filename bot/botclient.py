@@ -1,11 +1,187 @@
 # File: bot/botclient.py
+from __future__ import annotations
+
+import hashlib
+import json
+import math
+import os
+import time
+
 import discord
 from discord.ext import commands
 
-class BotClient(commands.Bot):
-    def __init__(self, command_prefix, intents, **kwargs):
-        super().__init__(command_prefix=command_prefix, intents=intents, **kwargs)
+from services.metrics_server import close_metrics_server, start_metrics_server
+from utils.logging_utils import get_logger
+from utils.metrics import COMMAND_TREE_SYNCS, GATEWAY_EVENTS, LOOP_LAG_SECONDS, STARTUP_SECONDS
+from utils.settings import PROJECT_ROOT, get_setting, resolve_path
+
+logger = get_logger("bot")
+
+
+def _rss_bytes() -> int:
+    try:
+        with open("/proc/self/statm", "r") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return 0
+
+
+def command_tree_hash(tree: discord.app_commands.CommandTree, application_id: int | None) -> str:
+    """
+    Hash das assinaturas dos comandos globais registrados na árvore (nomes,
+    descrições, parâmetros, permissões), no mesmo formato enviado ao Discord.
+    Inclui o application_id para que trocar de aplicação também force o sync.
+    """
+    payload = []
+    for command in tree.get_commands():
+        try:
+            payload.append(command.to_dict(tree))
+        except TypeError:
+            # discord.py < 2.4: to_dict() não recebe a árvore
+            payload.append(command.to_dict())
+    payload.sort(key=lambda entry: (entry.get("type", 1), entry["name"]))
+    data = json.dumps({"application_id": application_id, "commands": payload}, sort_keys=True, default=str)
+    return hashlib.sha256(data.encode("utf8")).hexdigest()
+
+
+def _read_hash(path: str) -> str | None:
+    try:
+        with open(path, "r", encoding="utf8") as f:
+            return f.read().strip() or None
+    except OSError:
+        return None
+
+
+def _write_hash(path: str, value: str):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf8") as f:
+        f.write(value + "\n")
+    os.replace(tmp_path, path)
+
+
+class BotClient(commands.AutoShardedBot):
+    """
+    Bot do Kali. Com `shard_ids`/`shard_count` roda apenas os shards do seu
+    cluster (ver `bot/cluster.py`); sem eles, o discord.py escolhe sozinho a
+    quantidade de shards e todos rodam neste processo.
+    """
+
+    def __init__(self, command_prefix="!", intents: discord.Intents | None = None, cluster_id: int | None = None,
+                 launched_at: float | None = None, **kwargs):
+        super().__init__(command_prefix=command_prefix, intents=intents or discord.Intents.default(), **kwargs)
+        self.cluster_id = cluster_id
+        self.started_at = time.monotonic()
+        # Início do processo (perf_counter), para medir o tempo até o ready
+        self.launched_at = launched_at if launched_at is not None else time.perf_counter()
+        self.ready_count = 0
+
+    @property
+    def label(self) -> str:
+        return f"cluster {self.cluster_id}" if self.cluster_id is not None else "bot"
 
     async def setup_hook(self):
-        # Aqui podem ser inseridas inicializações adicionais
-        pass
\ No newline at end of file
+        started = time.perf_counter()
+        await self.load_extensions()
+        # Roda uma vez por processo (não a cada reconexão), já com o application_id
+        await self.sync_commands()
+        # Cada cluster expõe as suas métricas em uma porta própria
+        port = get_setting("metrics.port", 9108) + (self.cluster_id or 0)
+        await start_metrics_server(self, port=port)
+        STARTUP_SECONDS.set(time.perf_counter() - started, phase="setup")
+
+    async def load_extensions(self):
+        # Carrega todas as cogs presentes na pasta cogs/
+        for filename in sorted(os.listdir(os.path.join(PROJECT_ROOT, "cogs"))):
+            if filename.endswith(".py") and filename != "__init__.py":
+                extension = f"cogs.{filename[:-3]}"
+                try:
+                    await self.load_extension(extension)
+                    logger.info(f"Extensão {extension} carregada.")
+                except Exception as e:
+                    logger.exception(f"Falha ao carregar a extensão {extension}: {e}")
+
+    async def sync_commands(self) -> bool:
+        """
+        Sincroniza a árvore de comandos com o Discord somente se o hash das
+        assinaturas mudou desde o último sync bem-sucedido (guardado em
+        `startup.command_hash_file`). Em modo cluster apenas o cluster 0
+        sincroniza. `startup.sync_commands` aceita "auto", "always" ou "never".
+        """
+        mode = str(get_setting("startup.sync_commands", "auto")).lower()
+        if mode == "never" or (self.cluster_id or 0) != 0:
+            COMMAND_TREE_SYNCS.inc(result="skipped")
+            return False
+        path = resolve_path(get_setting("startup.command_hash_file", "data/command_tree.sha256"))
+        current = command_tree_hash(self.tree, self.application_id)
+        if mode != "always" and _read_hash(path) == current:
+            COMMAND_TREE_SYNCS.inc(result="skipped")
+            logger.info("Comandos sem alterações; sync ignorado", extra={"hash": current[:12]})
+            return False
+        started = time.perf_counter()
+        try:
+            synced = await self.tree.sync()
+        except discord.HTTPException as e:
+            COMMAND_TREE_SYNCS.inc(result="failed")
+            logger.error("Falha ao sincronizar os comandos", extra={"error": str(e)})
+            return False
+        _write_hash(path, current)
+        COMMAND_TREE_SYNCS.inc(result="synced")
+        elapsed_ms = round((time.perf_counter() - started) * 1000)
+        logger.info("Comandos sincronizados", extra={"commands": len(synced), "hash": current[:12], "sync_ms": elapsed_ms})
+        return True
+
+    async def on_ready(self):
+        # Disparado também em reconexões completas: só mede e registra
+        GATEWAY_EVENTS.inc(event="ready")
+        self.ready_count += 1
+        if self.ready_count == 1:
+            elapsed = time.perf_counter() - self.launched_at
+            STARTUP_SECONDS.set(elapsed, phase="ready")
+            logger.info(f"Bot {self.user} está online!",
+                        extra={"cluster": self.cluster_id, "shards": self.shard_ids,
+                               "ready_s": round(elapsed, 2),
+                               "imports_s": round(STARTUP_SECONDS.value(phase="imports"), 2),
+                               "setup_s": round(STARTUP_SECONDS.value(phase="setup"), 2)})
+        else:
+            logger.info("Reconectado ao gateway", extra={"cluster": self.cluster_id, "ready_count": self.ready_count})
+
+    async def on_resumed(self):
+        GATEWAY_EVENTS.inc(event="resumed")
+
+    def health(self) -> dict:
+        """
+        Resumo de saúde deste processo: guilds e latência por shard, conexões
+        de voz, players, atraso do event loop e memória.
+        """
+        guilds_per_shard: dict[int, int] = {}
+        for guild in self.guilds:
+            guilds_per_shard[guild.shard_id] = guilds_per_shard.get(guild.shard_id, 0) + 1
+        shards = {
+            shard_id: {
+                "guilds": guilds_per_shard.get(shard_id, 0),
+                "latency_ms": latency * 1000 if math.isfinite(latency) else None,
+            }
+            for shard_id, latency in self.latencies
+        }
+        music = self.get_cog("Music")
+        players = music.players.stats() if music is not None else {"players": 0, "tasks": 0}
+        return {
+            "cluster": self.cluster_id,
+            "pid": os.getpid(),
+            "ready": self.is_ready(),
+            "uptime_s": round(time.monotonic() - self.started_at),
+            "ready_s": STARTUP_SECONDS.value(phase="ready"),
+            "gateway_readies": self.ready_count,
+            "shards": shards,
+            "guilds": len(self.guilds),
+            "voice_clients": len(self.voice_clients),
+            "players": players["players"],
+            "player_tasks": players["tasks"],
+            "loop_lag_p99_ms": LOOP_LAG_SECONDS.snapshot()["p99"] * 1000,
+            "rss_mb": _rss_bytes() / 2**20,
+        }
+
+    async def close(self):
+        await super().close()
+        await close_metrics_server()
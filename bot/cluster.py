@@ -0,0 +1,332 @@
+# File: bot/cluster.py
+"""
+Modo cluster: os shards do bot (`AutoShardedBot`) são divididos entre vários
+processos, cada um com o seu próprio GIL, event loop e threads de voz.
+
+O supervisor (processo principal) inicia os clusters de forma escalonada,
+recebe um relatório de saúde de cada um a intervalos regulares, reinicia
+clusters que caem ou param de responder (com backoff exponencial),
+redistribui os shards quando a quantidade de guilds fica desequilibrada e
+grava um resumo de saúde por cluster.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import math
+import multiprocessing
+import os
+import queue
+import signal
+import time
+
+import aiohttp
+
+from utils.logging_utils import get_logger, setup_logging
+from utils.metrics import STARTUP_SECONDS
+from utils.settings import get_setting, resolve_path
+
+GATEWAY_BOT_URL = "https://discord.com/api/v10/gateway/bot"
+# Intervalo mínimo entre identificações de shards do mesmo bucket (limite do Discord)
+IDENTIFY_INTERVAL = 5.0
+MAX_RESTART_BACKOFF = 60.0
+
+logger = get_logger("cluster")
+
+
+async def fetch_gateway_info(token: str) -> tuple[int, int]:
+    """Retorna (shards recomendados, max_concurrency) de GET /gateway/bot."""
+    async with aiohttp.ClientSession() as session:
+        async with session.get(GATEWAY_BOT_URL, headers={"Authorization": f"Bot {token}"}) as resp:
+            if resp.status != 200:
+                raise Exception(f"Erro ao consultar o gateway do Discord (HTTP {resp.status}).")
+            data = await resp.json()
+    return data["shards"], data.get("session_start_limit", {}).get("max_concurrency", 1)
+
+
+def split_shards(shard_count: int, clusters: int) -> list[list[int]]:
+    """Distribui os shards entre os clusters em rodízio (0, N, 2N... no cluster 0)."""
+    clusters = max(1, min(clusters, shard_count))
+    return [list(range(cluster_id, shard_count, clusters)) for cluster_id in range(clusters)]
+
+
+def balance_shards(guilds_per_shard: dict[int, int], clusters: int) -> list[list[int]]:
+    """
+    Reparte os shards de modo que cada cluster fique com um total de guilds
+    parecido: os shards maiores são atribuídos primeiro, sempre ao cluster
+    com menos guilds até o momento.
+    """
+    groups: list[list[int]] = [[] for _ in range(clusters)]
+    totals = [0] * clusters
+    for shard_id in sorted(guilds_per_shard, key=lambda s: (-guilds_per_shard[s], s)):
+        target = min(range(clusters), key=lambda c: (totals[c], len(groups[c])))
+        groups[target].append(shard_id)
+        totals[target] += guilds_per_shard[shard_id]
+    return [sorted(group) for group in groups]
+
+
+def run_cluster(cluster_id: int, shard_ids: list[int], shard_count: int, health_queue, heartbeat_interval: float):
+    """Ponto de entrada de cada processo de cluster."""
+    from dotenv import load_dotenv
+
+    load_dotenv()
+    setup_logging()
+    # No supervisor, Ctrl+C encerra os clusters; aqui o sinal é ignorado
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    try:
+        asyncio.run(_cluster_main(cluster_id, shard_ids, shard_count, health_queue, heartbeat_interval))
+    except KeyboardInterrupt:
+        pass
+
+
+async def _cluster_main(cluster_id: int, shard_ids: list[int], shard_count: int, health_queue,
+                        heartbeat_interval: float):
+    launched_at = time.perf_counter()
+    from bot.botclient import BotClient
+
+    STARTUP_SECONDS.set(time.perf_counter() - launched_at, phase="imports")
+    bot = BotClient(cluster_id=cluster_id, shard_ids=shard_ids, shard_count=shard_count, launched_at=launched_at)
+    loop = asyncio.get_running_loop()
+    loop.add_signal_handler(signal.SIGTERM, lambda: loop.create_task(bot.close()))
+
+    async def heartbeat():
+        while not bot.is_closed():
+            try:
+                health_queue.put_nowait(bot.health())
+            except Exception as e:
+                logger.warning("Falha ao enviar o relatório de saúde", extra={"error": str(e)})
+            await asyncio.sleep(heartbeat_interval)
+
+    async with bot:
+        task = loop.create_task(heartbeat())
+        try:
+            await bot.start(os.getenv("DISCORD_TOKEN"))
+        finally:
+            task.cancel()
+
+
+class ClusterSupervisor:
+    """
+    Inicia e acompanha os processos de cluster. Cada cluster envia o
+    resultado de `BotClient.health()` pela fila `health_queue`; o supervisor
+    usa esses relatórios para detectar clusters travados, resumir a saúde e
+    decidir redistribuições de shards.
+    """
+
+    def __init__(self, shard_count: int, processes: int, max_concurrency: int = 1):
+        self.shard_count = shard_count
+        self.assignment = split_shards(shard_count, processes)
+        self.max_concurrency = max(1, max_concurrency)
+        self.heartbeat_interval = get_setting("cluster.heartbeat_interval", 15)
+        self.health_timeout = get_setting("cluster.health_timeout", 90)
+        self.summary_interval = get_setting("cluster.summary_interval", 60)
+        self.rebalance_interval = get_setting("cluster.rebalance_interval", 6 * 3600)
+        self.rebalance_threshold = get_setting("cluster.rebalance_threshold", 1.25)
+        health_file = get_setting("cluster.health_file", "data/cluster_health.json")
+        self.health_file = resolve_path(health_file) if health_file else None
+
+        self._context = multiprocessing.get_context("spawn")
+        self._queue = self._context.Queue()
+        self._processes: dict[int, multiprocessing.Process] = {}
+        self._health: dict[int, dict] = {}
+        self._last_seen: dict[int, float] = {}
+        self._spawned_at: dict[int, float] = {}
+        self._restarts: dict[int, int] = {}
+        self._restart_at: dict[int, float] = {}
+        self._stopping = False
+
+    # ------------------------------------------------------------------ #
+    # Processos
+    # ------------------------------------------------------------------ #
+    def _spawn(self, cluster_id: int):
+        shard_ids = self.assignment[cluster_id]
+        process = self._context.Process(
+            target=run_cluster,
+            args=(cluster_id, shard_ids, self.shard_count, self._queue, self.heartbeat_interval),
+            name=f"kali-cluster-{cluster_id}",
+        )
+        process.start()
+        self._processes[cluster_id] = process
+        self._spawned_at[cluster_id] = time.monotonic()
+        self._health.pop(cluster_id, None)
+        self._last_seen.pop(cluster_id, None)
+        logger.info("Cluster iniciado", extra={"cluster": cluster_id, "pid": process.pid, "shards": shard_ids})
+
+    def _terminate(self, cluster_id: int, timeout: float = 30.0):
+        process = self._processes.pop(cluster_id, None)
+        if process is None:
+            return
+        if process.is_alive():
+            process.terminate()
+            process.join(timeout)
+            if process.is_alive():
+                process.kill()
+                process.join()
+
+    def _startup_delay(self, cluster_id: int) -> float:
+        """Tempo para os shards do cluster se identificarem antes de iniciar o próximo."""
+        return IDENTIFY_INTERVAL * math.ceil(len(self.assignment[cluster_id]) / self.max_concurrency)
+
+    def _start_staggered(self, cluster_ids: list[int]):
+        for index, cluster_id in enumerate(cluster_ids):
+            self._spawn(cluster_id)
+            if index < len(cluster_ids) - 1:
+                deadline = time.monotonic() + self._startup_delay(cluster_id)
+                while time.monotonic() < deadline and not self._stopping:
+                    self._poll(min(1.0, deadline - time.monotonic()))
+                    if self._health.get(cluster_id, {}).get("ready"):
+                        break
+
+    def _schedule_restart(self, cluster_id: int, reason: str):
+        self._terminate(cluster_id)
+        restarts = self._restarts.get(cluster_id, 0) + 1
+        self._restarts[cluster_id] = restarts
+        backoff = min(2 ** (restarts - 1), MAX_RESTART_BACKOFF)
+        self._restart_at[cluster_id] = time.monotonic() + backoff
+        logger.warning("Cluster será reiniciado",
+                       extra={"cluster": cluster_id, "reason": reason, "restarts": restarts, "backoff_s": backoff})
+
+    # ------------------------------------------------------------------ #
+    # Monitoramento
+    # ------------------------------------------------------------------ #
+    def _poll(self, timeout: float):
+        """Lê os relatórios de saúde pendentes (esperando até `timeout` pelo primeiro)."""
+        try:
+            report = self._queue.get(timeout=max(timeout, 0.01))
+        except queue.Empty:
+            return
+        while True:
+            cluster_id = report.get("cluster")
+            if cluster_id in self._processes:
+                self._health[cluster_id] = report
+                self._last_seen[cluster_id] = time.monotonic()
+                if report.get("ready"):
+                    # Um cluster saudável volta a ter backoff mínimo
+                    self._restarts[cluster_id] = 0
+            try:
+                report = self._queue.get_nowait()
+            except queue.Empty:
+                return
+
+    def _check_clusters(self):
+        now = time.monotonic()
+        for cluster_id, process in list(self._processes.items()):
+            if not process.is_alive():
+                self._schedule_restart(cluster_id, f"processo saiu com código {process.exitcode}")
+                continue
+            last_seen = self._last_seen.get(cluster_id, self._spawned_at[cluster_id])
+            if now - last_seen > self.health_timeout:
+                self._schedule_restart(cluster_id, "sem relatório de saúde")
+        for cluster_id, restart_at in list(self._restart_at.items()):
+            if now >= restart_at:
+                del self._restart_at[cluster_id]
+                self._spawn(cluster_id)
+
+    def summary(self) -> dict:
+        """Resumo de saúde por cluster e totais."""
+        clusters = {}
+        for cluster_id, shard_ids in enumerate(self.assignment):
+            process = self._processes.get(cluster_id)
+            health = self._health.get(cluster_id, {})
+            clusters[cluster_id] = {
+                "pid": process.pid if process is not None else None,
+                "alive": process is not None and process.is_alive(),
+                "ready": health.get("ready", False),
+                "shards": shard_ids,
+                "guilds": health.get("guilds", 0),
+                "voice_clients": health.get("voice_clients", 0),
+                "players": health.get("players", 0),
+                "loop_lag_p99_ms": health.get("loop_lag_p99_ms", 0.0),
+                "rss_mb": health.get("rss_mb", 0.0),
+                "restarts": self._restarts.get(cluster_id, 0),
+                "last_report_s": (round(time.monotonic() - self._last_seen[cluster_id])
+                                  if cluster_id in self._last_seen else None),
+            }
+        return {
+            "shard_count": self.shard_count,
+            "clusters": clusters,
+            "guilds": sum(c["guilds"] for c in clusters.values()),
+            "voice_clients": sum(c["voice_clients"] for c in clusters.values()),
+        }
+
+    def _report_summary(self):
+        summary = self.summary()
+        for cluster_id, cluster in summary["clusters"].items():
+            logger.info("Saúde do cluster", extra={"cluster": cluster_id, **cluster})
+        if self.health_file:
+            os.makedirs(os.path.dirname(self.health_file), exist_ok=True)
+            tmp_path = self.health_file + ".tmp"
+            with open(tmp_path, "w", encoding="utf8") as f:
+                json.dump({"updated_at": time.time(), **summary}, f, indent=2)
+            os.replace(tmp_path, self.health_file)
+
+    def _maybe_rebalance(self):
+        """
+        Redistribui os shards se o cluster com mais guilds tiver mais que
+        `rebalance_threshold` vezes a média. Os clusters afetados são parados
+        antes de reiniciar com os novos shards, para que nenhum shard fique
+        conectado em dois processos ao mesmo tempo.
+        """
+        if len(self.assignment) < 2 or self._restart_at:
+            return
+        if not all(self._health.get(c, {}).get("ready") for c in range(len(self.assignment))):
+            return
+        guilds_per_shard = {}
+        for health in self._health.values():
+            for shard_id, shard in health["shards"].items():
+                guilds_per_shard[int(shard_id)] = shard["guilds"]
+        totals = [sum(guilds_per_shard.get(s, 0) for s in shards) for shards in self.assignment]
+        mean = sum(totals) / len(totals)
+        if not mean or max(totals) / mean <= self.rebalance_threshold:
+            return
+        new_assignment = balance_shards(guilds_per_shard, len(self.assignment))
+        changed = [c for c, shards in enumerate(new_assignment) if shards != self.assignment[c]]
+        if not changed:
+            return
+        logger.info("Redistribuindo shards", extra={"before": totals, "clusters": changed})
+        for cluster_id in changed:
+            self._terminate(cluster_id)
+        self.assignment = new_assignment
+        self._start_staggered(changed)
+
+    # ------------------------------------------------------------------ #
+    # Execução
+    # ------------------------------------------------------------------ #
+    def stop(self, *args):
+        self._stopping = True
+
+    def run(self):
+        signal.signal(signal.SIGTERM, self.stop)
+        logger.info("Iniciando clusters",
+                    extra={"shards": self.shard_count, "clusters": len(self.assignment)})
+        try:
+            self._start_staggered(list(range(len(self.assignment))))
+            next_summary = time.monotonic() + self.summary_interval
+            next_rebalance = time.monotonic() + self.rebalance_interval
+            while not self._stopping:
+                self._poll(1.0)
+                self._check_clusters()
+                now = time.monotonic()
+                if now >= next_summary:
+                    next_summary = now + self.summary_interval
+                    self._report_summary()
+                if now >= next_rebalance:
+                    next_rebalance = now + self.rebalance_interval
+                    self._maybe_rebalance()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            logger.info("Encerrando clusters")
+            for cluster_id in list(self._processes):
+                self._terminate(cluster_id)
+
+
+def run_supervisor(token: str, processes: int | None = None):
+    """Descobre a quantidade de shards e executa o supervisor até ser interrompido."""
+    shard_count = get_setting("cluster.shard_count")
+    max_concurrency = 1
+    if not shard_count:
+        shard_count, max_concurrency = asyncio.run(fetch_gateway_info(token))
+    processes = processes or get_setting("cluster.processes") or os.cpu_count() or 1
+    ClusterSupervisor(shard_count, processes, max_concurrency).run()
@@ -1,45 +1,52 @@
 # File: bot/main.py
-import os
-import sys
-import asyncio
-import discord
-from discord.ext import commands
-from dotenv import load_dotenv
+import time
+
+# Marca o início do processo para medir imports e o tempo até o ready
+LAUNCHED_AT = time.perf_counter()
+
+import os  # noqa: E402
+import sys  # noqa: E402
+import argparse  # noqa: E402
+import asyncio  # noqa: E402
+from dotenv import load_dotenv  # noqa: E402
 
 # Adiciona a raiz do projeto ao sys.path para que 'cogs' seja encontrado
 sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
 
+from utils.logging_utils import setup_logging  # noqa: E402
+from utils.metrics import STARTUP_SECONDS  # noqa: E402
+from utils.settings import get_setting  # noqa: E402
+
 load_dotenv()  # Carrega as variáveis do .env
 
 DISCORD_TOKEN = os.getenv("DISCORD_TOKEN")
 if not DISCORD_TOKEN:
     raise Exception("DISCORD_TOKEN não definido no .env!")
 
-intents = discord.Intents.default()
-bot = commands.Bot(command_prefix="!", intents=intents)
-
-@bot.event
-async def on_ready():
-    # Sincroniza os slash commands e exibe uma mensagem de conexão
-    await bot.tree.sync()
-    print(f"Bot {bot.user} está online!")
-
-async def load_extensions():
-    # Carrega todas as cogs presentes na pasta cogs/
-    for filename in os.listdir("./cogs"):
-        if filename.endswith(".py") and filename != "__init__.py":
-            extension = f"cogs.{filename[:-3]}"
-            try:
-                await bot.load_extension(extension)
-                print(f"Extensão {extension} carregada.")
-            except Exception as e:
-                print(f"Falha ao carregar a extensão {extension}: {e}")
-
-async def main():
-    # Usando o contexto assíncrono do bot para carregar as extensões e iniciar o bot
-    async with bot:
-        await load_extensions()
+
+async def run_bot():
+    # Processo único: o discord.py decide quantos shards usar e roda todos aqui
+    from bot.botclient import BotClient
+
+    STARTUP_SECONDS.set(time.perf_counter() - LAUNCHED_AT, phase="imports")
+    async with BotClient(launched_at=LAUNCHED_AT) as bot:
         await bot.start(DISCORD_TOKEN)
 
+
+def main():
+    parser = argparse.ArgumentParser(description="Kali - bot de música para Discord")
+    parser.add_argument("--cluster", action="store_true",
+                        help="Divide os shards entre vários processos (ver cluster: no settings.yaml)")
+    parser.add_argument("--processes", type=int, help="Quantidade de processos no modo cluster")
+    args = parser.parse_args()
+
+    setup_logging()
+    if args.cluster or get_setting("cluster.enabled", False):
+        from bot.cluster import run_supervisor
+        run_supervisor(DISCORD_TOKEN, args.processes)
+    else:
+        asyncio.run(run_bot())
+
+
 if __name__ == "__main__":
-    asyncio.run(main())
\ No newline at end of file
+    main()
@@ -1,23 +1,76 @@
 # File: cogs/music.py
+from __future__ import annotations
 
 import discord
 from discord.ext import commands
 from discord import app_commands
-from utils.music_utils import extract_song_info
-from utils.embed_utils import create_song_embed, create_queue_added_embed, create_queue_list_embed, format_time_value
-from services.youtube_service import get_youtube_song_info
+from utils.music_utils import (extract_song_info, extract_playlist_info, extraction_stats, is_playlist_url,
+                               match_playlist, resolve_stream)
+from utils.embed_utils import (create_song_embed, create_queue_added_embed, create_playlist_added_embed,
+                               create_stats_embed, format_time_value)
+from services.rate_governor import BACKGROUND, INTERACTIVE, close_rate_governors, request_priority
+from services.resource_governor import close_resource_governor, get_resource_governor
+from utils.guild_player import GuildPlayer, PlayerRegistry
+from utils.playback_stats import playback_stats
+from utils.player_store import close_player_store
+from utils.song_queue import SongQueue
+from utils.track import Platform
+from utils.track_index import get_track_index
+from utils.cache import get_song_cache
+from utils.lazy_import import lazy_import
+from utils.logging_utils import get_logger
+from utils.settings import get_setting
+from utils.metrics import (AUDIO_NODE_EVENTS, AUTOCOMPLETE_SECONDS, BACKEND_SECONDS, EXTRACT_SECONDS,
+                           FFMPEG_FIRST_PACKET_SECONDS, FFMPEG_PROCESSES, INTERACTION_SECONDS, LOOP_LAG_SECONDS,
+                           PLAYBACK_ERRORS, RATE_LIMITED, RECOVERIES, RECOVERY_SECONDS, SEARCH_OUTCOMES, STATUS_UPDATES,
+                           TRACK_GAP_SECONDS, TRACKS_PLAYED, VOICE_CLIENTS)
 import asyncio
-import datetime
+import time
 from discord.ui import View, Button
 
 ITEMS_PER_PAGE = 5
 
+# Serviços pesados só são importados no primeiro comando que os usa
+youtube_service = lazy_import("services.youtube_service")
+spotify_service = lazy_import("services.spotify_service")
+match_service = lazy_import("services.match_service")
+audio_cache = lazy_import("services.audio_cache")
+audio_node = lazy_import("services.audio_node_client")
+
+logger = get_logger("music")
+
+
+def _histogram_lines(histogram) -> str:
+    """Uma linha "p50 · p95 (n)" por série do histograma, em milissegundos."""
+    lines = []
+    for labels in histogram.series():
+        snap = histogram.snapshot(**labels)
+        name = f"**{' / '.join(labels.values())}**: " if labels else ""
+        lines.append(f"{name}p50 {snap['p50'] * 1000:.0f} ms · p95 {snap['p95'] * 1000:.0f} ms ({snap['count']})")
+    return "\n".join(lines) or "Sem dados"
+
+
+def _playback_cpu_lines() -> str:
+    """Uma linha por modo de áudio: sessões, horas tocadas e CPU por segundo de áudio."""
+    lines = []
+    for mode, summary in playback_stats.summary().items():
+        if not summary["sessions"]:
+            continue
+        lines.append(f"**{mode}**: {summary['sessions']} sessões, {format_time_value(int(summary['audio_seconds']))} · "
+                     f"FFmpeg {summary['ffmpeg_cpu_percent']:.1f}% · player {summary['player_cpu_percent']:.1f}%")
+    return "\n".join(lines) or "Sem dados"
+
+
 class QueuePaginator(View):
-    def __init__(self, queue: list[dict], start_time: datetime.datetime | None):
+    """
+    Paginação do /queue. Lê a fila compartilhada do player a cada página
+    (sem copiá-la): a página mostra a fila como ela está no clique, e a
+    view custa o mesmo com 10 ou 50.000 músicas.
+    """
+
+    def __init__(self, player: GuildPlayer):
         super().__init__(timeout=120)
-        self.queue = queue
-        self.start_time = start_time
-        self.currently_playing = queue[0] if queue else None
+        self.player = player
         self.page = 0
 
         self.prev_button = Button(label="< Anterior", style=discord.ButtonStyle.primary)
@@ -28,18 +81,23 @@ class QueuePaginator(View):
         self.add_item(self.next_button)
         self.update_buttons()
 
+    @property
+    def queue(self) -> SongQueue:
+        return self.player.queue
+
+    @property
+    def total_pages(self) -> int:
+        return max((len(self.queue) - 1) // ITEMS_PER_PAGE + 1, 1)
+
     def update_buttons(self):
-        total_pages = (len(self.queue) - 1) // ITEMS_PER_PAGE + 1
+        # A fila pode ter encolhido desde o último clique
+        self.page = min(self.page, self.total_pages - 1)
         self.prev_button.disabled = (self.page == 0)
-        self.next_button.disabled = (self.page >= total_pages - 1)
+        self.next_button.disabled = (self.page >= self.total_pages - 1)
 
     def build_embed(self, author_name: str, author_icon: str):
         # calcula tempo restante da faixa atual
-        remaining_current = 0.0
-        if self.currently_playing and self.start_time:
-            total_sec = int(self.currently_playing.get("duration", "0").split()[0])
-            elapsed = (datetime.datetime.utcnow() - self.start_time).total_seconds()
-            remaining_current = max(total_sec - elapsed, 0.0)
+        remaining_current = self.player._remaining_current()
 
         def fmt(sec: float) -> str:
             m, s = divmod(int(sec), 60)
@@ -50,23 +108,20 @@ class QueuePaginator(View):
 
         embed = discord.Embed(
             title="🎶 Fila de Músicas",
-            description=f"Página {self.page+1}/{(len(self.queue)-1)//ITEMS_PER_PAGE+1}",
+            description=f"Página {self.page+1}/{self.total_pages}",
             color=discord.Color.blue()
         )
 
-        cumulative = remaining_current
         start = self.page * ITEMS_PER_PAGE
         end = start + ITEMS_PER_PAGE
+        # O ETA do início da página vem da soma de prefixos da fila (O(log n))
+        cumulative = remaining_current + self.queue.eta(start)
 
-        for idx, song in enumerate(self.queue[start:end], start=start+1):
-            try:
-                dur_sec = int(song.get("duration", "0").split()[0])
-            except:
-                dur_sec = 0
+        for idx, dur_sec, song in self.queue.page(start, end):
             embed.add_field(
-                name=f"{idx}. {song.get('title', 'Desconhecido')}",
+                name=f"{idx + 1}. {song.title}",
                 value=(
-                    f"Plataforma: {song.get('platform', 'N/A')}\n"
+                    f"Plataforma: {song.platform.label}\n"
                     f"Duração: {fmt(dur_sec)}\n"
                     f"Estimado: {fmt(cumulative)}"
                 ),
@@ -86,8 +141,7 @@ class QueuePaginator(View):
         )
 
     async def on_next(self, interaction: discord.Interaction):
-        total_pages = (len(self.queue) - 1) // ITEMS_PER_PAGE + 1
-        self.page = min(self.page + 1, total_pages - 1)
+        self.page = min(self.page + 1, self.total_pages - 1)
         self.update_buttons()
         await interaction.response.edit_message(
             embed=self.build_embed(interaction.user.name, interaction.user.display_avatar.url),
@@ -98,10 +152,37 @@ class QueuePaginator(View):
 class Music(commands.Cog):
     def __init__(self, bot: commands.Bot):
         self.bot = bot
-        self.queue: list[dict] = []
-        self.loop_mode = False
-        self.currently_playing = None
-        self.start_time: datetime.datetime | None = None
+        # Um player (fila, faixa atual, loop) por guild
+        self.players = PlayerRegistry(bot)
+        self._restore_task: asyncio.Task | None = None
+
+    async def cog_load(self):
+        # Retoma em segundo plano as filas salvas antes do último desligamento
+        self._restore_task = asyncio.create_task(self.players.restore())
+        if get_setting("audio_cache.enabled", False) and get_setting("audio_cache.pinned", None):
+            # Faixas fixadas no settings.yaml: baixadas em segundo plano desde já
+            audio_cache.get_audio_cache().prefill()
+
+    async def cog_unload(self):
+        if self._restore_task is not None:
+            self._restore_task.cancel()
+        # Guarda a posição de quem está tocando antes de descartar os players
+        self.players.checkpoint()
+        self.players.close()
+        await close_player_store()
+        # Fecha apenas os serviços que chegaram a ser importados
+        if spotify_service.loaded:
+            await spotify_service.close_spotify_client()
+        if youtube_service.loaded:
+            await youtube_service.close_extraction_engine()
+        if match_service.loaded:
+            match_service.close_track_matcher()
+        if audio_cache.loaded:
+            await audio_cache.close_audio_cache()
+        if audio_node.loaded:
+            await audio_node.close_audio_node_client()
+        close_rate_governors()
+        close_resource_governor()
 
     async def ensure_voice(self, interaction: discord.Interaction) -> discord.VoiceClient:
         if interaction.guild is None:
@@ -114,7 +195,8 @@ class Music(commands.Cog):
             return None
 
         if not member.voice or not member.voice.channel:
-            await interaction.response.send_message("Você precisa estar conectado a um canal de voz para usar este comando.", ephemeral=True)
+            await interaction.response.send_message(
+                "Você precisa estar conectado a um canal de voz para usar este comando.", ephemeral=True)
             return None
 
         channel = member.voice.channel
@@ -123,70 +205,22 @@ class Music(commands.Cog):
         if voice_client is None:
             try:
                 voice_client = await channel.connect()
-                print(f"[DEBUG] Conectado ao canal de voz: {channel.name}")
+                logger.info("Conectado ao canal de voz", extra={"guild": interaction.guild.id, "channel": channel.name})
             except Exception as e:
                 await interaction.response.send_message(f"Erro ao conectar ao canal de voz: {e}", ephemeral=True)
-                print(f"[DEBUG] Erro ao conectar: {e}")
+                logger.warning("Erro ao conectar", extra={"guild": interaction.guild.id, "error": str(e)})
                 return None
         elif voice_client.channel != channel:
             try:
                 await voice_client.move_to(channel)
-                print(f"[DEBUG] Bot movido para o canal: {channel.name}")
+                logger.info("Bot movido para o canal", extra={"guild": interaction.guild.id, "channel": channel.name})
             except Exception as e:
                 await interaction.response.send_message(f"Erro ao mover para o seu canal de voz: {e}", ephemeral=True)
-                print(f"[DEBUG] Erro ao mover: {e}")
+                logger.warning("Erro ao mover", extra={"guild": interaction.guild.id, "error": str(e)})
                 return None
 
         return voice_client
 
-    async def _play_song(self, voice_client: discord.VoiceClient):
-        if not self.queue:
-            print("[DEBUG] A fila está vazia. Nada para tocar.")
-            return
-
-        current_song = self.queue[0]
-        self.currently_playing = current_song
-
-        if "audio_url" not in current_song or not current_song["audio_url"]:
-            print("[DEBUG] URL de áudio não encontrada na música:", current_song)
-            return
-
-        ffmpeg_options = {
-            'before_options': '-reconnect 1 -reconnect_streamed 1 -reconnect_delay_max 5',
-            'options': '-vn'
-        }
-        try:
-            source = discord.FFmpegPCMAudio(current_song["audio_url"], **ffmpeg_options)
-        except Exception as e:
-            print("[DEBUG] Erro ao criar a fonte de áudio:", e)
-            return
-
-        self.start_time = datetime.datetime.utcnow()
-
-        def after_play(error):
-            if error:
-                print("[DEBUG] Erro durante a reprodução:", error)
-            self.bot.loop.create_task(self._after_song(voice_client))
-
-        try:
-            voice_client.play(source, after=after_play)
-            print(f"[DEBUG] Reproduzindo: {current_song['title']}")
-        except Exception as e:
-            print("[DEBUG] Erro ao iniciar a reprodução:", e)
-
-    async def _after_song(self, voice_client: discord.VoiceClient):
-        if not self.loop_mode:
-            if self.queue:
-                self.queue.pop(0)
-
-        if self.queue:
-            await self._play_song(voice_client)
-        else:
-            await asyncio.sleep(1)
-            self.currently_playing = None
-            self.start_time = None
-            print("[DEBUG] Fim da fila. Nada mais a reproduzir.")
-
     @app_commands.command(name="join", description="Faz o bot entrar no canal de voz do usuário")
     async def join(self, interaction: discord.Interaction):
         if interaction.user.voice and interaction.user.voice.channel:
@@ -204,6 +238,8 @@ class Music(commands.Cog):
                 except Exception as e:
                     await interaction.response.send_message(f"Erro ao conectar ao canal: {e}", ephemeral=True)
                     return
+            # Registra o player: sem nada tocando, o bot sai do canal após o tempo de ociosidade
+            self.players.get(interaction.guild.id)
             await interaction.response.send_message(f"Conectado ao canal: {channel.name}", ephemeral=True)
         else:
             await interaction.response.send_message("Você não está em um canal de voz.", ephemeral=True)
@@ -222,54 +258,110 @@ class Music(commands.Cog):
 
     @app_commands.command(name="play", description="Toca uma música a partir de um link ou termo de busca")
     async def play(self, interaction: discord.Interaction, query: str):
-        await interaction.response.defer()
-        song = await extract_song_info(query)
-
-        if song["platform"].lower() == "spotify":
-            if " - " in song["title"]:
-                track_name, artist = song["title"].split(" - ", 1)
-                search_query = f"{track_name} {artist} audio"
-            else:
-                search_query = song["title"] + " audio"
-            song = await get_youtube_song_info(search_query)
-            if "open.spotify.com" in query.lower():
-                song["platform"] = "spotify"
-
-        self.queue.append(song)
+        if interaction.guild is None:
+            await interaction.response.send_message("Este comando só pode ser usado em servidores.", ephemeral=True)
+            return
+        # A resposta é só para quem pediu: o canal acompanha pela mensagem de status
+        await interaction.response.defer(ephemeral=True)
+        deferred_at = time.perf_counter()
+        if is_playlist_url(query):
+            await self._play_playlist(interaction, query, deferred_at)
+            return
+        # Opção do autocomplete (ou link já tocado): a faixa já está resolvida
+        # no índice e vai direto para a fila; o player renova o stream se preciso
+        index = get_track_index()
+        song = index.get(query) if index is not None else None
+        if song is None:
+            # Um usuário aguarda a resposta: passa à frente da antecipação e das importações
+            with request_priority(INTERACTIVE):
+                song = await extract_song_info(query)
+
+                if song.platform == Platform.SPOTIFY and "open.spotify.com" in query.lower():
+                    # Encontra o vídeo correspondente (índice persistente ou busca pontuada).
+                    # Faixas do Spotify vindas de uma busca resolvida no prazo ficam
+                    # para o player, como as faixas de playlist.
+                    await resolve_stream(song)
+
+        player = self.players.get(interaction.guild.id)
+        player.status.bind(interaction.channel)
+        player.queue.append(song)
         requester = interaction.user.name
         avatar = interaction.user.display_avatar.url
         voice_client = await self.ensure_voice(interaction)
         if voice_client is None:
             return
 
-        if not voice_client.is_playing() and self.currently_playing is None:
+        if not voice_client.is_playing() and player.currently_playing is None:
             embed = create_song_embed(song, requester, avatar)
-            await self._play_song(voice_client)
+            await player._play_song(voice_client)
         else:
-            position = len(self.queue)
-            def convert_duration(ds: str) -> int:
-                try:
-                    if "sec" in ds:
-                        return int(ds.split()[0])
-                    parts = [int(p) for p in ds.split(":")]
-                    if len(parts) == 2:
-                        return parts[0]*60 + parts[1]
-                    if len(parts) == 3:
-                        return parts[0]*3600 + parts[1]*60 + parts[2]
-                    return int(ds)
-                except:
-                    return 0
-
-            cum = sum(convert_duration(s.get("duration","0:00")) for s in self.queue[:-1])
+            position = len(player.queue)
             embed = create_queue_added_embed(
                 song,
-                format_time_value(cum),
-                format_time_value(convert_duration(song.get("duration","0:00"))),
+                format_time_value(player.queue.eta(position - 1)),
+                format_time_value(player.queue.duration_at(-1)),
                 position,
                 requester,
                 avatar
             )
         await interaction.followup.send(embed=embed)
+        INTERACTION_SECONDS.observe(time.perf_counter() - deferred_at, command="play")
+
+    @play.autocomplete("query")
+    async def play_autocomplete(self, interaction: discord.Interaction, current: str) -> list[app_commands.Choice[str]]:
+        # Responde só com o índice em memória: nada de rede dentro da janela de 3 s do Discord
+        index = get_track_index()
+        if index is None or current.lower().startswith(("http://", "https://")):
+            return []
+        started = time.perf_counter()
+        guild_id = interaction.guild.id if interaction.guild is not None else None
+        choices = [app_commands.Choice(name=name, value=value) for name, value in index.suggest(current, guild_id)]
+        AUTOCOMPLETE_SECONDS.observe(time.perf_counter() - started)
+        return choices
+
+    async def _play_playlist(self, interaction: discord.Interaction, query: str, deferred_at: float):
+        # Enfileira entradas leves; cada faixa só é resolvida perto de tocar
+        # Importação em lote: não deve atrasar os /play de outros usuários
+        with request_priority(BACKGROUND):
+            name, songs = await extract_playlist_info(query)
+        if not songs:
+            await interaction.followup.send("Nenhuma música encontrada na playlist.", ephemeral=True)
+            return
+
+        player = self.players.get(interaction.guild.id)
+        player.status.bind(interaction.channel)
+        position = len(player.queue) + 1
+        player.queue.extend(songs)
+        voice_client = await self.ensure_voice(interaction)
+        if voice_client is None:
+            return
+
+        platform = "spotify" if "spotify" in query.lower() else "youtube"
+        embed = create_playlist_added_embed(
+            name,
+            platform,
+            len(songs),
+            player.queue.total_duration - player.queue.eta(position - 1),
+            position,
+            interaction.user.name,
+            interaction.user.display_avatar.url
+        )
+        if not voice_client.is_playing() and player.currently_playing is None:
+            await player._play_song(voice_client)
+        if platform == "spotify":
+            # Depois da primeira faixa: as seguintes são associadas ao YouTube em lote
+            player.spawn(self._match_playlist(interaction.guild.id, songs))
+        await interaction.followup.send(embed=embed)
+        INTERACTION_SECONDS.observe(time.perf_counter() - deferred_at, command="play_playlist")
+
+    async def _match_playlist(self, guild_id: int, songs: list):
+        with request_priority(BACKGROUND):
+            try:
+                matched = await match_playlist(songs)
+            except Exception as e:
+                logger.warning("Falha ao associar a playlist ao YouTube", extra={"guild": guild_id, "error": str(e)})
+                return
+        logger.debug("Faixas da playlist associadas", extra={"guild": guild_id, "matched": matched})
 
     @app_commands.command(name="skip", description="Pula a música atual")
     async def skip(self, interaction: discord.Interaction):
@@ -283,41 +375,111 @@ class Music(commands.Cog):
     @app_commands.command(name="stop", description="Para a reprodução e limpa a fila")
     async def stop(self, interaction: discord.Interaction):
         vc = interaction.guild.voice_client
+        player = self.players.peek(interaction.guild.id)
+        if player is not None:
+            player.stop()
         if vc:
             vc.stop()
-        self.queue.clear()
-        self.currently_playing = None
-        self.start_time = None
         await interaction.response.send_message("Fila limpa e reprodução parada.", ephemeral=True)
 
     @app_commands.command(name="resume", description="Retoma a reprodução (não implementado para FFmpeg)")
     async def resume(self, interaction: discord.Interaction):
         vc = interaction.guild.voice_client
-        if vc and not vc.is_playing() and self.currently_playing:
+        player = self.players.peek(interaction.guild.id)
+        if vc and not vc.is_playing() and player and player.currently_playing:
             await interaction.response.send_message("Resume não disponível.", ephemeral=True)
         else:
             await interaction.response.send_message("Nada para retomar.", ephemeral=True)
 
     @app_commands.command(name="loop", description="Ativa ou desativa o loop da música atual")
     async def loop(self, interaction: discord.Interaction, mode: str):
+        player = self.players.get(interaction.guild.id)
         if mode.lower() == "on":
-            self.loop_mode = True
+            player.loop_mode = True
+            player.checkpoint()
+            player.status.invalidate()
             await interaction.response.send_message("Loop ativado.", ephemeral=True)
         elif mode.lower() == "off":
-            self.loop_mode = False
+            player.loop_mode = False
+            player.checkpoint()
+            player.status.invalidate()
             await interaction.response.send_message("Loop desativado.", ephemeral=True)
         else:
             await interaction.response.send_message("Use 'on' ou 'off'.", ephemeral=True)
 
     @app_commands.command(name="queue", description="Exibe a fila de músicas com paginação")
     async def queue_command(self, interaction: discord.Interaction):
-        if not self.queue:
+        player = self.players.peek(interaction.guild.id)
+        if player is None or not player.queue:
             await interaction.response.send_message("A fila está vazia.", ephemeral=True)
             return
 
-        paginator = QueuePaginator(self.queue.copy(), self.start_time)
+        paginator = QueuePaginator(player)
         embed = paginator.build_embed(interaction.user.name, interaction.user.display_avatar.url)
         await interaction.response.send_message(embed=embed, view=paginator)
 
+    @app_commands.command(name="stats", description="Exibe métricas de desempenho do bot")
+    async def stats(self, interaction: discord.Interaction):
+        registry = self.players.stats()
+        slots = get_resource_governor().stats()
+        engine = youtube_service.get_extraction_engine().stats()
+        cache = get_song_cache().stats()
+        flights = extraction_stats()
+        index = get_track_index()
+        indexed = index.stats()["tracks"] if index is not None else 0
+        searches = {outcome: SEARCH_OUTCOMES.value(outcome=outcome)
+                    for outcome in ("primary", "hedge", "cache_fallback", "failed")}
+        lag = LOOP_LAG_SECONDS.snapshot()
+        errors = sum(PLAYBACK_ERRORS.value(stage=stage)
+                     for stage in ("prefetch", "resolve", "source", "play", "stream"))
+        node = audio_node.get_audio_node_client().stats() if audio_node.loaded else None
+        node_line = (f"**Nó de áudio:** {'conectado' if node['connected'] else 'desconectado'}, "
+                     f"{node['sessions']} sessões agora, {node['opened']} abertas, "
+                     f"{AUDIO_NODE_EVENTS.value(event='fallback'):.0f} no FFmpeg local por falta do nó\n"
+                     ) if node is not None else ""
+        local_cache = audio_cache.get_audio_cache() if audio_cache.loaded else None
+        files = local_cache.stats() if local_cache is not None else None
+        files_line = (f"**Cache de áudio:** {files['hits']} acertos, {files['misses']} falhas, "
+                      f"{files['fills']} salvas, {files['evictions']} removidas, {files['pending']} na fila, "
+                      f"{files['pinned']} fixadas\n") if files is not None else ""
+        sections = {
+            "⏱️ Extração (por plataforma)": _histogram_lines(EXTRACT_SECONDS),
+            "🔌 Backends": _histogram_lines(BACKEND_SECONDS),
+            "💬 Defer → resposta": _histogram_lines(INTERACTION_SECONDS),
+            "🎧 Primeiro pacote do FFmpeg": _histogram_lines(FFMPEG_FIRST_PACKET_SECONDS),
+            "⏭️ Intervalo entre faixas": _histogram_lines(TRACK_GAP_SECONDS),
+            "🩹 Retomada de streams": _histogram_lines(RECOVERY_SECONDS),
+            "🎚️ CPU por modo de áudio": _playback_cpu_lines(),
+            "🖥️ Sistema": (
+                f"**Atraso do event loop:** p95 {lag['p95'] * 1000:.1f} ms · p99 {lag['p99'] * 1000:.1f} ms\n"
+                f"**Conexões de voz:** {VOICE_CLIENTS.value():.0f} (pico {registry['peak_voice_clients']})\n"
+                f"**Processos FFmpeg:** {FFMPEG_PROCESSES.value():.0f} · vagas {slots['active']}/{slots['limit']} "
+                f"(pico {slots['peak_active']}), {slots['waiting']} aguardando (pico {slots['peak_waiting']})\n"
+                f"{node_line}"
+                f"**Players:** {registry['players']} (pico {registry['peak_players']}, "
+                f"{registry['memory_bytes'] / 1024:.0f} KiB)\n"
+                f"**Fila de extração:** {engine['queue_depth']} aguardando, {engine['in_flight']} em andamento"
+            ),
+            "📊 Contadores": (
+                f"**Faixas tocadas:** {TRACKS_PLAYED.value():.0f}\n"
+                f"**Falhas de reprodução:** {errors:.0f}\n"
+                f"**Streams retomados:** {RECOVERIES.value(result='resumed'):.0f} "
+                f"({RECOVERIES.value(result='gave_up'):.0f} desistências)\n"
+                f"**Cache:** {cache['memory_hits']} acertos, {cache['memory_misses']} falhas\n"
+                f"{files_line}"
+                f"**Extrações agrupadas:** {flights['coalesced']} de {flights['leaders'] + flights['coalesced']} chamadas\n"
+                f"**Buscas:** {searches['primary']:.0f} pelo YouTube, {searches['hedge']:.0f} pela requisição extra, "
+                f"{searches['cache_fallback']:.0f} pelo cache no prazo, {searches['failed']:.0f} sem resultado\n"
+                f"**Autocomplete:** {indexed} faixas no índice, "
+                f"p95 {AUTOCOMPLETE_SECONDS.snapshot()['p95'] * 1000:.1f} ms\n"
+                f"**Mensagem de status:** {STATUS_UPDATES.value(result='edited'):.0f} edições, "
+                f"{STATUS_UPDATES.value(result='coalesced'):.0f} mudanças agrupadas\n"
+                f"**Limitações (429):** Spotify {RATE_LIMITED.value(provider='spotify'):.0f}, "
+                f"YouTube {RATE_LIMITED.value(provider='youtube'):.0f}"
+            ),
+        }
+        await interaction.response.send_message(embed=create_stats_embed(sections), ephemeral=True)
+
+
 async def setup(bot: commands.Bot):
-    await bot.add_cog(Music(bot))
\ No newline at end of file
+    await bot.add_cog(Music(bot))
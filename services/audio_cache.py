@@ -0,0 +1,240 @@
+# File: services/audio_cache.py
+from __future__ import annotations
+
+import asyncio
+import os
+import re
+import time
+from typing import Optional
+
+from services.rate_governor import BACKGROUND, request_priority
+from services.resource_governor import get_resource_governor
+from services.youtube_service import get_youtube_song_info
+from utils.cache import normalize_key
+from utils.logging_utils import get_logger
+from utils.settings import get_setting, resolve_path
+from utils.track import Track
+
+AUDIO_EXTENSION = ".opus"
+
+logger = get_logger("audio_cache")
+
+
+def video_id_of(song: Track) -> str | None:
+    """Retorna o ID do vídeo do YouTube da música (ou do vídeo associado a uma faixa do Spotify), se houver."""
+    key = normalize_key(song.url or song.source_url)
+    return key[3:] if key.startswith("yt:") else None
+
+
+def _pinned_video_id(entry: str) -> str | None:
+    """Aceita um link do YouTube ou o ID do vídeo (entradas de `audio_cache.pinned`)."""
+    key = normalize_key(str(entry))
+    if key.startswith("yt:"):
+        return key[3:]
+    entry = str(entry).strip()
+    return entry if re.fullmatch(r"[\w-]{11}", entry) else None
+
+
+class AudioCache:
+    """
+    Cache local de áudio (arquivos Opus indexados pelo ID do vídeo).
+
+    Faixas tocadas pelo menos `min_plays` vezes são baixadas em segundo plano
+    por uma task de preenchimento. As fixadas (`pinned`, links ou IDs de
+    vídeo) são baixadas por `prefill()` e nunca são removidas. Os arquivos são
+    escritos em um temporário e renomeados (escrita atômica) e, quando o
+    diretório passa de `max_bytes`, os menos usados recentemente são removidos
+    (o mtime de cada arquivo é atualizado a cada uso).
+    """
+
+    def __init__(self, directory: str, max_bytes: int, min_plays: int = 3, ffmpeg: str = "ffmpeg",
+                 pinned: list[str] = ()):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.min_plays = min_plays
+        self.ffmpeg = ffmpeg
+        self._plays: dict[str, int] = {}
+        self._pinned: set[str] = set()
+        for entry in pinned:
+            video_id = _pinned_video_id(entry)
+            if video_id is None:
+                logger.warning("Entrada fixada inválida no cache de áudio", extra={"entry": entry})
+            else:
+                self._pinned.add(video_id)
+        self._pending: set[str] = set()
+        self._queue: asyncio.Queue | None = None
+        self._filler: asyncio.Task | None = None
+        self.hits = 0
+        self.misses = 0
+        self.fills = 0
+        self.evictions = 0
+        os.makedirs(self.directory, exist_ok=True)
+
+    # ------------------------------------------------------------------ #
+    # Arquivos
+    # ------------------------------------------------------------------ #
+    def _path(self, video_id: str) -> str:
+        return os.path.join(self.directory, video_id + AUDIO_EXTENSION)
+
+    def has(self, song: Track) -> bool:
+        video_id = video_id_of(song)
+        return video_id is not None and os.path.exists(self._path(video_id))
+
+    def local_path(self, song: Track) -> str | None:
+        """Retorna o arquivo local da música (marcando-o como usado), ou None."""
+        video_id = video_id_of(song)
+        if video_id is None:
+            return None
+        path = self._path(video_id)
+        if not os.path.exists(path):
+            self.misses += 1
+            return None
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        self.hits += 1
+        return path
+
+    def _evict(self):
+        files = []
+        total = 0
+        for entry in os.scandir(self.directory):
+            if not entry.name.endswith(AUDIO_EXTENSION):
+                continue
+            stat = entry.stat()
+            total += stat.st_size
+            files.append((stat.st_mtime, stat.st_size, entry.path, entry.name[:-len(AUDIO_EXTENSION)]))
+        files.sort()
+        for _, size, path, video_id in files:
+            if total <= self.max_bytes:
+                break
+            if video_id in self._pinned:
+                continue
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total -= size
+            self.evictions += 1
+            logger.debug("Áudio removido do cache local", extra={"video_id": video_id})
+
+    def usage_bytes(self) -> int:
+        return sum(
+            entry.stat().st_size for entry in os.scandir(self.directory) if entry.name.endswith(AUDIO_EXTENSION)
+        )
+
+    # ------------------------------------------------------------------ #
+    # Preenchimento
+    # ------------------------------------------------------------------ #
+    def record_play(self, song: Track):
+        """Conta uma reprodução e agenda o download quando a faixa fica popular."""
+        video_id = video_id_of(song)
+        if video_id is None:
+            return
+        self._plays[video_id] = self._plays.get(video_id, 0) + 1
+        if self._plays[video_id] >= self.min_plays or video_id in self._pinned:
+            self._schedule(video_id, f"https://www.youtube.com/watch?v={video_id}")
+
+    def prefill(self):
+        """Agenda o download das faixas fixadas que ainda não estão no disco (requer o event loop)."""
+        for video_id in sorted(self._pinned):
+            self._schedule(video_id, f"https://www.youtube.com/watch?v={video_id}")
+
+    def _schedule(self, video_id: str, url: str):
+        if video_id in self._pending or os.path.exists(self._path(video_id)):
+            return
+        if self._queue is None:
+            self._queue = asyncio.Queue()
+        if self._filler is None or self._filler.done():
+            self._filler = asyncio.get_running_loop().create_task(self._fill_loop())
+        self._pending.add(video_id)
+        self._queue.put_nowait((video_id, url))
+
+    async def _fill_loop(self):
+        while True:
+            video_id, url = await self._queue.get()
+            try:
+                await self._download(video_id, url)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning("Falha ao salvar áudio no cache local", extra={"video_id": video_id, "error": str(e)})
+            finally:
+                self._pending.discard(video_id)
+                self._queue.task_done()
+
+    async def _download(self, video_id: str, url: str):
+        with request_priority(BACKGROUND):
+            song = await get_youtube_song_info(url)
+        codec = "copy" if song.codec in ("opus", "libopus") else "libopus"
+        final_path = self._path(video_id)
+        tmp_path = f"{final_path}.{os.getpid()}.tmp"
+        # O download é um FFmpeg como os de reprodução: entra no limite, atrás deles
+        slot = await get_resource_governor().acquire(None, priority=BACKGROUND)
+        started = time.perf_counter()
+        try:
+            process = await asyncio.create_subprocess_exec(
+                self.ffmpeg, "-nostdin", "-loglevel", "error", "-y",
+                "-reconnect", "1", "-reconnect_streamed", "1", "-reconnect_delay_max", "5",
+                "-i", song.audio_url, "-vn", "-map_metadata", "-1",
+                "-c:a", codec, "-f", "opus", tmp_path,
+                stdout=asyncio.subprocess.DEVNULL,
+                stderr=asyncio.subprocess.PIPE,
+            )
+            try:
+                _, stderr = await process.communicate()
+            except asyncio.CancelledError:
+                process.kill()
+                raise
+            finally:
+                if process.returncode != 0 and os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+        finally:
+            slot.release()
+        if process.returncode != 0:
+            raise Exception(stderr.decode(errors="ignore").strip() or f"ffmpeg saiu com código {process.returncode}")
+        # Renomeação atômica: leitores nunca veem um arquivo incompleto
+        os.replace(tmp_path, final_path)
+        self.fills += 1
+        logger.info("Áudio salvo no cache local",
+                    extra={"video_id": video_id, "seconds": round(time.perf_counter() - started, 1)})
+        await asyncio.to_thread(self._evict)
+
+    async def close(self):
+        if self._filler is not None:
+            self._filler.cancel()
+            self._filler = None
+
+    def stats(self) -> dict:
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "fills": self.fills,
+            "evictions": self.evictions,
+            "pending": len(self._pending),
+            "pinned": len(self._pinned),
+        }
+
+
+_audio_cache: Optional[AudioCache] = None
+
+
+def get_audio_cache() -> AudioCache | None:
+    """Retorna o cache de áudio local, ou None se estiver desativado no settings.yaml."""
+    global _audio_cache
+    if _audio_cache is None and get_setting("audio_cache.enabled", False):
+        _audio_cache = AudioCache(
+            resolve_path(get_setting("audio_cache.directory", "data/audio_cache")),
+            max_bytes=int(get_setting("audio_cache.max_size_mb", 2048)) * 1024 * 1024,
+            min_plays=get_setting("audio_cache.min_plays", 3),
+            pinned=get_setting("audio_cache.pinned", None) or [],
+        )
+    return _audio_cache
+
+
+async def close_audio_cache():
+    global _audio_cache
+    if _audio_cache is not None:
+        await _audio_cache.close()
+        _audio_cache = None
@@ -0,0 +1,315 @@
+# File: services/audio_node.py
+"""
+Nó de áudio: um processo à parte que cuida dos pipelines do FFmpeg de
+várias guilds (sonda do codec, conversão para Opus e separação do Ogg em
+pacotes) e entrega ao bot os pacotes Opus prontos, no ritmo em que o bot
+os consome.
+
+O bot continua dono da conexão de voz (UDP e criptografia ficam no
+discord.py); o que sai do processo do bot é o trabalho pesado, então ele
+não disputa CPU nem o GIL com o áudio, e a queda de um lado não derruba o
+outro: sem o nó, o bot volta a tocar com o FFmpeg local.
+
+Uso:
+    python -m services.audio_node                        # audio_node.address do settings.yaml
+    python -m services.audio_node --listen 127.0.0.1:7012
+
+Protocolo (uma conexão por processo do bot, várias sessões nela): cada
+quadro é um cabeçalho `<BII` (tipo, id da sessão, tamanho) seguido do
+conteúdo.
+
+  bot -> nó:  PLAY (JSON: source, offset, codec, bitrate, before_options),
+              STOP, SEEK (`<d` posição em segundos), ACK (`<I` pacotes tocados)
+  nó -> bot:  HELLO (JSON, ao conectar), AUDIO (um pacote Opus),
+              SEEKED (os pacotes seguintes já são da nova posição),
+              END (JSON: error, ou null no fim normal da faixa)
+
+O nó só envia até `window` pacotes além dos confirmados por ACK: o bot
+recebe alguns segundos de folga sem que a memória cresça se ele atrasar.
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import os
+import shlex
+import struct
+
+from utils.logging_utils import get_logger, setup_logging
+from utils.settings import get_setting, resolve_path
+
+PROTOCOL_VERSION = 1
+
+HEADER = struct.Struct("<BII")
+SEEK = struct.Struct("<d")
+ACK = struct.Struct("<I")
+
+# bot -> nó
+PLAY, STOP, SEEK_TO, ACK_PACKETS = 1, 2, 3, 4
+# nó -> bot
+HELLO, AUDIO, SEEKED, END = 16, 17, 18, 19
+
+# Pacotes de cabeçalho do Ogg/Opus que não são áudio
+_OPUS_HEADERS = (b"OpusHead", b"OpusTags")
+
+logger = get_logger("audio_node")
+
+
+def encode_frame(kind: int, session_id: int, payload: bytes = b"") -> bytes:
+    return HEADER.pack(kind, session_id, len(payload)) + payload
+
+
+async def read_frame(reader: asyncio.StreamReader) -> tuple[int, int, bytes]:
+    """Lê um quadro; levanta `asyncio.IncompleteReadError` quando a conexão fecha."""
+    kind, session_id, length = HEADER.unpack(await reader.readexactly(HEADER.size))
+    payload = await reader.readexactly(length) if length else b""
+    return kind, session_id, payload
+
+
+def parse_address(address: str) -> tuple[str, object]:
+    """"unix:<caminho>" -> ("unix", caminho absoluto); "host:porta" -> ("tcp", (host, porta))."""
+    if address.startswith("unix:"):
+        return "unix", resolve_path(address[len("unix:"):])
+    host, _, port = address.rpartition(":")
+    return "tcp", (host or "127.0.0.1", int(port))
+
+
+async def ogg_packets(stream: asyncio.StreamReader):
+    """Separa os pacotes Opus de um stream Ogg (pula os cabeçalhos OpusHead/OpusTags)."""
+    partial = b""
+    while True:
+        try:
+            header = await stream.readexactly(27)
+        except asyncio.IncompleteReadError as e:
+            if e.partial:
+                raise ValueError("Página Ogg truncada")
+            return
+        if header[:4] != b"OggS":
+            raise ValueError("Stream Ogg inválido")
+        table = await stream.readexactly(header[26])
+        body = await stream.readexactly(sum(table))
+        offset = 0
+        for lacing in table:
+            partial += body[offset:offset + lacing]
+            offset += lacing
+            # Segmentos de 255 bytes continuam o pacote (inclusive na próxima página)
+            if lacing < 255:
+                if not partial.startswith(_OPUS_HEADERS):
+                    yield partial
+                partial = b""
+
+
+async def probe(source: str) -> tuple[str, int]:
+    """(codec, bitrate em kbps) do primeiro stream de áudio, como o `FFmpegOpusAudio.probe`."""
+    process = await asyncio.create_subprocess_exec(
+        "ffprobe", "-v", "quiet", "-print_format", "json", "-show_streams", "-select_streams", "a:0", source,
+        stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.DEVNULL)
+    output, _ = await process.communicate()
+    streams = json.loads(output or b"{}").get("streams") or [{}]
+    stream = streams[0]
+    bitrate = int(stream.get("bit_rate") or 0) // 1000
+    return stream.get("codec_name") or "", min(bitrate or 128, 512)
+
+
+class NodeSession:
+    """Uma faixa tocando para uma guild: o FFmpeg e o envio dos pacotes com controle de fluxo."""
+
+    def __init__(self, connection: "NodeConnection", session_id: int, params: dict):
+        self.connection = connection
+        self.session_id = session_id
+        self.source = params["source"]
+        self.codec = params.get("codec") or ""
+        self.bitrate = int(params.get("bitrate") or 0)
+        self.before_options = params.get("before_options") or ""
+        self.sent = 0
+        self.acked = 0
+        self._credit = asyncio.Event()
+        self._task: asyncio.Task | None = None
+        self._process: asyncio.subprocess.Process | None = None
+        self.start(float(params.get("offset") or 0.0))
+
+    def start(self, offset: float, seeked: bool = False):
+        self._task = asyncio.create_task(self._run(offset, seeked))
+
+    async def seek(self, offset: float):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+        self.sent = self.acked = 0
+        self.start(offset, seeked=True)
+
+    def ack(self, count: int):
+        # Um ACK atrasado, de antes de um SEEK, não abre mais janela do que o enviado
+        self.acked = min(self.acked + count, self.sent)
+        self._credit.set()
+
+    def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+
+    async def _spawn(self, offset: float) -> asyncio.subprocess.Process:
+        if not self.codec:
+            self.codec, self.bitrate = await probe(self.source)
+        codec = "copy" if self.codec in ("opus", "libopus") else "libopus"
+        before = shlex.split(self.before_options)
+        if offset > 0:
+            before += ["-ss", f"{offset:.2f}"]
+        args = [*before, "-i", self.source, "-map_metadata", "-1", "-vn", "-f", "opus", "-c:a", codec,
+                "-ar", "48000", "-ac", "2", "-b:a", f"{min(self.bitrate or 128, 128)}k", "-loglevel", "warning",
+                "pipe:1"]
+        return await asyncio.create_subprocess_exec("ffmpeg", *args, stdout=asyncio.subprocess.PIPE,
+                                                    stderr=asyncio.subprocess.DEVNULL)
+
+    async def _run(self, offset: float, seeked: bool):
+        connection = self.connection
+        error = None
+        try:
+            self._process = await self._spawn(offset)
+            if seeked:
+                connection.send(SEEKED, self.session_id)
+            async for packet in ogg_packets(self._process.stdout):
+                while self.sent - self.acked >= connection.window:
+                    self._credit.clear()
+                    await self._credit.wait()
+                connection.send(AUDIO, self.session_id, packet)
+                self.sent += 1
+                await connection.drain()
+        except asyncio.CancelledError:
+            # STOP, SEEK ou a conexão caiu: nada a avisar
+            self._kill()
+            raise
+        except Exception as e:
+            error = str(e) or type(e).__name__
+            logger.warning("Falha no pipeline de áudio", extra={"session": self.session_id, "error": error})
+        finally:
+            self._kill()
+        connection.finish(self.session_id, error)
+
+    def _kill(self):
+        process, self._process = self._process, None
+        if process is not None and process.returncode is None:
+            process.kill()
+            # Recolhe o processo em segundo plano para não deixar zumbis
+            asyncio.ensure_future(process.wait())
+
+
+class NodeConnection:
+    """Uma conexão de um processo do bot; as sessões dela morrem junto com ela."""
+
+    def __init__(self, node: "AudioNode", reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self.node = node
+        self.reader = reader
+        self.writer = writer
+        self.window = node.window
+        self.sessions: dict[int, NodeSession] = {}
+
+    def send(self, kind: int, session_id: int, payload: bytes = b""):
+        if not self.writer.is_closing():
+            self.writer.write(encode_frame(kind, session_id, payload))
+
+    async def drain(self):
+        # Só espera o socket quando há bastante coisa no buffer
+        if self.writer.transport.get_write_buffer_size() > 64 * 1024:
+            await self.writer.drain()
+
+    def finish(self, session_id: int, error: str | None):
+        if self.sessions.pop(session_id, None) is not None:
+            self.send(END, session_id, json.dumps({"error": error}).encode())
+            self.node.finished += 1
+
+    async def serve(self):
+        self.send(HELLO, 0, json.dumps({"version": PROTOCOL_VERSION, "window": self.window,
+                                        "pid": os.getpid()}).encode())
+        try:
+            while True:
+                kind, session_id, payload = await read_frame(self.reader)
+                session = self.sessions.get(session_id)
+                if kind == PLAY:
+                    if session is not None:
+                        session.stop()
+                    self.sessions[session_id] = NodeSession(self, session_id, json.loads(payload))
+                    self.node.started += 1
+                elif session is None:
+                    continue
+                elif kind == STOP:
+                    self.sessions.pop(session_id, None)
+                    session.stop()
+                elif kind == SEEK_TO:
+                    await session.seek(SEEK.unpack(payload)[0])
+                elif kind == ACK_PACKETS:
+                    session.ack(ACK.unpack(payload)[0])
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            for session in self.sessions.values():
+                session.stop()
+            self.sessions.clear()
+            self.writer.close()
+
+
+class AudioNode:
+    """O servidor: aceita conexões dos processos do bot (Unix socket ou TCP)."""
+
+    def __init__(self, window: int = 150):
+        self.window = window
+        self.connections: set[NodeConnection] = set()
+        self.started = 0
+        self.finished = 0
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        connection = NodeConnection(self, reader, writer)
+        self.connections.add(connection)
+        logger.info("Bot conectado ao nó de áudio", extra={"connections": len(self.connections)})
+        try:
+            await connection.serve()
+        finally:
+            self.connections.discard(connection)
+            logger.info("Bot desconectado do nó de áudio", extra={"connections": len(self.connections)})
+
+    async def start(self, address: str) -> asyncio.AbstractServer:
+        kind, target = parse_address(address)
+        if kind == "unix":
+            directory = os.path.dirname(target)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            if os.path.exists(target):
+                os.unlink(target)
+            server = await asyncio.start_unix_server(self._handle, path=target)
+        else:
+            server = await asyncio.start_server(self._handle, *target)
+        logger.info("Nó de áudio ouvindo", extra={"address": address})
+        return server
+
+    async def serve_forever(self, address: str):
+        server = await self.start(address)
+        async with server:
+            await server.serve_forever()
+
+    def stats(self) -> dict:
+        return {
+            "connections": len(self.connections),
+            "sessions": sum(len(connection.sessions) for connection in self.connections),
+            "started": self.started,
+            "finished": self.finished,
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Kali - nó de áudio (FFmpeg e Opus fora do processo do bot)")
+    parser.add_argument("--listen", default=get_setting("audio_node.address", "unix:data/audio_node.sock"),
+                        help='"unix:<caminho>" ou "host:porta"')
+    parser.add_argument("--window", type=int, default=get_setting("audio_node.window", 150),
+                        help="Pacotes de 20 ms enviados à frente do que o bot já tocou")
+    args = parser.parse_args()
+
+    setup_logging()
+    try:
+        asyncio.run(AudioNode(window=args.window).serve_forever(args.listen))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,266 @@
+# File: services/audio_node_client.py
+from __future__ import annotations
+
+import asyncio
+import itertools
+import json
+import threading
+import time
+from collections import deque
+from typing import Optional
+
+import discord
+
+from services.audio_node import (ACK, ACK_PACKETS, AUDIO, END, HELLO, PLAY, PROTOCOL_VERSION, SEEK, SEEK_TO, SEEKED,
+                                 STOP, encode_frame, parse_address, read_frame)
+from utils.logging_utils import get_logger
+from utils.metrics import AUDIO_NODE_EVENTS
+from utils.settings import get_setting
+
+logger = get_logger("audio_node")
+
+
+class NodeAudioSource(discord.AudioSource):
+    """
+    Fonte de áudio alimentada pelo nó: os pacotes Opus chegam pelo socket (no
+    event loop) e o AudioPlayer do discord.py os consome na sua thread. A
+    cada `ack_every` pacotes tocados, o nó é avisado e libera mais pacotes.
+    """
+
+    def __init__(self, client: "AudioNodeClient", session_id: int, stall_timeout: float, ack_every: int = 25):
+        self.client = client
+        self.session_id = session_id
+        self.stall_timeout = stall_timeout
+        self.ack_every = ack_every
+        self.error: str | None = None
+        self._packets: deque[bytes] = deque()
+        self._cond = threading.Condition()
+        self._ended = False
+        # O nó já encerrou a sessão (END ou conexão perdida): não precisa de STOP
+        self._remote_done = False
+        self._seeking = False
+        self._unacked = 0
+
+    # Chamados no event loop pelo cliente
+    def feed(self, packet: bytes):
+        with self._cond:
+            if self._seeking:
+                # Pacote da posição antiga, enviado antes do nó receber o SEEK
+                return
+            self._packets.append(packet)
+            self._cond.notify()
+
+    def seeked(self):
+        with self._cond:
+            self._seeking = False
+            self._unacked = 0
+
+    def finish(self, error: str | None = None):
+        with self._cond:
+            self.error = error
+            self._ended = True
+            self._remote_done = True
+            self._cond.notify()
+
+    # Thread do AudioPlayer
+    def read(self) -> bytes:
+        with self._cond:
+            if not self._packets and not self._ended:
+                # O primeiro pacote pode demorar (o nó ainda está abrindo o stream)
+                self._cond.wait_for(lambda: self._packets or self._ended, timeout=self.stall_timeout)
+            if not self._packets:
+                if not self._ended:
+                    self.error = "sem pacotes do nó de áudio"
+                    self._ended = True
+                return b""
+            packet = self._packets.popleft()
+            self._unacked += 1
+            if self._unacked >= self.ack_every:
+                self.client.ack(self.session_id, self._unacked)
+                self._unacked = 0
+        return packet
+
+    def is_opus(self) -> bool:
+        return True
+
+    def seek(self, offset: float):
+        """Pede ao nó para recomeçar a faixa em `offset` segundos; o que já estava no buffer é descartado."""
+        with self._cond:
+            self._packets.clear()
+            self._seeking = True
+        self.client.seek(self.session_id, offset)
+
+    def cleanup(self):
+        # STOP só se a sessão ainda estiver no nó (o fim normal já chegou com END)
+        if not self._remote_done:
+            self._ended = self._remote_done = True
+            self.client.stop(self.session_id)
+        self.client.release(self.session_id)
+
+
+class AudioNodeClient:
+    """
+    Conexão do processo do bot com o nó de áudio (`services/audio_node.py`).
+
+    `open_source` pede ao nó para tocar uma faixa e devolve uma
+    `NodeAudioSource`; se o nó estiver fora do ar, devolve None e o player
+    usa o FFmpeg local. Depois de uma falha de conexão, o nó só é procurado
+    de novo após `retry_interval` segundos. Se a conexão cair no meio de
+    uma faixa, as sessões abertas terminam com erro e a retomada do player
+    (`-ss` na posição em que parou) cuida do resto.
+    """
+
+    def __init__(self, address: str, connect_timeout: float = 2.0, retry_interval: float = 30.0,
+                 stall_timeout: float = 10.0):
+        self.address = address
+        self.connect_timeout = connect_timeout
+        self.retry_interval = retry_interval
+        self.stall_timeout = stall_timeout
+        self._reader: asyncio.StreamReader | None = None
+        self._writer: asyncio.StreamWriter | None = None
+        self._reader_task: asyncio.Task | None = None
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._connecting: asyncio.Lock | None = None
+        self._retry_at = 0.0
+        # Janela do nó (do HELLO): o ACK sai antes de ela se esgotar
+        self._ack_every = 25
+        self._sessions: dict[int, NodeAudioSource] = {}
+        self._ids = itertools.count(1)
+        self.opened = 0
+
+    @property
+    def connected(self) -> bool:
+        return self._writer is not None and not self._writer.is_closing()
+
+    async def _connect(self):
+        kind, target = parse_address(self.address)
+        if kind == "unix":
+            opening = asyncio.open_unix_connection(target)
+        else:
+            opening = asyncio.open_connection(*target)
+        reader, writer = await asyncio.wait_for(opening, self.connect_timeout)
+        kind, _, payload = await asyncio.wait_for(read_frame(reader), self.connect_timeout)
+        hello = json.loads(payload) if kind == HELLO else {}
+        if hello.get("version") != PROTOCOL_VERSION:
+            writer.close()
+            raise ConnectionError(f"Versão do protocolo do nó incompatível: {hello.get('version')}")
+        self._ack_every = max(1, min(25, int(hello.get("window") or 150) // 3))
+        self._reader, self._writer = reader, writer
+        self._loop = asyncio.get_running_loop()
+        self._reader_task = asyncio.create_task(self._read_loop())
+        AUDIO_NODE_EVENTS.inc(event="connected")
+        logger.info("Conectado ao nó de áudio", extra={"address": self.address, "node_pid": hello.get("pid")})
+
+    async def ensure_connected(self) -> bool:
+        if self.connected:
+            return True
+        if time.monotonic() < self._retry_at:
+            return False
+        if self._connecting is None:
+            self._connecting = asyncio.Lock()
+        async with self._connecting:
+            if self.connected:
+                return True
+            try:
+                await self._connect()
+                return True
+            except (OSError, asyncio.TimeoutError, asyncio.IncompleteReadError, ValueError) as e:
+                self._retry_at = time.monotonic() + self.retry_interval
+                logger.warning("Nó de áudio indisponível; usando o FFmpeg local",
+                               extra={"address": self.address, "error": str(e)})
+                return False
+
+    async def _read_loop(self):
+        try:
+            while True:
+                kind, session_id, payload = await read_frame(self._reader)
+                source = self._sessions.get(session_id)
+                if source is None:
+                    continue
+                if kind == AUDIO:
+                    source.feed(payload)
+                elif kind == SEEKED:
+                    source.seeked()
+                elif kind == END:
+                    source.finish(json.loads(payload).get("error"))
+        except (asyncio.IncompleteReadError, ConnectionError) as e:
+            AUDIO_NODE_EVENTS.inc(event="disconnected")
+            logger.warning("Conexão com o nó de áudio perdida", extra={
+                "sessions": len(self._sessions), "error": str(e) or type(e).__name__})
+        finally:
+            self._disconnect("nó de áudio desconectado")
+
+    def _disconnect(self, error: str):
+        writer, self._writer = self._writer, None
+        if writer is not None:
+            writer.close()
+        for source in list(self._sessions.values()):
+            source.finish(error)
+
+    def _send(self, kind: int, session_id: int, payload: bytes = b""):
+        if self.connected:
+            self._writer.write(encode_frame(kind, session_id, payload))
+
+    def _send_threadsafe(self, kind: int, session_id: int, payload: bytes = b""):
+        # ACK e STOP partem da thread do AudioPlayer (read/cleanup)
+        if self._loop is not None and not self._loop.is_closed():
+            self._loop.call_soon_threadsafe(self._send, kind, session_id, payload)
+
+    async def open_source(self, source: str, offset: float = 0.0, codec: str = "", bitrate: int = 0,
+                          before_options: str = "") -> NodeAudioSource | None:
+        """Inicia a faixa no nó. None se o nó não estiver disponível (o chamador usa o FFmpeg local)."""
+        if not await self.ensure_connected():
+            AUDIO_NODE_EVENTS.inc(event="fallback")
+            return None
+        session_id = next(self._ids)
+        audio = NodeAudioSource(self, session_id, self.stall_timeout, ack_every=self._ack_every)
+        self._sessions[session_id] = audio
+        params = {"source": source, "offset": offset, "codec": codec, "bitrate": bitrate,
+                  "before_options": before_options}
+        self._send(PLAY, session_id, json.dumps(params).encode())
+        self.opened += 1
+        return audio
+
+    def ack(self, session_id: int, count: int):
+        self._send_threadsafe(ACK_PACKETS, session_id, ACK.pack(count))
+
+    def seek(self, session_id: int, offset: float):
+        self._send_threadsafe(SEEK_TO, session_id, SEEK.pack(offset))
+
+    def stop(self, session_id: int):
+        self._send_threadsafe(STOP, session_id)
+
+    def release(self, session_id: int):
+        self._sessions.pop(session_id, None)
+
+    async def close(self):
+        if self._reader_task is not None:
+            self._reader_task.cancel()
+            self._reader_task = None
+        self._disconnect("cliente encerrado")
+
+    def stats(self) -> dict:
+        return {"connected": self.connected, "sessions": len(self._sessions), "opened": self.opened}
+
+
+_client: Optional[AudioNodeClient] = None
+
+
+def get_audio_node_client() -> AudioNodeClient:
+    """Retorna o cliente compartilhado do nó de áudio, criando-o na primeira chamada."""
+    global _client
+    if _client is None:
+        _client = AudioNodeClient(
+            get_setting("audio_node.address", "unix:data/audio_node.sock"),
+            connect_timeout=get_setting("audio_node.connect_timeout", 2.0),
+            retry_interval=get_setting("audio_node.retry_interval", 30.0),
+            stall_timeout=get_setting("audio_node.stall_timeout", 10.0),
+        )
+    return _client
+
+
+async def close_audio_node_client():
+    global _client
+    if _client is not None:
+        await _client.close()
+        _client = None
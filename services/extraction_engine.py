@@ -0,0 +1,269 @@
+# File: services/extraction_engine.py
+from __future__ import annotations
+
+import asyncio
+import multiprocessing
+import os
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from services.rate_governor import RateLimited, current_priority, get_rate_governor
+from utils.logging_utils import get_logger
+from utils.metrics import BACKEND_ERRORS, BACKEND_SECONDS
+
+# Campos do resultado do yt-dlp que o bot realmente usa. Os workers devolvem
+# apenas esses campos, reduzindo o custo de serialização entre processos.
+_INFO_FIELDS = ("id", "title", "duration", "thumbnail", "webpage_url", "url",
+                "ext", "acodec", "abr", "uploader", "channel")
+
+# Estado de cada processo worker: uma instância de YoutubeDL criada uma única vez
+_worker_ytdl = None
+
+logger = get_logger("extraction")
+
+# Trechos das mensagens do yt-dlp quando o YouTube limita as requisições
+_THROTTLE_MARKERS = ("http error 429", "too many requests", "rate-limited", "confirm you're not a bot",
+                     "confirm you’re not a bot")
+
+
+def _is_throttled(error: Exception) -> bool:
+    message = str(error).lower()
+    return any(marker in message for marker in _THROTTLE_MARKERS)
+
+
+def _init_worker(ytdl_opts: dict):
+    """
+    Inicializa o processo worker: cria o `YoutubeDL` e carrega os cookies do
+    navegador uma única vez, deixando a instância pronta para as extrações.
+    """
+    global _worker_ytdl
+    import yt_dlp
+
+    _worker_ytdl = yt_dlp.YoutubeDL(ytdl_opts)
+    try:
+        # Acessar o cookiejar força o carregamento dos cookies agora, e não na
+        # primeira extração.
+        _worker_ytdl.cookiejar
+    except Exception as e:
+        logger.warning("Falha ao carregar cookies no worker", extra={"pid": os.getpid(), "error": str(e)})
+
+
+def _slim_info(info: dict) -> dict:
+    slim = {key: info.get(key) for key in _INFO_FIELDS if key in info}
+    if "entries" in info:
+        slim["entries"] = [_slim_info(entry) for entry in info["entries"] if entry]
+    return slim
+
+
+def _extract_in_worker(query: str, params: dict | None = None) -> dict:
+    """
+    Executa `extract_info` no worker. `params` permite sobrescrever opções
+    pontualmente (ex.: extração "flat" de playlists) sem recriar a instância.
+    """
+    ytdl = _worker_ytdl
+    saved = {}
+    if params:
+        for key, value in params.items():
+            saved[key] = ytdl.params.get(key)
+            ytdl.params[key] = value
+    try:
+        return _slim_info(ytdl.extract_info(query, download=False))
+    finally:
+        for key, value in saved.items():
+            ytdl.params[key] = value
+
+
+def _percentile(values, pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(int(round(pct / 100 * (len(ordered) - 1))), len(ordered) - 1)
+    return ordered[index]
+
+
+class ExtractionEngine:
+    """
+    Motor de extração do yt-dlp baseado em um pool limitado de processos.
+
+    Cada processo mantém um `YoutubeDL` já aquecido (cookies carregados). As
+    requisições entram em uma fila assíncrona e são consumidas por até
+    `workers` tarefas, cada uma com timeout próprio. Depois de
+    `max_jobs_per_worker` extrações por worker o pool é reciclado: um novo
+    pool assume as próximas requisições e o antigo termina as que já estão em
+    execução. Após um timeout (worker travado) ou a morte de um worker, os
+    processos do pool antigo são encerrados na hora; as extrações que estavam
+    neles são repetidas uma vez no pool novo. Cada pool tem uma geração, e só
+    a primeira falha de uma geração troca o pool.
+
+    A fila é ordenada pela prioridade de quem pediu (`request_priority`), e
+    cada extração passa pelo governador de requisições do YouTube: respostas
+    de limitação do yt-dlp (HTTP 429, "not a bot") pausam as extrações e são
+    repetidas com backoff.
+    """
+
+    def __init__(self, ytdl_opts: dict, workers: int | None = None, max_jobs_per_worker: int = 200,
+                 timeout: float = 30.0, max_queue: int = 1000):
+        self.ytdl_opts = ytdl_opts
+        self.workers = workers or min(os.cpu_count() or 1, 4)
+        self.max_jobs_per_worker = max_jobs_per_worker
+        self.timeout = timeout
+        self._queue: asyncio.PriorityQueue | None = None
+        self._sequence = 0
+        self._max_queue = max_queue
+        self._executor: ProcessPoolExecutor | None = None
+        self._consumers: list[asyncio.Task] = []
+        self._jobs_since_recycle = 0
+        self._generation = 0
+        self._in_flight = 0
+        self._counters = {"completed": 0, "failed": 0, "timeouts": 0, "recycles": 0}
+        self._wait_times = deque(maxlen=500)
+        self._run_times = deque(maxlen=500)
+
+    # ------------------------------------------------------------------ #
+    # Ciclo de vida
+    # ------------------------------------------------------------------ #
+    def _new_executor(self) -> ProcessPoolExecutor:
+        # "spawn" evita herdar, via fork, threads do discord.py em estado inconsistente
+        return ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker,
+            initargs=(self.ytdl_opts,),
+        )
+
+    def start(self):
+        if self._consumers:
+            return
+        self._queue = asyncio.PriorityQueue(maxsize=self._max_queue)
+        self._executor = self._new_executor()
+        self._consumers = [asyncio.create_task(self._consume()) for _ in range(self.workers)]
+
+    async def close(self):
+        for task in self._consumers:
+            task.cancel()
+        self._consumers = []
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    def _recycle(self, generation: int | None = None, kill: bool = False):
+        """
+        Troca o pool. Com `generation`, só troca se o pool ainda for dessa
+        geração (várias falhas do mesmo pool trocam uma vez só). Com `kill`,
+        os processos do pool antigo são encerrados em vez de terminarem o que
+        estão fazendo.
+        """
+        if generation is not None and generation != self._generation:
+            return
+        old = self._executor
+        self._executor = self._new_executor()
+        self._generation += 1
+        self._jobs_since_recycle = 0
+        self._counters["recycles"] += 1
+        if old is not None:
+            if kill:
+                # Um worker travado nunca devolveria o processo: encerra o pool inteiro
+                for process in list((getattr(old, "_processes", None) or {}).values()):
+                    process.kill()
+                old.shutdown(wait=False, cancel_futures=True)
+            else:
+                # As extrações em andamento no pool antigo terminam normalmente
+                old.shutdown(wait=False)
+        logger.info("Pool de extração reciclado", extra={"recycles": self._counters["recycles"], "killed": kill})
+
+    # ------------------------------------------------------------------ #
+    # Extração
+    # ------------------------------------------------------------------ #
+    async def extract(self, query: str, params: dict | None = None, timeout: float | None = None) -> dict:
+        """
+        Enfileira uma extração e aguarda o resultado (já reduzido aos campos
+        usados). Pedidos de maior prioridade saem da fila primeiro; dentro da
+        mesma prioridade, a ordem de chegada é mantida.
+        """
+        self.start()
+        future = asyncio.get_running_loop().create_future()
+        priority = current_priority()
+        self._sequence += 1
+        await self._queue.put((priority, self._sequence, query, params, timeout or self.timeout, future,
+                               time.perf_counter()))
+        return await future
+
+    async def _consume(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            priority, _, query, params, timeout, future, enqueued_at = await self._queue.get()
+            try:
+                if future.cancelled():
+                    continue
+                started = time.perf_counter()
+                self._wait_times.append(started - enqueued_at)
+                if self._jobs_since_recycle >= self.max_jobs_per_worker * self.workers:
+                    self._recycle()
+                self._jobs_since_recycle += 1
+                self._in_flight += 1
+
+                async def attempt():
+                    # Quem pediu pode ter desistido enquanto esperava a vez no governador
+                    if future.cancelled():
+                        return None
+                    return await self._run(loop, query, params, timeout)
+
+                try:
+                    result = await get_rate_governor("youtube").call(attempt, priority=priority)
+                except asyncio.TimeoutError:
+                    self._counters["timeouts"] += 1
+                    BACKEND_ERRORS.inc(backend="ytdlp")
+                    if not future.done():
+                        future.set_exception(Exception(f"Tempo limite excedido ao extrair: {query}"))
+                except Exception as e:
+                    self._counters["failed"] += 1
+                    BACKEND_ERRORS.inc(backend="ytdlp")
+                    if not future.done():
+                        future.set_exception(e)
+                else:
+                    self._counters["completed"] += 1
+                    if not future.done():
+                        future.set_result(result)
+                finally:
+                    self._in_flight -= 1
+                    self._run_times.append(time.perf_counter() - started)
+                    BACKEND_SECONDS.observe(self._run_times[-1], backend="ytdlp")
+            finally:
+                self._queue.task_done()
+
+    async def _submit(self, loop, query: str, params: dict | None, timeout: float) -> dict:
+        generation = self._generation
+        try:
+            call = loop.run_in_executor(self._executor, _extract_in_worker, query, params)
+            return await asyncio.wait_for(call, timeout)
+        except (asyncio.TimeoutError, BrokenProcessPool):
+            # Worker preso ou morto: o pool desta geração é substituído e os processos encerrados
+            self._recycle(generation, kill=True)
+            raise
+
+    async def _run(self, loop, query: str, params: dict | None, timeout: float) -> dict:
+        try:
+            try:
+                return await self._submit(loop, query, params, timeout)
+            except BrokenProcessPool:
+                # Um worker morreu (ou o pool foi encerrado por um timeout): tenta uma única vez no pool novo
+                return await self._submit(loop, query, params, timeout)
+        except Exception as e:
+            if _is_throttled(e):
+                raise RateLimited(f"YouTube limitou as requisições: {e}") from e
+            raise
+
+    def stats(self) -> dict:
+        """Profundidade da fila, extrações em andamento, contadores e latências (segundos)."""
+        return {
+            "workers": self.workers,
+            "queue_depth": self._queue.qsize() if self._queue is not None else 0,
+            "in_flight": self._in_flight,
+            **self._counters,
+            "wait_p50": _percentile(self._wait_times, 50),
+            "wait_p95": _percentile(self._wait_times, 95),
+            "run_p50": _percentile(self._run_times, 50),
+            "run_p95": _percentile(self._run_times, 95),
+        }
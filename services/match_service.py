@@ -0,0 +1,232 @@
+# File: services/match_service.py
+from __future__ import annotations
+
+import asyncio
+import difflib
+import os
+import re
+import sqlite3
+import threading
+import time
+from typing import Optional
+
+from services.youtube_service import search_youtube_candidates
+from utils.logging_utils import get_logger
+from utils.settings import get_setting, resolve_path
+from utils.track import Track
+
+logger = get_logger("match")
+
+# Palavras que indicam uma versão diferente da faixa original
+_VERSION_MARKERS = ("live", "ao vivo", "cover", "remix", "karaoke", "instrumental", "sped up", "slowed", "8d")
+# Ruído comum em títulos do YouTube que não ajuda na comparação
+_TITLE_NOISE = re.compile(
+    r"\((?:official|oficial|lyric|lyrics|audio|áudio|video|vídeo|visualizer|hd|4k)[^)]*\)"
+    r"|\[(?:official|oficial|lyric|lyrics|audio|áudio|video|vídeo|visualizer|hd|4k)[^\]]*\]"
+    r"|official (?:music )?video|lyrics?|audio oficial|áudio oficial|- topic",
+    re.IGNORECASE,
+)
+
+
+def _normalize(text: str) -> str:
+    text = _TITLE_NOISE.sub(" ", text.lower())
+    text = re.sub(r"[^\w\s]", " ", text)
+    return " ".join(text.split())
+
+
+def score_candidate(song: Track, candidate: dict) -> float:
+    """
+    Pontua (0 a 1) o quanto um vídeo do YouTube corresponde a uma faixa do
+    Spotify, combinando a proximidade da duração e a semelhança dos títulos.
+    """
+    expected = song.duration
+    actual = int(candidate.get("duration") or 0)
+    if expected and actual:
+        # Diferenças de até ~3 s são normais (silêncio, intro); acima de 30 s zera
+        duration_score = max(0.0, 1.0 - max(abs(expected - actual) - 3, 0) / 27)
+    else:
+        duration_score = 0.5
+
+    wanted = _normalize(song.title.replace(" - ", " "))
+    found = _normalize(f"{candidate.get('title') or ''} {candidate.get('channel') or candidate.get('uploader') or ''}")
+    title_score = difflib.SequenceMatcher(None, wanted, found).ratio()
+    wanted_tokens = set(wanted.split())
+    if wanted_tokens:
+        title_score = max(title_score, len(wanted_tokens & set(found.split())) / len(wanted_tokens))
+
+    penalty = 0.0
+    original = song.title.lower()
+    candidate_title = (candidate.get("title") or "").lower()
+    for marker in _VERSION_MARKERS:
+        if marker in candidate_title and marker not in original:
+            penalty += 0.25
+    return max(0.0, 0.55 * duration_score + 0.45 * title_score - penalty)
+
+
+class MatchIndex:
+    """
+    Índice persistente (SQLite) de correspondências Spotify → YouTube, com
+    chaves "sp:<track id>" e "isrc:<código>". As consultas ao disco rodam em
+    thread para não bloquear o event loop; um dicionário em memória evita
+    consultas repetidas.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._memory: dict[str, str] = {}
+        self._conn: sqlite3.Connection | None = None
+        # A mesma conexão é usada pelas threads de `asyncio.to_thread`
+        self._lock = threading.Lock()
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._conn = sqlite3.connect(self.path, check_same_thread=False)
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS matches ("
+                "key TEXT PRIMARY KEY, video_id TEXT NOT NULL, score REAL, updated_at REAL)"
+            )
+            self._conn.commit()
+        return self._conn
+
+    def _lookup(self, keys: list[str]) -> str | None:
+        placeholders = ",".join("?" for _ in keys)
+        with self._lock:
+            conn = self._connect()
+            row = conn.execute(f"SELECT video_id FROM matches WHERE key IN ({placeholders}) LIMIT 1", keys).fetchone()
+        return row[0] if row else None
+
+    def _store(self, keys: list[str], video_id: str, score: float):
+        now = time.time()
+        with self._lock:
+            conn = self._connect()
+            conn.executemany(
+                "INSERT OR REPLACE INTO matches (key, video_id, score, updated_at) VALUES (?, ?, ?, ?)",
+                [(key, video_id, score, now) for key in keys],
+            )
+            conn.commit()
+
+    async def get(self, keys: list[str]) -> str | None:
+        for key in keys:
+            if key in self._memory:
+                return self._memory[key]
+        video_id = await asyncio.to_thread(self._lookup, keys)
+        if video_id:
+            for key in keys:
+                self._memory[key] = video_id
+        return video_id
+
+    async def put(self, keys: list[str], video_id: str, score: float):
+        for key in keys:
+            self._memory[key] = video_id
+        await asyncio.to_thread(self._store, keys, video_id, score)
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+
+def _index_keys(song: Track) -> list[str]:
+    keys = []
+    if song.spotify_id:
+        keys.append(f"sp:{song.spotify_id}")
+    if song.isrc:
+        keys.append(f"isrc:{song.isrc}")
+    return keys
+
+
+class TrackMatcher:
+    """
+    Encontra o vídeo do YouTube correspondente a uma faixa do Spotify.
+
+    Primeiro consulta o índice persistente; se não houver correspondência,
+    faz uma busca "flat" (sem resolver os vídeos) limitada por um semáforo,
+    pontua os candidatos por duração e título e grava o melhor no índice.
+    Se nenhum candidato atingir `min_score` (a faixa provavelmente não existe
+    no YouTube), nada é gravado e vale o primeiro resultado da busca, como
+    numa busca comum; a próxima reprodução tenta de novo.
+    """
+
+    def __init__(self, index: MatchIndex, concurrency: int = 4, candidates: int = 5, min_score: float = 0.6):
+        self.index = index
+        self.candidates = candidates
+        self.min_score = min_score
+        self._semaphore = asyncio.Semaphore(concurrency)
+        self.index_hits = 0
+        self.searches = 0
+        self.low_scores = 0
+
+    async def find_video_id(self, song: Track) -> str:
+        keys = _index_keys(song)
+        if keys:
+            video_id = await self.index.get(keys)
+            if video_id:
+                self.index_hits += 1
+                return video_id
+
+        query = song.search_query or f"{song.title} audio"
+        async with self._semaphore:
+            self.searches += 1
+            candidates = await search_youtube_candidates(query, limit=self.candidates)
+        if not candidates:
+            raise Exception("Não foi possível encontrar a música no YouTube.")
+
+        best = max(candidates, key=lambda candidate: score_candidate(song, candidate))
+        score = score_candidate(song, best)
+        if score < self.min_score:
+            self.low_scores += 1
+            logger.debug("Nenhum candidato confiável; usando o primeiro resultado da busca",
+                         extra={"track": song.title, "video": candidates[0].get("title"), "score": round(score, 2)})
+            return candidates[0]["id"]
+        if keys:
+            await self.index.put(keys, best["id"], score)
+        logger.debug("Correspondência encontrada",
+                     extra={"track": song.title, "video": best.get("title"), "score": round(score, 2)})
+        return best["id"]
+
+    async def match_many(self, songs: list[Track]) -> list[str | None]:
+        """Resolve vários vídeos em paralelo (respeitando o semáforo); falhas viram None."""
+        results = await asyncio.gather(*(self.find_video_id(song) for song in songs), return_exceptions=True)
+        return [None if isinstance(result, BaseException) else result for result in results]
+
+    def stats(self) -> dict:
+        return {"index_hits": self.index_hits, "searches": self.searches, "low_scores": self.low_scores}
+
+
+_matcher: Optional[TrackMatcher] = None
+
+
+def get_track_matcher() -> TrackMatcher:
+    """Retorna o matcher compartilhado, criando-o (e abrindo o índice) na primeira chamada."""
+    global _matcher
+    if _matcher is None:
+        _matcher = TrackMatcher(
+            MatchIndex(resolve_path(get_setting("matching.index_path", "data/match_index.sqlite3"))),
+            concurrency=get_setting("matching.concurrency", 4),
+            candidates=get_setting("matching.candidates", 5),
+            min_score=get_setting("matching.min_score", 0.6),
+        )
+    return _matcher
+
+
+def set_track_matcher(matcher: TrackMatcher | None):
+    """Substitui o matcher compartilhado (ex.: por um com índice em memória nos benchmarks)."""
+    global _matcher
+    _matcher = matcher
+
+
+def close_track_matcher():
+    global _matcher
+    if _matcher is not None:
+        _matcher.index.close()
+        _matcher = None
+
+
+async def match_spotify_track(song: Track) -> str:
+    """Retorna a URL do vídeo do YouTube correspondente à faixa do Spotify."""
+    video_id = await get_track_matcher().find_video_id(song)
+    return f"https://www.youtube.com/watch?v={video_id}"
@@ -0,0 +1,82 @@
+# File: services/metrics_server.py
+from __future__ import annotations
+
+import asyncio
+from typing import Optional
+
+from aiohttp import web
+
+from utils.logging_utils import get_logger
+from utils.metrics import VOICE_CLIENTS, metrics, monitor_event_loop
+from utils.settings import get_setting
+
+logger = get_logger("metrics")
+
+
+class MetricsServer:
+    """
+    Servidor HTTP mínimo (aiohttp) dentro do processo do bot: `/metrics`
+    devolve as métricas no formato de texto do Prometheus e `/healthz`
+    responde "ok".
+    """
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 9108):
+        self.host = host
+        self.port = port
+        self._runner: web.AppRunner | None = None
+
+    async def _metrics(self, request: web.Request) -> web.Response:
+        return web.Response(text=metrics.render(), content_type="text/plain", charset="utf-8",
+                            headers={"X-Content-Type-Options": "nosniff"})
+
+    async def _health(self, request: web.Request) -> web.Response:
+        return web.Response(text="ok")
+
+    async def start(self):
+        app = web.Application()
+        app.router.add_get("/metrics", self._metrics)
+        app.router.add_get("/healthz", self._health)
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        await web.TCPSite(self._runner, self.host, self.port).start()
+        logger.info("Endpoint de métricas iniciado", extra={"host": self.host, "port": self.port})
+
+    async def close(self):
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+
+
+_server: Optional[MetricsServer] = None
+_lag_task: Optional[asyncio.Task] = None
+
+
+async def start_metrics_server(bot, port: int | None = None) -> MetricsServer | None:
+    """
+    Registra as métricas que dependem do bot, inicia a medição do atraso do
+    event loop e, se `metrics.enabled` estiver ativo, o endpoint HTTP (em
+    `port` ou, por padrão, em `metrics.port`).
+    """
+    global _server, _lag_task
+    VOICE_CLIENTS.set_function(lambda: len(bot.voice_clients))
+    if _lag_task is None:
+        _lag_task = asyncio.create_task(monitor_event_loop(get_setting("metrics.loop_lag_interval", 0.5)))
+    if _server is not None or not get_setting("metrics.enabled", True):
+        return _server
+    _server = MetricsServer(host=get_setting("metrics.host", "127.0.0.1"), port=port or get_setting("metrics.port", 9108))
+    try:
+        await _server.start()
+    except OSError as e:
+        logger.error("Não foi possível iniciar o endpoint de métricas", extra={"error": str(e)})
+        _server = None
+    return _server
+
+
+async def close_metrics_server():
+    global _server, _lag_task
+    if _lag_task is not None:
+        _lag_task.cancel()
+        _lag_task = None
+    if _server is not None:
+        await _server.close()
+        _server = None
@@ -0,0 +1,223 @@
+# File: services/rate_governor.py
+from __future__ import annotations
+
+import asyncio
+import heapq
+import itertools
+import random
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from utils.logging_utils import get_logger
+from utils.metrics import RATE_LIMIT_WAIT_SECONDS, RATE_LIMITED
+from utils.settings import get_setting
+
+logger = get_logger("rate_governor")
+
+# Prioridades (menor = atendida antes)
+INTERACTIVE = 0  # /play de um usuário aguardando a resposta
+NORMAL = 1       # faixa que vai tocar agora
+BACKGROUND = 2   # antecipação, importação de playlists, cache de áudio
+
+PRIORITY_NAMES = {INTERACTIVE: "interactive", NORMAL: "normal", BACKGROUND: "background"}
+
+# Herdada pelas tasks criadas dentro do contexto (asyncio copia o contexto)
+_priority: ContextVar[int] = ContextVar("kali_request_priority", default=NORMAL)
+
+
+def current_priority() -> int:
+    return _priority.get()
+
+
+@contextmanager
+def request_priority(level: int):
+    """Define a prioridade das requisições feitas dentro do bloco (e das tasks criadas nele)."""
+    token = _priority.set(level)
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
+
+class RateLimited(Exception):
+    """O provedor recusou a requisição por excesso (HTTP 429 ou equivalente)."""
+
+    def __init__(self, message: str, retry_after: float | None = None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class RateGovernor:
+    """
+    Controla o ritmo das requisições a um provedor:
+
+      - token bucket com `rate` requisições/s e rajadas de até `burst`;
+      - os pedidos aguardam em uma fila de prioridade, então um `/play`
+        interativo passa à frente da antecipação e das importações em lote;
+      - em `RateLimited`, todas as requisições ao provedor pausam pelo
+        `Retry-After` (ou por um backoff exponencial com jitter) e a taxa cai
+        pela metade; depois ela volta a subir aos poucos até `rate` (AIMD).
+    """
+
+    def __init__(self, name: str, rate: float, burst: int, max_retries: int = 4,
+                 base_backoff: float = 1.0, max_backoff: float = 60.0, min_rate: float | None = None):
+        self.name = name
+        self.max_rate = rate
+        self.rate = rate
+        self.min_rate = min_rate if min_rate is not None else rate / 8
+        self.burst = burst
+        self.max_retries = max_retries
+        self.base_backoff = base_backoff
+        self.max_backoff = max_backoff
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._waiters: list[tuple[int, int, asyncio.Future]] = []
+        self._sequence = itertools.count()
+        self._pump: asyncio.Task | None = None
+        self._counters = {"granted": 0, "rate_limited": 0, "retries": 0, "gave_up": 0}
+
+    # ------------------------------------------------------------------ #
+    # Token bucket
+    # ------------------------------------------------------------------ #
+    def _refill(self, now: float):
+        elapsed = now - self._updated
+        self._updated = now
+        self._tokens = min(self.burst, self._tokens + elapsed * self.rate)
+        # Recuperação aditiva da taxa depois de um 429
+        if self.rate < self.max_rate:
+            self.rate = min(self.max_rate, self.rate + elapsed * self.max_rate / 60)
+
+    def _wait_time(self, now: float) -> float:
+        self._refill(now)
+        if now < self._paused_until:
+            return self._paused_until - now
+        if self._tokens >= 1:
+            return 0.0
+        return (1 - self._tokens) / self.rate
+
+    async def acquire(self, priority: int | None = None):
+        """Aguarda a vez (por prioridade) e consome um token."""
+        priority = current_priority() if priority is None else priority
+        started = time.monotonic()
+        if not self._waiters and self._wait_time(started) == 0:
+            self._tokens -= 1
+        else:
+            future = asyncio.get_running_loop().create_future()
+            heapq.heappush(self._waiters, (priority, next(self._sequence), future))
+            if self._pump is None or self._pump.done():
+                self._pump = asyncio.create_task(self._run_pump())
+            await future
+        self._counters["granted"] += 1
+        RATE_LIMIT_WAIT_SECONDS.observe(time.monotonic() - started, provider=self.name,
+                                        priority=PRIORITY_NAMES.get(priority, str(priority)))
+
+    async def _run_pump(self):
+        while self._waiters:
+            wait = self._wait_time(time.monotonic())
+            if wait > 0:
+                await asyncio.sleep(wait)
+                continue
+            _, _, future = heapq.heappop(self._waiters)
+            if future.done():
+                # Quem esperava foi cancelado: o token fica para o próximo
+                continue
+            self._tokens -= 1
+            future.set_result(None)
+
+    # ------------------------------------------------------------------ #
+    # Chamadas com backoff
+    # ------------------------------------------------------------------ #
+    def _backoff(self, attempt: int, retry_after: float | None) -> float:
+        # Jitter "completo" no backoff exponencial; com Retry-After ele é o mínimo
+        delay = random.uniform(0, min(self.max_backoff, self.base_backoff * 2 ** attempt))
+        if retry_after:
+            delay += retry_after
+        return delay
+
+    def penalize(self, retry_after: float | None = None, attempt: int = 0) -> float:
+        """Registra uma recusa do provedor: pausa o bucket e reduz a taxa."""
+        delay = self._backoff(attempt, retry_after)
+        self._paused_until = max(self._paused_until, time.monotonic() + delay)
+        self.rate = max(self.min_rate, self.rate / 2)
+        self._counters["rate_limited"] += 1
+        RATE_LIMITED.inc(provider=self.name)
+        return delay
+
+    async def call(self, func, priority: int | None = None):
+        """
+        Executa `await func()` respeitando o ritmo do provedor e repete, com
+        backoff, enquanto ela levantar `RateLimited` (até `max_retries` vezes).
+        """
+        priority = current_priority() if priority is None else priority
+        for attempt in range(self.max_retries + 1):
+            await self.acquire(priority)
+            try:
+                return await func()
+            except RateLimited as e:
+                delay = self.penalize(e.retry_after, attempt)
+                if attempt == self.max_retries:
+                    self._counters["gave_up"] += 1
+                    raise
+                self._counters["retries"] += 1
+                logger.warning("Provedor limitou as requisições; aguardando",
+                               extra={"provider": self.name, "retry_in_s": round(delay, 1), "attempt": attempt + 1})
+
+    def close(self):
+        if self._pump is not None:
+            self._pump.cancel()
+            self._pump = None
+        for _, _, future in self._waiters:
+            future.cancel()
+        self._waiters.clear()
+
+    def stats(self) -> dict:
+        now = time.monotonic()
+        return {
+            "rate": self.rate,
+            "tokens": self._tokens,
+            "waiting": sum(1 for _, _, future in self._waiters if not future.done()),
+            "paused_s": max(self._paused_until - now, 0.0),
+            **self._counters,
+        }
+
+
+# Limites padrão por provedor (requisições/s e rajada)
+DEFAULT_LIMITS = {
+    "spotify": {"rate": 10, "burst": 20},
+    "youtube": {"rate": 2, "burst": 5},
+}
+
+_governors: dict[str, RateGovernor] = {}
+
+
+def get_rate_governor(provider: str) -> RateGovernor:
+    """Retorna o governador compartilhado de `provider`, criando-o com os limites do settings.yaml."""
+    governor = _governors.get(provider)
+    if governor is None:
+        limits = {**DEFAULT_LIMITS.get(provider, {"rate": 5, "burst": 10}),
+                  **(get_setting(f"rate_limits.{provider}", None) or {})}
+        governor = _governors[provider] = RateGovernor(
+            provider,
+            rate=limits["rate"],
+            burst=limits["burst"],
+            max_retries=get_setting("rate_limits.max_retries", 4),
+            base_backoff=get_setting("rate_limits.base_backoff", 1.0),
+            max_backoff=get_setting("rate_limits.max_backoff", 60.0),
+        )
+    return governor
+
+
+def set_rate_governor(provider: str, governor: RateGovernor | None):
+    """Substitui o governador de `provider` (ex.: um sem limites nos benchmarks)."""
+    if governor is None:
+        _governors.pop(provider, None)
+    else:
+        _governors[provider] = governor
+
+
+def close_rate_governors():
+    for governor in _governors.values():
+        governor.close()
+    _governors.clear()
@@ -0,0 +1,304 @@
+# File: services/resource_governor.py
+from __future__ import annotations
+
+import asyncio
+import itertools
+import os
+import threading
+import time
+from typing import Optional
+
+try:
+    import fcntl
+except ImportError:  # Windows: o limite vale só para este processo
+    fcntl = None
+
+from services.rate_governor import PRIORITY_NAMES, current_priority
+from utils.logging_utils import get_logger
+from utils.metrics import FFMPEG_ADMISSION_SECONDS, FFMPEG_ADMISSIONS
+from utils.settings import get_setting, resolve_path
+
+logger = get_logger("resource_governor")
+
+
+class AdmissionTimeout(Exception):
+    """Nenhuma vaga de FFmpeg ficou livre dentro de `admission_timeout` segundos."""
+
+
+class ProcessSlot:
+    """Vaga de um processo FFmpeg; `release()` pode ser chamado de qualquer thread, mais de uma vez."""
+
+    __slots__ = ("governor", "guild_id", "host_index", "acquired_at", "released")
+
+    def __init__(self, governor: "ResourceGovernor", guild_id: int | None, host_index: int | None):
+        self.governor = governor
+        self.guild_id = guild_id
+        self.host_index = host_index
+        self.acquired_at = time.monotonic()
+        self.released = False
+
+    def release(self):
+        self.governor.release(self)
+
+
+class HostSlots:
+    """
+    Vagas compartilhadas pelos processos do mesmo host (modo cluster): um
+    arquivo de trava por vaga em `directory`, ocupado com `flock`. O sistema
+    libera a trava sozinho se o processo morrer, então vagas nunca vazam.
+    """
+
+    def __init__(self, directory: str, count: int):
+        self.directory = directory
+        self.count = count
+        self._files: dict[int, int] = {}
+        self._held: set[int] = set()
+
+    def _file(self, index: int) -> int:
+        fd = self._files.get(index)
+        if fd is None:
+            os.makedirs(self.directory, exist_ok=True)
+            fd = self._files[index] = os.open(os.path.join(self.directory, f"slot-{index}.lock"),
+                                              os.O_RDWR | os.O_CREAT, 0o644)
+        return fd
+
+    def take(self) -> int | None:
+        for index in range(self.count):
+            if index in self._held:
+                continue
+            try:
+                fcntl.flock(self._file(index), fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                # Ocupada por outro processo
+                continue
+            self._held.add(index)
+            return index
+        return None
+
+    def give(self, index: int):
+        if index in self._held:
+            self._held.discard(index)
+            fcntl.flock(self._files[index], fcntl.LOCK_UN)
+
+    def close(self):
+        for fd in self._files.values():
+            os.close(fd)
+        self._files.clear()
+        self._held.clear()
+
+
+class ResourceGovernor:
+    """
+    Limite de processos FFmpeg abertos ao mesmo tempo (reprodução, faixas
+    antecipadas e downloads do cache de áudio).
+
+    Quem não encontra vaga espera em uma fila. A cada vaga liberada, ganha
+    primeiro a maior prioridade (a faixa que vai tocar antes do cache de
+    áudio); entre pedidos da mesma prioridade, a guild que tem menos
+    processos abertos, e depois a que espera há mais tempo. Assim uma guild
+    não acumula vagas enquanto outra fica em silêncio. A antecipação usa
+    `try_acquire`: sem vaga livre (ou com alguém esperando), a próxima faixa
+    só abre o FFmpeg na hora de tocar.
+
+    Com `host_slots`, o limite vale para todos os processos do host (os
+    clusters disputam os mesmos arquivos de trava); enquanto o host estiver
+    cheio, a fila tenta de novo a cada `poll_interval` segundos.
+    """
+
+    def __init__(self, max_processes: int = 64, admission_timeout: float | None = 30.0,
+                 host_slots: HostSlots | None = None, poll_interval: float = 0.25):
+        self.max_processes = max_processes
+        self.admission_timeout = admission_timeout
+        self.host_slots = host_slots
+        self.poll_interval = poll_interval
+        self.active = 0
+        self.peak_active = 0
+        self.peak_waiting = 0
+        self._held: dict[int | None, int] = {}
+        # [prioridade, ordem de chegada, guild, future]
+        self._waiters: list[list] = []
+        self._sequence = itertools.count()
+        self._wakeup: asyncio.Event | None = None
+        self._pump: asyncio.Task | None = None
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._thread_id: int | None = None
+        self._counters = {"immediate": 0, "queued": 0, "timeout": 0, "skipped": 0}
+
+    # ------------------------------------------------------------------ #
+    # Vagas
+    # ------------------------------------------------------------------ #
+    def _take(self, guild_id: int | None) -> ProcessSlot | None:
+        if self.active >= self.max_processes:
+            return None
+        host_index = None
+        if self.host_slots is not None:
+            host_index = self.host_slots.take()
+            if host_index is None:
+                return None
+        self.active += 1
+        self.peak_active = max(self.peak_active, self.active)
+        self._held[guild_id] = self._held.get(guild_id, 0) + 1
+        return ProcessSlot(self, guild_id, host_index)
+
+    def _bind_loop(self):
+        if self._loop is None:
+            self._loop = asyncio.get_running_loop()
+            self._thread_id = threading.get_ident()
+            self._wakeup = asyncio.Event()
+
+    def try_acquire(self, guild_id: int | None) -> ProcessSlot | None:
+        """Uma vaga agora, se houver uma livre e ninguém esperando; senão None."""
+        self._bind_loop()
+        slot = self._take(guild_id) if not self._waiters else None
+        result = "immediate" if slot is not None else "skipped"
+        self._counters[result] += 1
+        FFMPEG_ADMISSIONS.inc(result=result)
+        return slot
+
+    async def acquire(self, guild_id: int | None, priority: int | None = None) -> ProcessSlot:
+        """Aguarda uma vaga (por prioridade e, entre guilds, pela que tem menos processos)."""
+        self._bind_loop()
+        priority = current_priority() if priority is None else priority
+        started = time.monotonic()
+        slot = self._take(guild_id) if not self._waiters else None
+        if slot is not None:
+            result = "immediate"
+        else:
+            result = "queued"
+            future = self._loop.create_future()
+            waiter = [priority, next(self._sequence), guild_id, future]
+            self._waiters.append(waiter)
+            self.peak_waiting = max(self.peak_waiting, len(self._waiters))
+            if self._pump is None or self._pump.done():
+                self._pump = self._loop.create_task(self._run_pump())
+            else:
+                self._wakeup.set()
+            try:
+                slot = await asyncio.wait_for(future, self.admission_timeout)
+            except asyncio.TimeoutError:
+                self._counters["timeout"] += 1
+                FFMPEG_ADMISSIONS.inc(result="timeout")
+                logger.warning("Sem vaga para o FFmpeg", extra={
+                    "guild": guild_id, "active": self.active, "waiting": len(self._waiters)})
+                raise AdmissionTimeout(f"Nenhuma vaga de FFmpeg em {self.admission_timeout:g} s") from None
+            except asyncio.CancelledError:
+                # A vaga pode ter sido concedida no mesmo instante do cancelamento
+                if future.done() and not future.cancelled():
+                    future.result().release()
+                raise
+            finally:
+                if waiter in self._waiters:
+                    self._waiters.remove(waiter)
+        self._counters[result] += 1
+        FFMPEG_ADMISSIONS.inc(result=result)
+        FFMPEG_ADMISSION_SECONDS.observe(time.monotonic() - started,
+                                         priority=PRIORITY_NAMES.get(priority, str(priority)))
+        return slot
+
+    def _grant(self):
+        while self._waiters and self.active < self.max_processes:
+            held = self._held
+            waiter = min(self._waiters, key=lambda w: (w[0], held.get(w[2], 0), w[1]))
+            future = waiter[3]
+            if future.done():
+                # Desistiu (timeout ou cancelamento)
+                self._waiters.remove(waiter)
+                continue
+            slot = self._take(waiter[2])
+            if slot is None:
+                # Host cheio: só os outros processos podem liberar vagas
+                return
+            self._waiters.remove(waiter)
+            future.set_result(slot)
+
+    async def _run_pump(self):
+        while self._waiters:
+            self._grant()
+            if not self._waiters:
+                break
+            self._wakeup.clear()
+            # Vagas locais acordam a fila na hora; as de outros processos, no próximo ciclo
+            timeout = self.poll_interval if self.host_slots is not None else None
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+
+    def release(self, slot: ProcessSlot):
+        if slot.released:
+            return
+        slot.released = True
+        loop = self._loop
+        if loop is not None and threading.get_ident() != self._thread_id:
+            # A thread do AudioPlayer encerra as fontes: a vaga volta pelo event loop
+            if not loop.is_closed():
+                loop.call_soon_threadsafe(self._release, slot)
+            return
+        self._release(slot)
+
+    def _release(self, slot: ProcessSlot):
+        self.active -= 1
+        remaining = self._held.get(slot.guild_id, 0) - 1
+        if remaining > 0:
+            self._held[slot.guild_id] = remaining
+        else:
+            self._held.pop(slot.guild_id, None)
+        if slot.host_index is not None:
+            self.host_slots.give(slot.host_index)
+        if self._waiters and self._wakeup is not None:
+            self._wakeup.set()
+
+    def close(self):
+        if self._pump is not None:
+            self._pump.cancel()
+            self._pump = None
+        for waiter in self._waiters:
+            waiter[3].cancel()
+        self._waiters.clear()
+        if self.host_slots is not None:
+            self.host_slots.close()
+
+    def stats(self) -> dict:
+        return {
+            "limit": self.max_processes,
+            "active": self.active,
+            "peak_active": self.peak_active,
+            "waiting": len(self._waiters),
+            "peak_waiting": self.peak_waiting,
+            "guilds": sum(1 for guild_id in self._held if guild_id is not None),
+            **self._counters,
+        }
+
+
+_governor: Optional[ResourceGovernor] = None
+
+
+def get_resource_governor() -> ResourceGovernor:
+    """Retorna o governador compartilhado, criando-o com os limites do settings.yaml."""
+    global _governor
+    if _governor is None:
+        max_processes = get_setting("resources.max_ffmpeg", 64)
+        host_lock_dir = get_setting("resources.host_lock_dir", "data/ffmpeg_slots")
+        host_slots = None
+        if host_lock_dir and fcntl is not None:
+            host_slots = HostSlots(resolve_path(host_lock_dir), max_processes)
+        _governor = ResourceGovernor(
+            max_processes=max_processes,
+            admission_timeout=get_setting("resources.admission_timeout", 30.0),
+            host_slots=host_slots,
+            poll_interval=get_setting("resources.poll_interval", 0.25),
+        )
+    return _governor
+
+
+def set_resource_governor(governor: ResourceGovernor | None):
+    """Substitui o governador compartilhado (ex.: um sem limite efetivo nos benchmarks)."""
+    global _governor
+    _governor = governor
+
+
+def close_resource_governor():
+    global _governor
+    if _governor is not None:
+        _governor.close()
+        _governor = None
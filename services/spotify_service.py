@@ -1,64 +1,287 @@
 # File: services/spotify_service.py
+from __future__ import annotations
+
 import os
 import re
+import time
 import asyncio
-import spotipy
-from spotipy.oauth2 import SpotifyClientCredentials
+from typing import Optional
+import aiohttp
+
+from services.rate_governor import RateLimited, get_rate_governor
+from utils.metrics import BACKEND_ERRORS, BACKEND_SECONDS
+from utils.track import Platform, Track
+
+SPOTIFY_API_URL = "https://api.spotify.com/v1"
+SPOTIFY_TOKEN_URL = "https://accounts.spotify.com/api/token"
+
+# Máximo de IDs aceitos pelo endpoint /tracks?ids=
+TRACKS_BATCH_SIZE = 50
+# Renova o token alguns segundos antes de expirar, evitando 401 em voo
+TOKEN_REFRESH_MARGIN = 60
+
+TRACK_URL_PATTERN = r"spotify\.com/(?:intl-[a-z]{2}(?:-[a-zA-Z]{2})?/)?track/([a-zA-Z0-9]+)"
+COLLECTION_URL_PATTERN = r"spotify\.com/(?:intl-[a-z]{2}(?:-[a-zA-Z]{2})?/)?(playlist|album)/([a-zA-Z0-9]+)"
+# Tamanho máximo de página dos endpoints de faixas de playlists e álbuns
+PLAYLIST_PAGE_SIZE = 100
+ALBUM_PAGE_SIZE = 50
+
+
+class SpotifyClient:
+    """
+    Cliente assíncrono da Web API do Spotify.
+
+    Usa uma única `aiohttp.ClientSession` com conexões keep-alive reaproveitadas
+    e um token client-credentials compartilhado, renovado antes de expirar.
+    Nenhuma chamada bloqueia o event loop.
+    """
+
+    def __init__(self, client_id: str, client_secret: str, pool_size: int = 20):
+        self.client_id = client_id
+        self.client_secret = client_secret
+        self.pool_size = pool_size
+        self._session: aiohttp.ClientSession | None = None
+        self._token: str | None = None
+        self._token_expires_at = 0.0
+        self._token_lock = asyncio.Lock()
+
+    async def _get_session(self) -> aiohttp.ClientSession:
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(limit=self.pool_size, keepalive_timeout=60, ttl_dns_cache=300)
+            self._session = aiohttp.ClientSession(
+                connector=connector,
+                timeout=aiohttp.ClientTimeout(total=10),
+            )
+        return self._session
+
+    async def get_token(self, force_refresh: bool = False) -> str:
+        """
+        Retorna o token de acesso atual. Apenas uma corrotina renova o token por
+        vez; as demais aguardam e reutilizam o token renovado.
+        """
+        if not force_refresh and self._token and time.time() < self._token_expires_at - TOKEN_REFRESH_MARGIN:
+            return self._token
+        async with self._token_lock:
+            if not force_refresh and self._token and time.time() < self._token_expires_at - TOKEN_REFRESH_MARGIN:
+                return self._token
+            session = await self._get_session()
+            auth = aiohttp.BasicAuth(self.client_id, self.client_secret)
+            async with session.post(SPOTIFY_TOKEN_URL, data={"grant_type": "client_credentials"}, auth=auth) as resp:
+                if resp.status != 200:
+                    raise Exception(f"Erro ao autenticar no Spotify (HTTP {resp.status}).")
+                payload = await resp.json()
+            self._token = payload["access_token"]
+            self._token_expires_at = time.time() + payload.get("expires_in", 3600)
+            return self._token
+
+    async def request(self, path: str, params: dict | None = None) -> dict:
+        """
+        Faz um GET na Web API, renovando o token uma vez em caso de 401. O
+        ritmo e as novas tentativas após um 429 ficam a cargo do governador de
+        requisições do Spotify (`services/rate_governor.py`).
+        """
+        try:
+            return await get_rate_governor("spotify").call(lambda: self._timed_request(path, params))
+        except Exception:
+            BACKEND_ERRORS.inc(backend="spotify")
+            raise
+
+    async def _timed_request(self, path: str, params: dict | None) -> dict:
+        with BACKEND_SECONDS.time(backend="spotify"):
+            return await self._request(path, params)
 
-_client = None
+    async def _request(self, path: str, params: dict | None) -> dict:
+        session = await self._get_session()
+        for attempt in range(2):
+            token = await self.get_token(force_refresh=attempt > 0)
+            headers = {"Authorization": f"Bearer {token}"}
+            async with session.get(f"{SPOTIFY_API_URL}{path}", params=params, headers=headers) as resp:
+                if resp.status == 401 and attempt == 0:
+                    continue
+                if resp.status == 429:
+                    retry_after = resp.headers.get("Retry-After")
+                    raise RateLimited("Spotify limitou as requisições (HTTP 429).",
+                                      float(retry_after) if retry_after and retry_after.isdigit() else None)
+                if resp.status != 200:
+                    raise Exception(f"Erro ao obter dados do Spotify (HTTP {resp.status}).")
+                return await resp.json()
+        raise Exception("Erro ao obter dados do Spotify: token recusado.")
 
-def get_spotify_client():
+    async def track(self, track_id: str) -> dict:
+        return await self.request(f"/tracks/{track_id}")
+
+    async def tracks(self, track_ids: list[str]) -> list[dict]:
+        """
+        Busca várias faixas usando o endpoint em lote (`/tracks?ids=`), com até
+        50 IDs por requisição. Os lotes são buscados em paralelo e a ordem de
+        `track_ids` é preservada (IDs inexistentes retornam `None`).
+        """
+        chunks = [track_ids[i:i + TRACKS_BATCH_SIZE] for i in range(0, len(track_ids), TRACKS_BATCH_SIZE)]
+        responses = await asyncio.gather(
+            *(self.request("/tracks", params={"ids": ",".join(chunk)}) for chunk in chunks)
+        )
+        return [track for response in responses for track in response.get("tracks", [])]
+
+    async def paged_items(self, path: str, first_page: dict, page_size: int, max_items: int) -> list[dict]:
+        """
+        Junta os itens de um objeto de paginação do Spotify. A primeira página
+        já veio junto com o objeto pai; as demais são buscadas em paralelo a
+        partir de `total`, sem seguir os links `next` um a um.
+        """
+        items = list(first_page.get("items", []))
+        total = min(first_page.get("total", len(items)), max_items)
+        offsets = range(len(items), total, page_size)
+        pages = await asyncio.gather(
+            *(self.request(path, params={"limit": page_size, "offset": offset}) for offset in offsets)
+        )
+        for page in pages:
+            items.extend(page.get("items", []))
+        return items[:max_items]
+
+    async def search(self, query: str, search_type: str = "track", limit: int = 1) -> dict:
+        return await self.request("/search", params={"q": query, "type": search_type, "limit": limit})
+
+    async def close(self):
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+
+
+_client: Optional[SpotifyClient] = None
+
+
+def get_spotify_client() -> SpotifyClient:
     global _client
     if _client is None:
         client_id = os.getenv('SPOTIFY_CLIENT_ID')
         client_secret = os.getenv('SPOTIFY_CLIENT_SECRET')
         if not client_id or not client_secret:
             raise Exception("Credenciais do Spotify não configuradas no .env!")
-        auth_manager = SpotifyClientCredentials(client_id=client_id, client_secret=client_secret)
-        _client = spotipy.Spotify(auth_manager=auth_manager)
+        _client = SpotifyClient(client_id, client_secret)
     return _client
 
-async def get_spotify_song_info(query: str) -> dict:
+
+def set_spotify_client(client):
+    """Substitui o cliente compartilhado (ex.: por um que devolve fixtures nos benchmarks)."""
+    global _client
+    _client = client
+
+
+async def close_spotify_client():
+    """Fecha a sessão HTTP compartilhada (chamado ao descarregar a cog)."""
+    global _client
+    if _client is not None:
+        await _client.close()
+        _client = None
+
+
+def extract_track_id(query: str) -> str | None:
+    """
+    Extrai o Track ID de uma URL do Spotify (aceitando um segmento opcional
+    como "intl-pt/"). Retorna None se a query não for uma URL de faixa.
+    """
+    if "spotify.com" not in query:
+        return None
+    m = re.search(TRACK_URL_PATTERN, query)
+    return m.group(1) if m else None
+
+
+def extract_collection(query: str) -> tuple[str, str] | None:
+    """
+    Retorna ("playlist" | "album", id) se a query for o link de uma playlist
+    ou de um álbum do Spotify; caso contrário, None.
+    """
+    if "spotify.com" not in query:
+        return None
+    m = re.search(COLLECTION_URL_PATTERN, query)
+    return (m.group(1), m.group(2)) if m else None
+
+
+def _track_to_song(track_data: dict, thumbnail: str | None = None) -> Track:
+    artist_names = ", ".join([artist["name"] for artist in track_data["artists"]])
+    title = track_data["name"]
+    if thumbnail is None:
+        images = track_data.get("album", {}).get("images")
+        thumbnail = images[0]["url"] if images else ""
+
+    artists = " ".join(artist["name"] for artist in track_data["artists"])
+
+    return Track(
+        f"{title} - {artist_names}",
+        Platform.SPOTIFY,
+        track_data["duration_ms"] // 1000,
+        thumbnail=thumbnail,
+        # Usados para encontrar a faixa no YouTube (services/match_service.py)
+        spotify_id=track_data.get("id"),
+        isrc=track_data.get("external_ids", {}).get("isrc"),
+        search_query=f"{title} {artists} audio",
+    )
+
+
+async def get_spotify_song_info(query: str) -> Track:
     """
     Extrai informações reais da faixa a partir de uma URL do Spotify ou de um termo de busca.
-    
-    Se `query` for uma URL do Spotify, extrai o Track ID (aceitando um segmento opcional como "intl-pt/") e obtém os dados via API.
+
+    Se `query` for uma URL do Spotify, extrai o Track ID e obtém os dados via API.
     Se for apenas um termo de busca, realiza a busca e retorna a primeira ocorrência.
     """
     client = get_spotify_client()
-    track_id = None
-
-    # Se a query for uma URL contendo "spotify.com".
-    # O regex abaixo permite opcionalmente o segmento "intl-pt/" antes de "track/".
-    if "spotify.com" in query:
-        pattern = r"spotify\.com/(?:intl-pt/)?track/([a-zA-Z0-9]+)"
-        m = re.search(pattern, query)
-        if m:
-            track_id = m.group(1)
-    
+    track_id = extract_track_id(query)
+
     if track_id:
         try:
-            track_data = client.track(track_id)
+            track_data = await client.track(track_id)
         except Exception as e:
             raise Exception(f"Erro ao obter dados do Spotify: {e}")
     else:
-        results = client.search(q=query, type='track', limit=1)
+        results = await client.search(query, search_type="track", limit=1)
         if results and results['tracks']['items']:
             track_data = results['tracks']['items'][0]
         else:
             raise Exception("Não foi possível encontrar a música no Spotify.")
-    
-    # Processa os dados obtidos
-    artist_names = ", ".join([artist["name"] for artist in track_data["artists"]])
-    title = track_data["name"]
-    duration_ms = track_data["duration_ms"]
-    duration_sec = duration_ms // 1000
-    thumbnail = track_data["album"]["images"][0]["url"] if track_data["album"]["images"] else ""
-
-    return {
-        "title": f"{title} - {artist_names}",
-        "platform": "Spotify",
-        "estimated_time": "00:00",  # (Opcional: você pode adicionar lógica para calcular)
-        "duration": f"{duration_sec} sec",
-        "thumbnail": thumbnail
-    }
\ No newline at end of file
+
+    return _track_to_song(track_data)
+
+
+async def get_spotify_tracks_info(track_ids: list[str]) -> list[Track]:
+    """
+    Versão em lote de `get_spotify_song_info` para vários Track IDs: uma
+    requisição a cada 50 faixas em vez de uma por faixa. IDs não encontrados
+    são ignorados.
+    """
+    client = get_spotify_client()
+    tracks = await client.tracks(track_ids)
+    return [_track_to_song(track) for track in tracks if track]
+
+
+async def get_spotify_collection_info(query: str, max_tracks: int = 1000) -> tuple[str, list[Track]]:
+    """
+    Busca todas as faixas de uma playlist ou álbum do Spotify em requisições
+    paginadas em lote e retorna (nome da coleção, entradas leves de fila).
+    Nenhuma faixa é procurada no YouTube aqui.
+    """
+    collection = extract_collection(query)
+    if collection is None:
+        raise Exception("Link de playlist ou álbum do Spotify inválido.")
+    kind, collection_id = collection
+    client = get_spotify_client()
+    try:
+        data = await client.request(f"/{kind}s/{collection_id}")
+    except Exception as e:
+        raise Exception(f"Erro ao obter dados do Spotify: {e}")
+
+    if kind == "playlist":
+        items = await client.paged_items(f"/playlists/{collection_id}/tracks", data["tracks"],
+                                         PLAYLIST_PAGE_SIZE, max_tracks)
+        # Ignora episódios de podcast e arquivos locais, que não têm correspondência no YouTube
+        songs = [
+            _track_to_song(item["track"]) for item in items
+            if item.get("track") and item["track"].get("type") == "track" and item["track"].get("id")
+        ]
+    else:
+        items = await client.paged_items(f"/albums/{collection_id}/tracks", data["tracks"],
+                                         ALBUM_PAGE_SIZE, max_tracks)
+        # Faixas de álbum não trazem o objeto "album": usa a capa do próprio álbum
+        cover = data["images"][0]["url"] if data.get("images") else ""
+        songs = [_track_to_song(track, cover) for track in items if track]
+    return data.get("name", "Playlist"), songs
@@ -1,32 +1,124 @@
 # File: services/youtube_service.py
-import asyncio
-import yt_dlp
+from __future__ import annotations
 
-async def get_youtube_song_info(query: str) -> dict:
+import re
+from typing import Optional
+from services.extraction_engine import ExtractionEngine
+from utils.cache import get_song_cache
+from utils.settings import get_setting
+from utils.track import Platform, Track
+
+YTDL_OPTS = {
+    'quiet': True,
+    'format': 'bestaudio',
+    'default_search': 'ytsearch',
+    'noplaylist': True,
+    # Certifique-se de passar uma lista com o navegador desejado, por exemplo:
+    'cookiesfrombrowser': ['firefox'],
+}
+
+PLAYLIST_URL_PATTERN = r"youtube\.com/playlist\?(?:.*&)?list=([\w-]+)"
+
+# Opções sobrepostas por chamada para listar uma playlist sem extrair cada vídeo
+FLAT_PLAYLIST_PARAMS = {
+    'extract_flat': 'in_playlist',
+    'noplaylist': False,
+}
+
+_engine: Optional[ExtractionEngine] = None
+
+
+def get_extraction_engine() -> ExtractionEngine:
+    """Retorna o motor de extração compartilhado, criando-o na primeira chamada."""
+    global _engine
+    if _engine is None:
+        _engine = ExtractionEngine(
+            YTDL_OPTS,
+            workers=get_setting("extraction.workers"),
+            max_jobs_per_worker=get_setting("extraction.max_jobs_per_worker", 200),
+            timeout=get_setting("extraction.timeout", 30),
+            max_queue=get_setting("extraction.max_queue", 1000),
+        )
+    return _engine
+
+
+def set_extraction_engine(engine):
+    """Substitui o motor compartilhado (ex.: por um que devolve fixtures nos benchmarks)."""
+    global _engine
+    _engine = engine
+
+
+async def close_extraction_engine():
+    global _engine
+    if _engine is not None:
+        await _engine.close()
+        _engine = None
+
+
+async def get_youtube_song_info(query: str) -> Track:
     """
     Extrai informações de uma música (ou vídeo) a partir do YouTube,
-    seja por link ou por termo de busca. Essa função usa yt_dlp e a opção
-    'cookiesfrombrowser' para tentar acessar conteúdos com restrição de idade.
+    seja por link ou por termo de busca. A extração roda no pool de processos
+    do `ExtractionEngine`, cujos workers mantêm um yt_dlp já configurado com a
+    opção 'cookiesfrombrowser' para tentar acessar conteúdos com restrição de idade.
+
+    Resultados ficam no cache de músicas (`utils/cache.py`) enquanto a
+    `audio_url` for válida.
+    """
+    return await get_song_cache().get_or_load(query, lambda: _extract_youtube_song_info(query))
+
+
+async def _extract_youtube_song_info(query: str) -> Track:
+    info = await get_extraction_engine().extract(query)
+    # Se for uma busca, pega a primeira entrada da lista
+    if 'entries' in info:
+        if not info['entries']:
+            raise Exception("Não foi possível encontrar a música no YouTube.")
+        video = info['entries'][0]
+    else:
+        video = info
+    track = Track(
+        video.get('title'),
+        Platform.YOUTUBE,
+        int(video.get('duration') or 0),
+        url=video.get('webpage_url') or '',
+        thumbnail=video.get('thumbnail') or '',
+    )
+    # Codec do stream escolhido (normalmente "opus"), usado para evitar recodificação
+    track.set_stream(video.get('url') or '', video.get('acodec') or '', video.get('abr') or 0, track.url)
+    return track
+
+
+def is_youtube_playlist(query: str) -> bool:
+    return re.search(PLAYLIST_URL_PATTERN, query) is not None
+
+
+async def get_youtube_playlist_info(query: str, max_tracks: int = 1000) -> tuple[str, list[Track]]:
+    """
+    Lista uma playlist do YouTube com `extract_flat` (uma única extração, sem
+    resolver cada vídeo) e retorna (nome da playlist, entradas leves de fila).
+    A `audio_url` de cada entrada fica vazia e é resolvida perto da hora de tocar.
+    """
+    info = await get_extraction_engine().extract(query, params=FLAT_PLAYLIST_PARAMS)
+    songs = []
+    for entry in info.get('entries', [])[:max_tracks]:
+        video_id = entry.get('id')
+        if not video_id:
+            continue
+        songs.append(Track(
+            entry.get('title'),
+            Platform.YOUTUBE,
+            int(entry.get('duration') or 0),
+            url=f"https://www.youtube.com/watch?v={video_id}",
+            thumbnail=f"https://i.ytimg.com/vi/{video_id}/hqdefault.jpg",
+        ))
+    return info.get('title') or 'Playlist', songs
+
+
+async def search_youtube_candidates(query: str, limit: int = 5) -> list[dict]:
+    """
+    Busca até `limit` vídeos no YouTube sem resolver nenhum deles (extração
+    "flat"): retorna apenas id, título, duração e canal de cada candidato.
     """
-    loop = asyncio.get_event_loop()
-    ytdl_opts = {
-        'quiet': True,
-        'format': 'bestaudio',
-        'default_search': 'ytsearch',
-        'noplaylist': True,
-        # Certifique-se de passar uma lista com o navegador desejado, por exemplo:
-        'cookiesfrombrowser': ['firefox'],
-    }
-    with yt_dlp.YoutubeDL(ytdl_opts) as ytdl:
-        info = await loop.run_in_executor(None, lambda: ytdl.extract_info(query, download=False))
-        # Se for uma busca, pega a primeira entrada da lista
-        video = info if 'entries' not in info else info['entries'][0]
-        return {
-            'title': video.get('title', 'Título desconhecido'),
-            'platform': 'YouTube',
-            'estimated_time': '00:00',  # se você desejar calcular a estimativa
-            'duration': f"{video.get('duration', 0)} sec",
-            'thumbnail': video.get('thumbnail', ''),
-            'url': video.get('webpage_url', ''),
-            'audio_url': video.get('url', '')
-        }
\ No newline at end of file
+    info = await get_extraction_engine().extract(f"ytsearch{limit}:{query}", params=FLAT_PLAYLIST_PARAMS)
+    return [entry for entry in info.get('entries', []) if entry.get('id')]
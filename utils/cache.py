@@ -0,0 +1,254 @@
+# File: utils/cache.py
+from __future__ import annotations
+
+import os
+import re
+import time
+from collections import OrderedDict
+from typing import Optional
+
+from utils.logging_utils import get_logger
+from utils.settings import get_setting
+from utils.track import Track
+
+logger = get_logger("cache")
+
+_YOUTUBE_ID_PATTERN = re.compile(r"(?:youtube\.com/(?:watch\?.*?v=|shorts/|embed/)|youtu\.be/)([\w-]{11})")
+_SPOTIFY_TRACK_PATTERN = re.compile(r"spotify\.com/(?:intl-[a-z]{2}(?:-[a-zA-Z]{2})?/)?track/([a-zA-Z0-9]+)")
+
+
+def normalize_key(query: str) -> str:
+    """
+    Normaliza uma query para uso como chave de cache:
+      - vídeos do YouTube viram "yt:<video id>" (independente do formato do link);
+      - faixas do Spotify viram "sp:<track id>";
+      - outras URLs são usadas sem fragmento e sem barra final;
+      - termos de busca são convertidos para minúsculas com espaços colapsados.
+    """
+    query = query.strip()
+    if re.match(r'https?://', query):
+        m = _YOUTUBE_ID_PATTERN.search(query)
+        if m:
+            return f"yt:{m.group(1)}"
+        m = _SPOTIFY_TRACK_PATTERN.search(query)
+        if m:
+            return f"sp:{m.group(1)}"
+        return "url:" + query.split("#", 1)[0].rstrip("/")
+    return "q:" + " ".join(query.lower().split())
+
+
+class LRUCache:
+    """Cache LRU em memória com TTL por entrada."""
+
+    def __init__(self, max_entries: int = 2048):
+        self.max_entries = max_entries
+        self._data: OrderedDict[str, tuple[float, object]] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def get(self, key: str):
+        item = self._data.get(key)
+        if item is None:
+            self.misses += 1
+            return None
+        expires_at, value = item
+        if expires_at <= time.monotonic():
+            del self._data[key]
+            self.expirations += 1
+            self.misses += 1
+            return None
+        self._data.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def set(self, key: str, value, ttl: float):
+        if ttl <= 0:
+            return
+        self._data[key] = (time.monotonic() + ttl, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.max_entries:
+            self._data.popitem(last=False)
+            self.evictions += 1
+
+    def delete(self, key: str):
+        self._data.pop(key, None)
+
+    def clear(self):
+        self._data.clear()
+
+
+class RedisTier:
+    """
+    Camada compartilhada opcional sobre qualquer cliente Redis assíncrono com
+    `get`, `set(..., ex=)` e `delete` (ex.: `redis.asyncio.Redis` ou um
+    substituto local como `fakeredis.aioredis.FakeRedis`). Guarda bytes (a
+    serialização fica com quem usa a camada). Falhas do Redis são tratadas
+    como miss para nunca derrubar um `/play`.
+    """
+
+    def __init__(self, client, namespace: str = "kali:"):
+        self.client = client
+        self.namespace = namespace
+        self.hits = 0
+        self.misses = 0
+        self.errors = 0
+
+    async def get(self, key: str) -> bytes | None:
+        try:
+            raw = await self.client.get(self.namespace + key)
+        except Exception as e:
+            self.errors += 1
+            logger.warning("Erro ao ler do Redis", extra={"error": str(e)})
+            return None
+        if raw is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return raw
+
+    async def set(self, key: str, value: bytes, ttl: float):
+        if ttl <= 0:
+            return
+        try:
+            await self.client.set(self.namespace + key, value, ex=int(ttl))
+        except Exception as e:
+            self.errors += 1
+            logger.warning("Erro ao gravar no Redis", extra={"error": str(e)})
+
+    async def delete(self, key: str):
+        try:
+            await self.client.delete(self.namespace + key)
+        except Exception as e:
+            self.errors += 1
+            logger.warning("Erro ao remover do Redis", extra={"error": str(e)})
+
+
+class SongInfoCache:
+    """
+    Cache em dois níveis de faixas (`Track`): LRU em memória e, se
+    configurado, Redis compartilhado (no formato binário de `Track.to_bytes`).
+
+    Cada faixa é guardada com TTL longo (`metadata_ttl`) junto com o seu
+    stream; a validade da `audio_url` vem de `Track.expires_at`, então um
+    stream expirado não apaga os metadados. Quem lê recebe sempre uma cópia.
+    """
+
+    # Prefixo das chaves no Redis; muda junto com o formato das entradas
+    REDIS_NAMESPACE = "kali:track1:"
+
+    def __init__(self, max_entries: int = 2048, metadata_ttl: float = 7 * 24 * 3600, redis_client=None):
+        self.memory = LRUCache(max_entries)
+        self.redis = RedisTier(redis_client, self.REDIS_NAMESPACE) if redis_client is not None else None
+        self.metadata_ttl = metadata_ttl
+
+    async def _get(self, key: str) -> Track | None:
+        track = self.memory.get(key)
+        if track is not None or self.redis is None:
+            return track
+        raw = await self.redis.get(key)
+        if raw is None:
+            return None
+        try:
+            track = Track.from_bytes(raw)
+        except ValueError as e:
+            logger.warning("Entrada inválida no Redis", extra={"key": key, "error": str(e)})
+            return None
+        self.memory.set(key, track, self.metadata_ttl)
+        return track
+
+    async def _set(self, key: str, track: Track):
+        self.memory.set(key, track, self.metadata_ttl)
+        if self.redis is not None:
+            await self.redis.set(key, track.to_bytes(), self.metadata_ttl)
+
+    async def get(self, query: str, require_stream: bool = True) -> Track | None:
+        """
+        Retorna uma cópia da faixa em cache para `query`, ou None. Se
+        `require_stream` for verdadeiro, só há hit quando a `audio_url` também
+        está válida; caso contrário, um stream vencido volta descartado.
+        """
+        track = await self._get(normalize_key(query))
+        if track is None:
+            return None
+        has_stream = track.stream_ttl() > 0
+        if require_stream and not has_stream:
+            return None
+        return track.copy(stream=has_stream)
+
+    async def put(self, query: str, track: Track):
+        await self._set(normalize_key(query), track.copy())
+
+    async def invalidate_stream(self, query: str):
+        """Descarta a `audio_url` em cache (ex.: após uma falha de reprodução), mantendo os metadados."""
+        key = normalize_key(query)
+        track = self.memory.get(key)
+        if track is not None:
+            await self._set(key, track.copy(stream=False))
+        elif self.redis is not None:
+            await self.redis.delete(key)
+
+    async def get_or_load(self, query: str, loader, require_stream: bool = True) -> Track:
+        """Retorna a faixa em cache ou chama `loader()` e guarda o resultado."""
+        track = await self.get(query, require_stream=require_stream)
+        if track is not None:
+            return track
+        track = await loader()
+        await self.put(query, track)
+        # Quem consultou pelo link do vídeo também encontra o resultado de uma busca
+        if track.url and normalize_key(track.url) != normalize_key(query):
+            await self.put(track.url, track)
+        return track
+
+    def stats(self) -> dict:
+        stats = {
+            "memory_entries": len(self.memory),
+            "memory_hits": self.memory.hits,
+            "memory_misses": self.memory.misses,
+            "memory_evictions": self.memory.evictions,
+            "memory_expirations": self.memory.expirations,
+        }
+        if self.redis is not None:
+            stats.update({
+                "redis_hits": self.redis.hits,
+                "redis_misses": self.redis.misses,
+                "redis_errors": self.redis.errors,
+            })
+        return stats
+
+
+def _create_redis_client():
+    url = os.getenv("REDIS_URL") or get_setting("cache.redis_url")
+    if not url:
+        return None
+    try:
+        import redis.asyncio as aioredis
+    except ImportError:
+        logger.warning("Pacote 'redis' não instalado; usando apenas o cache em memória.")
+        return None
+    return aioredis.from_url(url)
+
+
+_song_cache: Optional[SongInfoCache] = None
+
+
+def get_song_cache() -> SongInfoCache:
+    """Retorna o cache de músicas compartilhado, criando-o na primeira chamada."""
+    global _song_cache
+    if _song_cache is None:
+        _song_cache = SongInfoCache(
+            max_entries=get_setting("cache.max_entries", 2048),
+            metadata_ttl=get_setting("cache.metadata_ttl", 7 * 24 * 3600),
+            redis_client=_create_redis_client(),
+        )
+    return _song_cache
+
+
+def set_song_cache(cache: SongInfoCache | None):
+    """Substitui o cache compartilhado (ex.: por um com Redis local em testes)."""
+    global _song_cache
+    _song_cache = cache
@@ -1,12 +1,12 @@
 # File: utils/embed_utils.py
-import discord
-import yaml
-import os
+from __future__ import annotations
+
+import time
 
-# Carrega as configurações do arquivo config/settings.yaml
-settings_path = os.path.join(os.path.dirname(os.path.dirname(__file__)), "config", "settings.yaml")
-with open(settings_path, "r", encoding="utf8") as config_file:
-    SETTINGS = yaml.safe_load(config_file)
+import discord
+from utils.settings import get_setting
+from utils.song_queue import SongQueue
+from utils.track import Track
 
 # Define os emojis padrão para cada plataforma (caso não sejam sobrescritos no YAML)
 PLATFORM_EMOJIS = {
@@ -14,6 +14,7 @@ PLATFORM_EMOJIS = {
     "youtube": "<:youtubelogo:1369702623002886214>"
 }
 
+
 def format_time_value(time_val):
     """
     Se time_val é um inteiro (segundos), converte para o formato H:MM:SS ou MM:SS.
@@ -28,43 +29,42 @@ def format_time_value(time_val):
             return f"{m:02}:{s:02}"
     return time_val
 
-def create_now_playing_embed(song: dict, requester: str, requester_avatar: str = None) -> discord.Embed:
+
+def create_now_playing_embed(song: Track, requester: str, requester_avatar: str = None) -> discord.Embed:
     """
     Cria um embed para exibir a faixa que está tocando.
-    
+
     Estrutura:
       - Título fixo na barra superior: "<emoji> Tocando Agora" (o emoji é definido conforme a plataforma).
       - A descrição contém o título da faixa (em negrito e como link, se houver URL).
       - Se disponível, é exibida a thumbnail da faixa.
       - Footer: "Solicitado por {requester}" com o avatar (se fornecido).
     """
-    url = song.get("url", "")
-    # Detecta a plataforma: se o URL contiver "spotify.com", força a plataforma para "spotify".
-    platform = song.get("platform", "unknown").lower()
-    if "spotify.com" in url.lower():
-        platform = "spotify"
-    
-    emoji = SETTINGS.get("platform_icons", {}).get(platform, PLATFORM_EMOJIS.get(platform, ""))
+    url = song.link
+    platform = song.platform.key
+
+    emoji = get_setting("platform_icons", {}).get(platform, PLATFORM_EMOJIS.get(platform, ""))
     embed_title = f"{emoji} Tocando Agora"
-    song_title = song.get("title", "Título desconhecido")
+    song_title = song.title
     description = f"[**{song_title}**]({url})" if url else f"**{song_title}**"
-    
+
     embed = discord.Embed(title=embed_title, description=description, color=discord.Color.green())
-    if song.get("thumbnail"):
-        embed.set_thumbnail(url=song["thumbnail"])
-    
+    if song.thumbnail:
+        embed.set_thumbnail(url=song.thumbnail)
+
     if requester_avatar:
         embed.set_footer(text=f"Solicitado por {requester}", icon_url=requester_avatar)
     else:
         embed.set_footer(text=f"Solicitado por {requester}")
-    
+
     return embed
 
-def create_queue_added_embed(song: dict, estimated_time, track_length: str,
-                               position: int, requester: str, requester_avatar: str = None) -> discord.Embed:
+
+def create_queue_added_embed(song: Track, estimated_time, track_length: str,
+                             position: int, requester: str, requester_avatar: str = None) -> discord.Embed:
     """
     Cria um embed organizado para exibir que uma nova música foi adicionada à fila.
-    
+
     Estrutura:
       - Título: Exibe o emoji da plataforma seguido de "Música Adicionada à Fila".
       - Descrição: Exibe o título da música (como link clicável, se houver URL).
@@ -76,23 +76,21 @@ def create_queue_added_embed(song: dict, estimated_time, track_length: str,
       - Se disponível, é exibida a thumbnail da faixa.
       - Footer: "Solicitado por {requester}" com o avatar (se fornecido).
     """
-    url = song.get("url", "")
-    platform = song.get("platform", "unknown").lower()
-    if "spotify.com" in url.lower():
-        platform = "spotify"
-    
-    emoji = SETTINGS.get("platform_icons", {}).get(platform, PLATFORM_EMOJIS.get(platform, ""))
+    url = song.link
+    platform = song.platform.key
+
+    emoji = get_setting("platform_icons", {}).get(platform, PLATFORM_EMOJIS.get(platform, ""))
     title = f"{emoji} Música Adicionada à Fila"
-    song_title = song.get("title", "Título desconhecido")
+    song_title = song.title
     description = f"[**{song_title}**]({url})" if url else f"**{song_title}**"
-    
+
     embed = discord.Embed(title=title, description=description, color=discord.Color.blue())
-    
+
     # Converte o tempo estimado se for numérico (em segundos)
     estimated_time_formatted = format_time_value(estimated_time)
     # Calcula o número de músicas que faltam até essa posição (assumindo que position é baseado em 1)
     upcoming = position - 1
-    
+
     detalhes = (
         f"**Duração:** {track_length}\n"
         f"**Tempo Estimado:** {estimated_time_formatted}\n"
@@ -101,21 +99,54 @@ def create_queue_added_embed(song: dict, estimated_time, track_length: str,
     )
     # Adiciona um campo sem título (usando zero-width space)
     embed.add_field(name="\u200b", value=detalhes, inline=False)
-    
-    if song.get("thumbnail"):
-        embed.set_thumbnail(url=song["thumbnail"])
-    
+
+    if song.thumbnail:
+        embed.set_thumbnail(url=song.thumbnail)
+
+    if requester_avatar:
+        embed.set_footer(text=f"Solicitado por {requester}", icon_url=requester_avatar)
+    else:
+        embed.set_footer(text=f"Solicitado por {requester}")
+
+    return embed
+
+
+def create_playlist_added_embed(name: str, platform: str, count: int, total_duration: int,
+                                position: int, requester: str, requester_avatar: str = None) -> discord.Embed:
+    """
+    Cria um embed informando que uma playlist (ou álbum) foi adicionada à fila.
+
+    Estrutura:
+      - Título: emoji da plataforma seguido de "Playlist Adicionada à Fila".
+      - Descrição: nome da playlist em negrito.
+      - Campo sem título com a quantidade de músicas, a duração total e a
+        posição da primeira música na fila.
+      - Footer: "Solicitado por {requester}" com o avatar (se fornecido).
+    """
+    platform = platform.lower()
+    emoji = get_setting("platform_icons", {}).get(platform, PLATFORM_EMOJIS.get(platform, ""))
+    embed = discord.Embed(title=f"{emoji} Playlist Adicionada à Fila",
+                          description=f"**{name}**",
+                          color=discord.Color.blue())
+    detalhes = (
+        f"**Músicas:** {count}\n"
+        f"**Duração Total:** {format_time_value(total_duration)}\n"
+        f"**Posição:** {position}"
+    )
+    embed.add_field(name="\u200b", value=detalhes, inline=False)
+
     if requester_avatar:
         embed.set_footer(text=f"Solicitado por {requester}", icon_url=requester_avatar)
     else:
         embed.set_footer(text=f"Solicitado por {requester}")
-    
+
     return embed
 
-def create_queue_list_embed(queue: list, requester: str) -> discord.Embed:
+
+def create_queue_list_embed(queue: list[Track], requester: str) -> discord.Embed:
     """
     Cria um embed para exibir a fila de faixas.
-    
+
     Para cada faixa, exibe:
       - O emoji da plataforma.
       - O título da faixa (em negrito e como link clicável, se houver URL).
@@ -124,20 +155,102 @@ def create_queue_list_embed(queue: list, requester: str) -> discord.Embed:
     embed = discord.Embed(title="🎼 **Fila de Músicas**",
                           description="Lista das próximas faixas na fila:",
                           color=discord.Color.purple())
-    
+
     for idx, song in enumerate(queue, start=1):
-        url = song.get("url", "")
-        platform = song.get("platform", "unknown").lower()
-        if "spotify.com" in url.lower():
-            platform = "spotify"
-        emoji = SETTINGS.get("platform_icons", {}).get(platform, PLATFORM_EMOJIS.get(platform, ""))
-        song_title = song.get("title", "Título desconhecido")
+        url = song.link
+        platform = song.platform.key
+        emoji = get_setting("platform_icons", {}).get(platform, PLATFORM_EMOJIS.get(platform, ""))
+        song_title = song.title
         embed.add_field(name=f"{emoji} {idx}. [**{song_title}**]({url})",
-                        value=f"Duração: {song.get('duration', '0:00')}",
+                        value=f"Duração: {format_time_value(song.duration)}",
                         inline=False)
-    
+
     embed.set_footer(text=f"Solicitado por {requester}")
     return embed
 
+
+def format_relative_time(seconds: float) -> str:
+    """
+    Momento daqui a `seconds` segundos como timestamp relativo do Discord
+    ("em 3 minutos"), que o próprio cliente mantém atualizado.
+    """
+    return f"<t:{int(time.time() + seconds)}:R>"
+
+
+def create_status_embed(current: Track | None, queue: SongQueue, remaining: float | None,
+                        loop_mode: bool, upcoming: int = 5) -> discord.Embed:
+    """
+    Cria o embed da mensagem de status da guild (`StatusBoard`).
+
+    Estrutura:
+      - Título: "<emoji> Tocando Agora" (ou "⏹️ Nada Tocando" / "⏸️ Fila Aguardando").
+      - Descrição: a faixa atual e quando ela termina, seguida das próximas
+        `upcoming` faixas com o horário previsto de início.
+      - Footer: total de faixas e duração da fila.
+
+    Os horários são timestamps relativos, então o embed não fica
+    desatualizado entre uma edição e outra. Só as faixas exibidas são lidas
+    da fila (`SongQueue.page`), sem copiá-la.
+    """
+    if current is None and not queue:
+        return discord.Embed(title="⏹️ Nada Tocando",
+                             description="Use `/play` para adicionar músicas à fila.",
+                             color=discord.Color.dark_grey())
+
+    lines = []
+    if current is not None:
+        platform = current.platform.key
+        emoji = get_setting("platform_icons", {}).get(platform, PLATFORM_EMOJIS.get(platform, ""))
+        title = f"{emoji} Tocando Agora"
+        url = current.link
+        lines.append(f"[**{current.title}**]({url})" if url else f"**{current.title}**")
+        if remaining is None:
+            # A faixa ainda está sendo preparada (stream/FFmpeg)
+            ends = "Iniciando..."
+        elif loop_mode:
+            ends = "🔁 Em loop"
+        else:
+            ends = f"Termina {format_relative_time(remaining)}"
+        lines.append(f"{ends} · {format_time_value(current.duration)}")
+    else:
+        title = "⏸️ Fila Aguardando"
+        lines.append("Use `/play` para retomar a reprodução.")
+
+    # Índice 0 é a faixa atual (ou a primeira a tocar, se nada estiver tocando)
+    start = 1 if current is not None else 0
+    end = start + upcoming
+    if start < len(queue):
+        lines.append("")
+        lines.append("**Próximas:**")
+        cumulative = remaining or 0.0
+        for idx, duration, song in queue.page(start, end):
+            song_title = song.title if len(song.title) <= 60 else song.title[:57] + "..."
+            line = f"`{idx + 1}.` {song_title} · {format_time_value(duration)}"
+            if remaining is not None and not loop_mode:
+                line += f" · {format_relative_time(cumulative)}"
+            lines.append(line)
+            cumulative += duration
+        if len(queue) > end:
+            lines.append(f"... e mais {len(queue) - end} na fila (`/queue`)")
+
+    embed = discord.Embed(title=title, description="\n".join(lines), color=discord.Color.green())
+    if current is not None and current.thumbnail:
+        embed.set_thumbnail(url=current.thumbnail)
+    embed.set_footer(text=f"{len(queue)} faixa(s) · {format_time_value(queue.total_duration)} no total")
+    return embed
+
+
+def create_stats_embed(sections: dict[str, str]) -> discord.Embed:
+    """
+    Cria o embed do /stats: um campo por seção (extração, reprodução,
+    sistema...), na ordem do dicionário recebido.
+    """
+    embed = discord.Embed(title="📈 Métricas do Bot", color=discord.Color.dark_teal())
+    for name, value in sections.items():
+        embed.add_field(name=name, value=value, inline=False)
+    embed.set_footer(text="Percentis das últimas observações; histórico completo em /metrics")
+    return embed
+
+
 # Alias para compatibilidade caso seu código utilize o nome 'create_song_embed'
-create_song_embed = create_now_playing_embed
\ No newline at end of file
+create_song_embed = create_now_playing_embed
@@ -0,0 +1,859 @@
+# File: utils/guild_player.py
+from __future__ import annotations
+
+import asyncio
+import datetime
+import sys
+import time
+from collections import deque
+
+import discord
+
+from services.rate_governor import BACKGROUND, request_priority
+from services.resource_governor import AdmissionTimeout, get_resource_governor
+from utils.cache import get_song_cache
+from utils.embed_utils import create_status_embed
+from utils.lazy_import import lazy_import
+from utils.logging_utils import get_logger
+from utils.metrics import (IDLE_DISCONNECTS, PLAYBACK_ERRORS, RECOVERIES, RECOVERY_SECONDS, SESSIONS_RESTORED,
+                           TRACK_GAP_SECONDS, TRACKS_PLAYED)
+from utils.music_utils import resolve_stream
+from utils.playback_stats import MeteredSource
+from utils.player_store import SavedSession, get_player_store
+from utils.settings import get_setting
+from utils.song_queue import SongQueue
+from utils.status_board import StatusBoard
+from utils.track import Track
+from utils.track_index import get_track_index
+
+FFMPEG_OPTIONS = {
+    'before_options': '-reconnect 1 -reconnect_streamed 1 -reconnect_delay_max 5',
+    'options': '-vn'
+}
+
+logger = get_logger("player")
+audio_cache_service = lazy_import("services.audio_cache")
+audio_node_service = lazy_import("services.audio_node_client")
+
+
+def _get_audio_cache():
+    # Com o cache de áudio desativado, o módulo nem chega a ser importado
+    if not get_setting("audio_cache.enabled", False):
+        return None
+    return audio_cache_service.get_audio_cache()
+
+
+def _get_audio_node():
+    # Sem o nó de áudio configurado, o FFmpeg roda sempre no processo do bot
+    if not get_setting("audio_node.enabled", False):
+        return None
+    return audio_node_service.get_audio_node_client()
+
+
+def _deep_sizeof(obj, seen=None) -> int:
+    """
+    Estima (em bytes) a memória ocupada por um objeto e pelos objetos que ele
+    referencia (faixas, dicts, listas, strings...). Usado apenas para métricas.
+    """
+    if seen is None:
+        seen = set()
+    if id(obj) in seen:
+        return 0
+    seen.add(id(obj))
+    size = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        size += sum(_deep_sizeof(k, seen) + _deep_sizeof(v, seen) for k, v in obj.items())
+    elif isinstance(obj, (list, tuple, set, frozenset, deque, SongQueue)):
+        size += sum(_deep_sizeof(item, seen) for item in obj)
+    elif isinstance(obj, Track):
+        size += sum(_deep_sizeof(getattr(obj, name), seen) for name in Track.__slots__)
+    return size
+
+
+class GuildPlayer:
+    """
+    Estado de reprodução de uma única guild: fila, faixa atual, início da
+    faixa e modo de loop. Cada guild tem o seu próprio player, de modo que
+    filas de servidores diferentes nunca se misturam.
+    """
+
+    def __init__(self, registry: "PlayerRegistry", guild_id: int):
+        self.registry = registry
+        self.bot = registry.bot
+        self.guild_id = guild_id
+        self.queue = SongQueue()
+        self.loop_mode = False
+        self.currently_playing: Track | None = None
+        self.start_time: datetime.datetime | None = None
+        self.voice_client: discord.VoiceClient | None = None
+        self.last_activity = time.monotonic()
+        # Marcado em destroy(): callbacks que chegam depois não criam tasks
+        self.closed = False
+        self.prefetch_lead = get_setting("player.prefetch_lead", 15)
+        # "auto": passagem direta de Opus quando possível; "pcm": modo antigo
+        self.audio_mode = get_setting("player.audio_mode", "auto")
+        self.gaps = deque(maxlen=100)
+        self._tasks: set[asyncio.Task] = set()
+        # (música, audio_url, fonte) da próxima faixa, já com o FFmpeg iniciado
+        self._prepared: tuple | None = None
+        self._prefetch_task: asyncio.Task | None = None
+        # Retomada de streams que caem no meio da faixa
+        self.recovery_attempts = get_setting("player.recovery_attempts", 3)
+        self.recovery_tolerance = get_setting("player.recovery_tolerance", 5)
+        self._recovery_attempts = 0
+        # Nova tentativa de iniciar a faixa quando não há vaga para o FFmpeg
+        self.start_retries = get_setting("player.start_retries", 3)
+        self.start_retry_delay = get_setting("player.start_retry_delay", 5)
+        self._start_attempts = 0
+        self._retry_task: asyncio.Task | None = None
+        # Mensagem de status da guild, lida da fila ao vivo a cada atualização
+        self.status = StatusBoard(self._render_status, self.spawn,
+                                  min_interval=get_setting("status.edit_interval", 5),
+                                  enabled=get_setting("status.enabled", True))
+        self.status_upcoming = get_setting("status.upcoming", 5)
+        # Cada alteração da fila vai para o log do PlayerStore (retomada após
+        # reinícios) e desatualiza a mensagem de status
+        self.store = registry.store
+        self.queue.journal = self._queue_changed
+
+    def touch(self):
+        """Marca o player como ativo (adia a remoção por ociosidade)."""
+        self.last_activity = time.monotonic()
+
+    def spawn(self, coro) -> asyncio.Task | None:
+        """
+        Cria uma task vinculada a este player. As tasks ficam registradas até
+        terminarem, para que possam ser contadas e canceladas no teardown.
+        Depois do `destroy()` a corrotina é descartada e o retorno é None.
+        """
+        if self.closed:
+            coro.close()
+            return None
+        task = self.bot.loop.create_task(coro)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return task
+
+    @property
+    def is_playing(self) -> bool:
+        vc = self.voice_client
+        return bool(vc and (vc.is_playing() or vc.is_paused()))
+
+    @property
+    def start_pending(self) -> bool:
+        """Há uma nova tentativa de iniciar a faixa agendada."""
+        return self._retry_task is not None and not self._retry_task.done()
+
+    def is_idle(self, timeout: float) -> bool:
+        """
+        O player está ocioso se nada está tocando nem para começar e não há
+        atividade recente. Uma fila parada (ex.: sessão retomada sem ouvintes
+        ou faixa que desistiu de esperar o FFmpeg) também conta: só um /play
+        a tiraria do lugar.
+        """
+        if self.currently_playing or self.is_playing or self.start_pending:
+            return False
+        return time.monotonic() - self.last_activity >= timeout
+
+    def _remaining_current(self) -> float:
+        """Segundos que faltam para a faixa atual terminar."""
+        if not self.queue or self.start_time is None:
+            return 0.0
+        elapsed = (datetime.datetime.utcnow() - self.start_time).total_seconds()
+        return max(self.queue.duration_at(0) - elapsed, 0.0)
+
+    def _queue_changed(self, op: str, *args):
+        if self.store is not None:
+            self.store.record_queue(self.guild_id, op, *args)
+        self.status.invalidate()
+
+    def _render_status(self) -> discord.Embed:
+        remaining = self._remaining_current() if self.start_time is not None else None
+        return create_status_embed(self.currently_playing, self.queue, remaining, self.loop_mode,
+                                   self.status_upcoming)
+
+    def _next_song(self) -> Track | None:
+        next_index = 0 if self.loop_mode else 1
+        return self.queue[next_index] if len(self.queue) > next_index else None
+
+    def _cleanup_prepared(self):
+        if self._prepared is not None:
+            self._prepared[2].cleanup()
+            self._prepared = None
+
+    def _take_prepared(self, song: Track):
+        """Retorna a fonte pré-criada para `song`, se ainda for válida."""
+        prepared, self._prepared = self._prepared, None
+        if prepared is None:
+            return None
+        prepared_song, audio_url, source = prepared
+        if prepared_song is song and audio_url == song.audio_url:
+            return source
+        source.cleanup()
+        return None
+
+    def _schedule_prefetch(self):
+        if self._prefetch_task is not None:
+            self._prefetch_task.cancel()
+        self._prefetch_task = self.spawn(self._prefetch_next())
+
+    async def _prefetch_next(self):
+        """
+        Etapa de antecipação: enquanto a faixa atual toca, resolve a próxima
+        faixa (entradas de playlist só são buscadas aqui) ou renova a sua URL
+        se ela estiver perto de expirar, sonda o stream e, perto do fim da
+        faixa atual, deixa o FFmpeg da próxima já iniciado.
+        """
+        try:
+            song = self._next_song()
+            if song is None:
+                return
+            if not self._has_local_audio(song):
+                remaining = self._remaining_current()
+                # Antecipação tem folga: cede a vez aos /play interativos nos provedores
+                with request_priority(BACKGROUND):
+                    await resolve_stream(song, valid_for=remaining)
+                    if not song.audio_url:
+                        return
+                    try:
+                        song.codec, song.bitrate = await discord.FFmpegOpusAudio.probe(song.audio_url)
+                    except Exception as e:
+                        # Sonda falhou: a URL pode ter sido invalidada; tenta uma nova
+                        logger.debug("Falha ao sondar o próximo stream",
+                                     extra={"guild": self.guild_id, "error": str(e)})
+                        song.clear_stream()
+                        await resolve_stream(song, valid_for=remaining)
+
+            await asyncio.sleep(max(self._remaining_current() - self.prefetch_lead, 0))
+            if self._next_song() is not song:
+                return
+            if not song.audio_url and not self._has_local_audio(song):
+                return
+            self._cleanup_prepared()
+            source = await self._create_source(song, prefetch=True)
+            if source is not None:
+                self._prepared = (song, song.audio_url, source)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            PLAYBACK_ERRORS.inc(stage="prefetch")
+            logger.warning("Erro ao antecipar a próxima faixa", extra={"guild": self.guild_id, "error": str(e)})
+
+    def _has_local_audio(self, song: Track) -> bool:
+        audio_cache = _get_audio_cache()
+        return audio_cache is not None and audio_cache.has(song)
+
+    async def _create_source(self, song: Track, offset: float = 0.0,
+                             prefetch: bool = False) -> discord.AudioSource | None:
+        """
+        Cria a fonte de áudio da música. Se a faixa estiver no cache de áudio
+        local, toca o arquivo Opus diretamente. No modo "auto", streams que já
+        são Opus (o caso comum no YouTube) são copiados pelo FFmpeg sem
+        recodificação; os demais são convertidos para Opus pelo próprio FFmpeg.
+        Em ambos os casos o discord.py não precisa codificar PCM em Python.
+        Com o nó de áudio ativo, esse FFmpeg roda no nó (sonda incluída) e o
+        bot só recebe os pacotes Opus; se o nó estiver fora do ar, o FFmpeg é
+        iniciado aqui mesmo. Com `offset`, o FFmpeg começa nessa posição
+        (segundos) da faixa.
+
+        Cada FFmpeg local ocupa uma vaga do governador de recursos até a fonte
+        ser encerrada. Na antecipação (`prefetch`) a vaga não é esperada: sem
+        vaga livre, retorna None e a faixa abre o FFmpeg na hora de tocar.
+        """
+        audio_cache = _get_audio_cache()
+        local_path = audio_cache.local_path(song) if audio_cache is not None else None
+        if local_path is None and self.audio_mode != "pcm":
+            node = _get_audio_node()
+            if node is not None:
+                source = await node.open_source(song.audio_url, offset=offset, codec=song.codec,
+                                                bitrate=song.bitrate, before_options=FFMPEG_OPTIONS["before_options"])
+                if source is not None:
+                    return MeteredSource(source, "node", offset)
+
+        governor = get_resource_governor()
+        slot = governor.try_acquire(self.guild_id) if prefetch else await governor.acquire(self.guild_id)
+        if slot is None:
+            return None
+        try:
+            source, mode = await self._spawn_ffmpeg(song, local_path, offset)
+        except BaseException:
+            slot.release()
+            raise
+        return MeteredSource(source, mode, offset, slot=slot)
+
+    async def _spawn_ffmpeg(self, song: Track, local_path: str | None,
+                            offset: float) -> tuple[discord.FFmpegAudio, str]:
+        """Inicia o FFmpeg local da faixa. Retorna a fonte e o modo de reprodução."""
+        seek = f" -ss {offset:.2f}" if offset > 0 else ""
+        if local_path is not None:
+            if self.audio_mode == "pcm":
+                return discord.FFmpegPCMAudio(local_path, before_options=seek.strip() or None, options="-vn"), "pcm"
+            return discord.FFmpegOpusAudio(local_path, codec="copy", before_options=seek.strip() or None,
+                                           options="-vn"), "opus_copy"
+
+        audio_url = song.audio_url
+        options = dict(FFMPEG_OPTIONS, before_options=FFMPEG_OPTIONS["before_options"] + seek)
+        if self.audio_mode == "pcm":
+            return discord.FFmpegPCMAudio(audio_url, **options), "pcm"
+
+        codec = song.codec
+        bitrate = song.bitrate
+        if not codec:
+            try:
+                codec, bitrate = await discord.FFmpegOpusAudio.probe(audio_url)
+            except Exception as e:
+                logger.debug("Falha ao sondar o codec; recodificando", extra={"guild": self.guild_id, "error": str(e)})
+        mode = "opus_copy" if codec in ("opus", "libopus") else "opus_transcode"
+        bitrate = min(int(bitrate or 128), 128)
+        return discord.FFmpegOpusAudio(audio_url, bitrate=bitrate, codec=codec, **options), mode
+
+    async def _play_song(self, voice_client: discord.VoiceClient, ended_at: float | None = None,
+                         offset: float = 0.0):
+        self.voice_client = voice_client
+        self.touch()
+        # Entradas que não podem ser resolvidas (vídeo removido, faixa sem
+        # correspondência) saem da fila e a seguinte é tentada no lugar
+        while True:
+            if not self.queue:
+                logger.debug("A fila está vazia. Nada para tocar.", extra={"guild": self.guild_id})
+                return
+
+            current_song = self.queue[0]
+            self.currently_playing = current_song
+
+            # A fonte antecipada começa do início: ao retomar uma sessão (offset) ela não serve
+            source = self._take_prepared(current_song) if offset <= 0 else None
+            prefetched = source is not None
+            if source is not None:
+                break
+            local = self._has_local_audio(current_song)
+            resolve_failed = False
+            if not local:
+                try:
+                    # Sem fonte antecipada: resolve a música (entradas de playlist
+                    # chegam aqui sem stream) ou renova uma URL perto de expirar
+                    await resolve_stream(current_song)
+                except Exception as e:
+                    resolve_failed = True
+                    PLAYBACK_ERRORS.inc(stage="resolve")
+                    logger.warning("Erro ao renovar a URL de áudio", extra={"guild": self.guild_id, "error": str(e)})
+
+            if not local and not current_song.audio_url:
+                if not resolve_failed:
+                    PLAYBACK_ERRORS.inc(stage="resolve")
+                logger.warning("URL de áudio não encontrada; pulando a música",
+                               extra={"guild": self.guild_id, "title": current_song.title})
+                self._drop_unplayable(current_song)
+                offset = 0.0
+                continue
+
+            try:
+                source = await self._create_source(current_song, offset=offset)
+            except Exception as e:
+                PLAYBACK_ERRORS.inc(stage="source")
+                logger.error("Erro ao criar a fonte de áudio", extra={"guild": self.guild_id, "error": str(e)})
+                # A faixa fica na fila; sem vaga para o FFmpeg, tenta de novo mais tarde
+                self.currently_playing = None
+                self.status.invalidate()
+                if isinstance(e, AdmissionTimeout):
+                    self._schedule_start_retry(voice_client, offset)
+                return
+            break
+
+        self._recovery_attempts = 0
+        if not self._start_playback(voice_client, current_song, source, prefetched=prefetched, offset=offset):
+            return
+        self._start_attempts = 0
+        TRACKS_PLAYED.inc()
+
+        audio_cache = _get_audio_cache()
+        if audio_cache is not None:
+            audio_cache.record_play(current_song)
+        index = get_track_index()
+        if index is not None:
+            index.record_play(self.guild_id, current_song)
+
+        if ended_at is not None:
+            gap = time.perf_counter() - ended_at
+            self.gaps.append(gap)
+            TRACK_GAP_SECONDS.observe(gap)
+            logger.debug("Intervalo entre faixas", extra={"guild": self.guild_id, "gap_ms": round(gap * 1000)})
+        self._schedule_prefetch()
+
+    def _drop_unplayable(self, song: Track):
+        """Tira da fila a faixa que não pôde ser resolvida e libera o "tocando agora"."""
+        self.currently_playing = None
+        self.start_time = None
+        # A fila pode ter mudado enquanto a faixa era resolvida (ex.: /stop)
+        if self.queue and self.queue[0] is song:
+            self.queue.popleft()
+        self.status.invalidate()
+
+    def _schedule_start_retry(self, voice_client: discord.VoiceClient, offset: float):
+        """
+        Agenda uma nova tentativa de tocar a faixa da frente, com espera
+        dobrada a cada falha seguida (`player.start_retry_delay` segundos na
+        primeira). Depois de `player.start_retries` tentativas a fila fica
+        parada e o player pode ser descartado por ociosidade.
+        """
+        if self.start_pending:
+            # Um /play falhou enquanto outra tentativa já estava agendada
+            return
+        if self._start_attempts >= self.start_retries:
+            logger.warning("Desistindo de iniciar a faixa: sem vaga para o FFmpeg", extra={
+                "guild": self.guild_id, "attempts": self._start_attempts})
+            self._start_attempts = 0
+            self.touch()
+            return
+        delay = self.start_retry_delay * 2 ** self._start_attempts
+        self._start_attempts += 1
+        self._retry_task = self.spawn(self._retry_start(voice_client, offset, delay))
+
+    async def _retry_start(self, voice_client: discord.VoiceClient, offset: float, delay: float):
+        await asyncio.sleep(delay)
+        self._retry_task = None
+        # Um /play (ou /stop) pode ter resolvido a situação durante a espera
+        if not self.queue or self.currently_playing is not None or self.is_playing:
+            return
+        if not voice_client.is_connected():
+            return
+        await self._play_song(voice_client, offset=offset)
+
+    def _start_playback(self, voice_client: discord.VoiceClient, song: Track, source: discord.AudioSource,
+                        prefetched: bool = False, offset: float = 0.0) -> bool:
+        if self.closed:
+            # O player foi descartado enquanto a fonte era criada
+            source.cleanup()
+            return False
+        # Recuado pelo offset: o tempo restante e os embeds continuam corretos após retomar
+        self.start_time = datetime.datetime.utcnow() - datetime.timedelta(seconds=offset)
+        loop = self.bot.loop
+
+        def after_play(error):
+            # Executado na thread do player de áudio: agenda a continuação no event loop.
+            finished_at = time.perf_counter()
+            if error:
+                PLAYBACK_ERRORS.inc(stage="stream")
+                logger.error("Erro durante a reprodução", extra={"guild": self.guild_id, "error": str(error)})
+            loop.call_soon_threadsafe(self.spawn, self._after_song(voice_client, finished_at, source, error))
+
+        try:
+            source.mark_playing(prefetched=prefetched)
+            voice_client.play(source, after=after_play)
+            logger.info("Reproduzindo", extra={"guild": self.guild_id, "title": song.title, "offset_s": round(offset)})
+        except Exception as e:
+            PLAYBACK_ERRORS.inc(stage="play")
+            logger.error("Erro ao iniciar a reprodução", extra={"guild": self.guild_id, "error": str(e)})
+            # Fecha o FFmpeg (e a vaga no governador) já, sem esperar o coletor de lixo
+            source.cleanup()
+            if not (voice_client.is_playing() or voice_client.is_paused()):
+                # Nada tocando: a faixa fica na fila para o próximo /play
+                self.currently_playing = None
+                self.start_time = None
+                self.status.invalidate()
+            return False
+        self.checkpoint()
+        self.status.invalidate()
+        return True
+
+    def checkpoint(self):
+        """
+        Salva a posição da faixa atual, o canal de voz e o modo de loop no
+        `PlayerStore`, compactando o log da guild quando ele cresce demais.
+        """
+        if self.store is None or self.currently_playing is None or self.start_time is None:
+            return
+        position = (datetime.datetime.utcnow() - self.start_time).total_seconds()
+        channel = getattr(self.voice_client, "channel", None)
+        channel_id = channel.id if channel is not None else None
+        if self.store.needs_compaction(self.guild_id, len(self.queue)):
+            self.store.compact(self.guild_id, list(self.queue), channel_id, self.loop_mode, position)
+        else:
+            self.store.record_state(self.guild_id, channel_id, self.loop_mode, position)
+
+    def _premature_end(self, voice_client: discord.VoiceClient, source, error) -> float | None:
+        """
+        Se a faixa atual terminou antes da hora (stream expirado ou caído no
+        meio), retorna a posição (segundos) em que parou; senão, None. Um
+        `stop()` (skip, stop, leave) não chega ao fim do stream e nunca conta.
+        """
+        if not self.queue or self.currently_playing is not self.queue[0] or not voice_client.is_connected():
+            return None
+        duration = self.queue.duration_at(0)
+        if duration <= 0:
+            # Duração desconhecida (ex.: transmissões ao vivo): não há como comparar
+            return None
+        if isinstance(source, MeteredSource):
+            if not (error or source.reached_eof):
+                return None
+            position = source.position
+        else:
+            position = (datetime.datetime.utcnow() - self.start_time).total_seconds() if self.start_time else duration
+        if position >= duration - self.recovery_tolerance:
+            return None
+        return position
+
+    async def _recover(self, voice_client: discord.VoiceClient, position: float, failed_at: float) -> bool:
+        """
+        Retoma a faixa atual em `position`: descarta a URL de stream (que
+        provavelmente expirou), resolve uma nova e reinicia o FFmpeg com `-ss`.
+        Tenta até `player.recovery_attempts` vezes por faixa.
+        """
+        song = self.queue[0]
+        while self._recovery_attempts < self.recovery_attempts:
+            self._recovery_attempts += 1
+            try:
+                if not self._has_local_audio(song):
+                    if song.source_url:
+                        await get_song_cache().invalidate_stream(song.source_url)
+                    song.clear_stream()
+                    await resolve_stream(song)
+                    if not song.audio_url:
+                        raise Exception("URL de áudio não encontrada")
+                source = await self._create_source(song, offset=position)
+            except Exception as e:
+                RECOVERIES.inc(result="failed")
+                logger.warning("Falha ao retomar a faixa", extra={
+                    "guild": self.guild_id, "attempt": self._recovery_attempts, "error": str(e)})
+                if self._recovery_attempts < self.recovery_attempts:
+                    await asyncio.sleep(self._recovery_attempts)
+                continue
+            if not self.queue or self.queue[0] is not song:
+                # A fila mudou enquanto o stream era resolvido (ex.: /stop)
+                source.cleanup()
+                return True
+            if not self._start_playback(voice_client, song, source, offset=position):
+                break
+            elapsed = time.perf_counter() - failed_at
+            RECOVERIES.inc(result="resumed")
+            RECOVERY_SECONDS.observe(elapsed)
+            logger.info("Faixa retomada após falha no stream", extra={
+                "guild": self.guild_id, "position_s": round(position), "attempt": self._recovery_attempts,
+                "recovery_ms": round(elapsed * 1000)})
+            self._schedule_prefetch()
+            return True
+        RECOVERIES.inc(result="gave_up")
+        return False
+
+    async def _after_song(self, voice_client: discord.VoiceClient, ended_at: float | None = None,
+                          source: discord.AudioSource | None = None, error: Exception | None = None):
+        if self.closed:
+            return
+        self.touch()
+        position = self._premature_end(voice_client, source, error) if source is not None else None
+        if position is not None:
+            logger.warning("Stream terminou antes do fim da faixa", extra={
+                "guild": self.guild_id, "position_s": round(position), "duration_s": self.queue.duration_at(0)})
+            if await self._recover(voice_client, position, ended_at or time.perf_counter()):
+                return
+        if not self.loop_mode:
+            if self.queue:
+                self.queue.popleft()
+
+        if self.queue:
+            await self._play_song(voice_client, ended_at)
+        else:
+            await asyncio.sleep(1)
+            self.currently_playing = None
+            self.start_time = None
+            if not self.queue:
+                # Fila esgotada: nada a retomar (apaga o log da guild no PlayerStore)
+                self.queue.clear()
+            self.status.invalidate()
+            self.touch()
+            logger.debug("Fim da fila. Nada mais a reproduzir.", extra={"guild": self.guild_id})
+
+    def stop(self):
+        """Para a reprodução e limpa a fila desta guild."""
+        self.queue.clear()
+        self.currently_playing = None
+        self.start_time = None
+        self._cleanup_prepared()
+        if self._retry_task is not None:
+            self._retry_task.cancel()
+            self._retry_task = None
+        self._start_attempts = 0
+        if self.voice_client and self.voice_client.is_connected():
+            self.voice_client.stop()
+        self.touch()
+
+    def destroy(self, keep_state: bool = False):
+        """
+        Libera o estado do player e cancela as tasks pendentes. Com
+        `keep_state` (desligamento, ex.: um deploy) a sessão salva no
+        `PlayerStore` continua valendo; senão ela é apagada.
+        """
+        self.closed = True
+        if keep_state:
+            self.queue.journal = None
+        self.queue.clear()
+        self.currently_playing = None
+        self.start_time = None
+        self.voice_client = None
+        self._cleanup_prepared()
+        self._retry_task = None
+        self.status.close()
+        for task in list(self._tasks):
+            task.cancel()
+        self._tasks.clear()
+
+    def gap_stats(self) -> dict:
+        """Intervalo (ms) entre o fim de uma faixa e o início da seguinte."""
+        if not self.gaps:
+            return {"count": 0, "last_ms": 0.0, "avg_ms": 0.0, "max_ms": 0.0}
+        return {
+            "count": len(self.gaps),
+            "last_ms": self.gaps[-1] * 1000,
+            "avg_ms": sum(self.gaps) / len(self.gaps) * 1000,
+            "max_ms": max(self.gaps) * 1000,
+        }
+
+    def memory_usage(self, sample: int | None = 32) -> int:
+        """
+        Memória aproximada (bytes) ocupada pela fila e pela faixa atual. Filas
+        com mais de `sample` faixas são estimadas por uma amostra espaçada
+        (custo fixo por guild, mesmo com playlists enormes); `sample=None`
+        mede faixa por faixa.
+        """
+        length = len(self.queue)
+        if sample is None or length <= sample:
+            return _deep_sizeof([self.queue, self.currently_playing])
+        seen = set()
+        step = length / sample
+        sampled = sum(_deep_sizeof(self.queue[int(i * step)], seen) for i in range(sample))
+        return (sys.getsizeof(self.queue) + _deep_sizeof(self.currently_playing, seen)
+                + sampled * length // sample)
+
+    @property
+    def task_count(self) -> int:
+        return sum(1 for task in self._tasks if not task.done())
+
+
+class PlayerRegistry:
+    """
+    Registro de `GuildPlayer` indexado pelo id da guild.
+
+    Os players são criados sob demanda (`get`) e removidos automaticamente
+    por uma task de limpeza quando ficam ociosos por mais de `idle_timeout`
+    segundos; o bot também sai do canal de voz da guild (inclusive depois de
+    um /stop ou do fim da fila). Com o `PlayerStore` ativo, a posição de quem está tocando é
+    salva a cada `persistence.checkpoint_interval` segundos e `restore`
+    retoma as sessões salvas depois de um reinício.
+    """
+
+    def __init__(self, bot, idle_timeout: float | None = None, reap_interval: float | None = None):
+        self.bot = bot
+        self.idle_timeout = idle_timeout if idle_timeout is not None else get_setting("player.idle_timeout", 300)
+        self.reap_interval = reap_interval if reap_interval is not None else get_setting("player.reap_interval", 60)
+        self.store = get_player_store()
+        self.checkpoint_interval = get_setting("persistence.checkpoint_interval", 10)
+        self.restore_interval = get_setting("persistence.restore_interval", 0.5)
+        self.restore_concurrency = get_setting("persistence.restore_concurrency", 4)
+        self.max_session_age = get_setting("persistence.max_age", 86400)
+        self._players: dict[int, GuildPlayer] = {}
+        self.peak_players = 0
+        self.peak_voice_clients = 0
+        self._reaper: asyncio.Task | None = None
+        self._checkpointer: asyncio.Task | None = None
+
+    def __len__(self) -> int:
+        return len(self._players)
+
+    def __contains__(self, guild_id: int) -> bool:
+        return guild_id in self._players
+
+    def get(self, guild_id: int) -> GuildPlayer:
+        """Retorna o player da guild, criando-o se ainda não existir."""
+        player = self._players.get(guild_id)
+        if player is None:
+            player = GuildPlayer(self, guild_id)
+            self._players[guild_id] = player
+            self._ensure_reaper()
+            self._observe_usage()
+        player.touch()
+        return player
+
+    def peek(self, guild_id: int) -> GuildPlayer | None:
+        """Retorna o player da guild sem criá-lo."""
+        return self._players.get(guild_id)
+
+    def players(self) -> list[GuildPlayer]:
+        return list(self._players.values())
+
+    def remove(self, guild_id: int, keep_state: bool = False):
+        player = self._players.pop(guild_id, None)
+        if player is not None:
+            player.destroy(keep_state=keep_state)
+            logger.debug("Player da guild removido", extra={"guild": guild_id})
+
+    def _ensure_reaper(self):
+        if self._reaper is None or self._reaper.done():
+            self._reaper = self.bot.loop.create_task(self._reap_loop())
+        if self.store is not None and (self._checkpointer is None or self._checkpointer.done()):
+            self._checkpointer = self.bot.loop.create_task(self._checkpoint_loop())
+
+    async def _checkpoint_loop(self):
+        while self._players:
+            await asyncio.sleep(self.checkpoint_interval)
+            self.checkpoint()
+
+    def checkpoint(self):
+        """Salva a posição de todos os players que estão tocando."""
+        for player in list(self._players.values()):
+            if player.is_playing:
+                player.checkpoint()
+
+    async def restore(self):
+        """
+        Retoma, depois do ready, as sessões salvas das guilds deste processo:
+        recria a fila (sem resolver nenhuma faixa), reconecta ao canal de voz
+        e toca a faixa atual a partir da posição salva (`-ss`). Só a faixa
+        atual de cada guild é resolvida agora (e só se a URL salva tiver
+        expirado); as seguintes seguem o fluxo normal de antecipação. No
+        máximo `persistence.restore_concurrency` guilds são retomadas ao mesmo
+        tempo, com `persistence.restore_interval` segundos entre elas. Sessões
+        sem alterações há mais de `persistence.max_age` segundos são apagadas
+        em vez de retomadas.
+        """
+        if self.store is None:
+            return
+        await self.bot.wait_until_ready()
+        try:
+            sessions = await self.store.load()
+        except Exception as e:
+            logger.warning("Falha ao ler as sessões salvas", extra={"error": str(e)})
+            return
+        semaphore = asyncio.Semaphore(self.restore_concurrency)
+
+        async def restore_one(session: SavedSession):
+            if self.max_session_age and time.time() - session.saved_at > self.max_session_age:
+                # Antiga demais para fazer sentido tocar de novo
+                self.store.record_queue(session.guild_id, "clear")
+                SESSIONS_RESTORED.inc(result="expired")
+                return
+            guild = self.bot.get_guild(session.guild_id)
+            if guild is None:
+                # Guild de outro cluster (ou o bot saiu dela): o estado fica para quem a tiver
+                return
+            async with semaphore:
+                try:
+                    result = await self._restore_session(guild, session)
+                except Exception as e:
+                    result = "failed"
+                    logger.warning("Falha ao retomar a sessão", extra={"guild": guild.id, "error": str(e)})
+                SESSIONS_RESTORED.inc(result=result)
+                if result == "resumed":
+                    logger.info("Sessão retomada", extra={
+                        "guild": guild.id, "tracks": len(session.tracks), "position_s": round(session.position)})
+                    await asyncio.sleep(self.restore_interval)
+
+        await asyncio.gather(*(restore_one(session) for session in sessions.values()))
+
+    async def _restore_session(self, guild, session: SavedSession) -> str:
+        player = self.get(guild.id)
+        if player.queue or player.currently_playing is not None:
+            # Alguém já usou /play depois do reinício: a fila nova prevalece
+            return "skipped"
+        tracks = session.decode_tracks()
+        if not tracks:
+            return "skipped"
+        # As faixas já estão no log: não precisam ser gravadas de novo
+        journal, player.queue.journal = player.queue.journal, None
+        player.queue.extend(tracks)
+        player.queue.journal = journal
+        player.loop_mode = session.loop_mode
+
+        channel = guild.get_channel(session.channel_id) if session.channel_id else None
+        if channel is None or not any(not member.bot for member in channel.members):
+            # Ninguém ouvindo: a fila fica pronta para o próximo /play
+            return "queued"
+        voice_client = guild.voice_client or await channel.connect()
+        await player._play_song(voice_client, offset=session.position)
+        return "resumed"
+
+    def _observe_usage(self):
+        # Amostrado na criação de players e a cada varredura: as conexões de
+        # voz duram pelo menos `idle_timeout`, mais que o intervalo entre elas
+        self.peak_players = max(self.peak_players, len(self._players))
+        self.peak_voice_clients = max(self.peak_voice_clients, len(self.bot.voice_clients))
+
+    async def _reap_loop(self):
+        while self._players:
+            await asyncio.sleep(self.reap_interval)
+            self._observe_usage()
+            try:
+                await self.reap()
+            except Exception as e:
+                logger.warning("Falha ao descartar players ociosos", extra={"error": str(e)})
+
+    def _voice_client(self, guild_id: int, player: GuildPlayer):
+        guild = self.bot.get_guild(guild_id)
+        voice_client = guild.voice_client if guild is not None else None
+        return voice_client or player.voice_client
+
+    async def reap(self) -> int:
+        """
+        Descarta os players ociosos e encerra as suas conexões de voz (o canal
+        não fica ocupado nem o socket aberto). Retorna quantos foram removidos.
+        """
+        idle = [gid for gid, player in self._players.items() if player.is_idle(self.idle_timeout)]
+        reaped = 0
+        for guild_id in idle:
+            player = self._players.get(guild_id)
+            if player is None:
+                continue
+            voice_client = self._voice_client(guild_id, player)
+            if voice_client is not None and voice_client.is_connected():
+                try:
+                    await voice_client.disconnect()
+                except Exception as e:
+                    logger.warning("Falha ao sair do canal de voz", extra={"guild": guild_id, "error": str(e)})
+            # Um /play durante a desconexão mantém o player
+            if self._players.get(guild_id) is player and player.is_idle(self.idle_timeout):
+                self.remove(guild_id)
+                IDLE_DISCONNECTS.inc()
+                reaped += 1
+                logger.info("Player ocioso descartado", extra={"guild": guild_id})
+        return reaped
+
+    def close(self):
+        """
+        Remove todos os players (mantendo as sessões salvas) e encerra as tasks
+        de limpeza e de checkpoint.
+        """
+        if self._reaper is not None:
+            self._reaper.cancel()
+            self._reaper = None
+        if self._checkpointer is not None:
+            self._checkpointer.cancel()
+            self._checkpointer = None
+        for guild_id in list(self._players):
+            # Desligamento: as sessões salvas são retomadas no próximo início
+            self.remove(guild_id, keep_state=True)
+
+    def stats(self) -> dict:
+        """
+        Retorna métricas por guild (memória aproximada, tasks ativas e tamanho
+        da fila), os totais do registro e os picos de players e de conexões
+        de voz. A memória vem de uma amostra de cada fila: o custo não cresce
+        com o tamanho das filas (chamado a cada /stats e coleta de métricas).
+        """
+        guilds = {
+            guild_id: {
+                "memory_bytes": player.memory_usage(),
+                "tasks": player.task_count,
+                "queue_length": len(player.queue),
+                "gap_ms": player.gap_stats()["last_ms"],
+            }
+            for guild_id, player in self._players.items()
+        }
+        self._observe_usage()
+        return {
+            "players": len(guilds),
+            "peak_players": self.peak_players,
+            "voice_clients": len(self.bot.voice_clients),
+            "peak_voice_clients": self.peak_voice_clients,
+            "memory_bytes": sum(g["memory_bytes"] for g in guilds.values()),
+            "tasks": sum(g["tasks"] for g in guilds.values()),
+            "guilds": guilds,
+        }
@@ -0,0 +1,53 @@
+# File: utils/lazy_import.py
+import importlib
+import sys
+import time
+
+from utils.logging_utils import get_logger
+from utils.metrics import LAZY_IMPORT_SECONDS
+
+logger = get_logger("startup")
+
+
+class LazyModule:
+    """
+    Referência a um módulo que só é importado no primeiro acesso a um
+    atributo (`youtube_service.get_youtube_song_info(...)`). Permite que a cog
+    carregue sem puxar os serviços (process pool, SQLite, cliente HTTP) antes
+    do primeiro comando que precisar deles.
+    """
+
+    def __init__(self, name: str):
+        self._name = name
+        self._module = None
+
+    @property
+    def loaded(self) -> bool:
+        """Indica se o módulo já foi importado, por aqui ou por outro caminho."""
+        return self._module is not None or self._name in sys.modules
+
+    def _load(self):
+        module = sys.modules.get(self._name)
+        if module is not None:
+            # Já importado por outro caminho: não há custo a registrar
+            self._module = module
+            return module
+        started = time.perf_counter()
+        module = importlib.import_module(self._name)
+        elapsed = time.perf_counter() - started
+        LAZY_IMPORT_SECONDS.set(elapsed, module=self._name)
+        logger.debug("Módulo importado sob demanda", extra={"lazy_module": self._name, "import_ms": round(elapsed * 1000, 1)})
+        self._module = module
+        return module
+
+    def __getattr__(self, attr: str):
+        module = self._module if self._module is not None else self._load()
+        return getattr(module, attr)
+
+    def __repr__(self) -> str:
+        return f"<LazyModule {self._name!r} ({'carregado' if self.loaded else 'pendente'})>"
+
+
+def lazy_import(name: str) -> LazyModule:
+    """Retorna um `LazyModule` para `name` (ex.: "services.youtube_service")."""
+    return LazyModule(name)
@@ -0,0 +1,76 @@
+# File: utils/logging_utils.py
+from __future__ import annotations
+
+import json
+import logging
+import sys
+
+from utils.settings import get_setting
+
+# Atributos padrão de um LogRecord; todo o resto veio de `extra=` e vira campo
+_RECORD_ATTRS = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime"}
+
+
+def _fields(record: logging.LogRecord) -> dict:
+    return {key: value for key, value in vars(record).items() if key not in _RECORD_ATTRS}
+
+
+def _format_value(value) -> str:
+    text = str(value)
+    return json.dumps(text, ensure_ascii=False) if not text or " " in text else text
+
+
+class KeyValueFormatter(logging.Formatter):
+    """
+    Formato legível: `2025-01-01 12:00:00 INFO kali.player: mensagem guild=123 ms=40`.
+    Os campos passados em `extra=` são anexados como chave=valor.
+    """
+
+    def __init__(self):
+        super().__init__("%(asctime)s %(levelname)s %(name)s: %(message)s", "%Y-%m-%d %H:%M:%S")
+
+    def formatMessage(self, record: logging.LogRecord) -> str:
+        line = super().formatMessage(record)
+        fields = _fields(record)
+        if fields:
+            line += " " + " ".join(f"{key}={_format_value(value)}" for key, value in fields.items())
+        return line
+
+
+class JsonFormatter(logging.Formatter):
+    """Uma linha JSON por evento, para coletores de log."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        payload = {
+            "ts": record.created,
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+            **_fields(record),
+        }
+        if record.exc_info:
+            payload["exception"] = self.formatException(record.exc_info)
+        return json.dumps(payload, default=str, ensure_ascii=False)
+
+
+def setup_logging(level: str | None = None, fmt: str | None = None):
+    """
+    Configura o log do processo (bot e discord.py) a partir de
+    `logging.level` e `logging.format` ("text" ou "json") do settings.yaml.
+    """
+    level = (level or get_setting("logging.level", "INFO")).upper()
+    fmt = fmt or get_setting("logging.format", "text")
+    handler = logging.StreamHandler(sys.stdout)
+    handler.setFormatter(JsonFormatter() if fmt == "json" else KeyValueFormatter())
+
+    root = logging.getLogger()
+    root.handlers = [handler]
+    root.setLevel(logging.WARNING)
+    logging.getLogger("kali").setLevel(level)
+    # O discord.py é muito verboso em DEBUG; mantém no máximo INFO
+    logging.getLogger("discord").setLevel(max(logging.getLevelName(level), logging.INFO))
+
+
+def get_logger(name: str) -> logging.Logger:
+    """Retorna o logger `kali.<name>`; use `extra={...}` para campos estruturados."""
+    return logging.getLogger(f"kali.{name}")
@@ -0,0 +1,298 @@
+# File: utils/metrics.py
+import asyncio
+import bisect
+import math
+import time
+from collections import deque
+from contextlib import contextmanager
+
+# Limites (segundos) dos histogramas de latência
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+# Observações recentes guardadas por série para os percentis do /stats
+WINDOW_SIZE = 500
+
+
+def _label_key(labelnames: tuple, labels: dict) -> tuple:
+    return tuple(str(labels.get(name, "")) for name in labelnames)
+
+
+def _format_labels(labelnames: tuple, values: tuple, extra: str = "") -> str:
+    pairs = [f'{name}="{value}"' for name, value in zip(labelnames, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_number(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, description: str, labelnames: tuple = ()):
+        self.name = name
+        self.description = description
+        self.labelnames = tuple(labelnames)
+
+    def render(self) -> list[str]:
+        return [f"# HELP {self.name} {self.description}", f"# TYPE {self.name} {self.kind}", *self._samples()]
+
+    def _samples(self) -> list[str]:
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    """Contador monotônico, opcionalmente com labels."""
+
+    kind = "counter"
+
+    def __init__(self, name: str, description: str, labelnames: tuple = ()):
+        super().__init__(name, description, labelnames)
+        self._values: dict[tuple, float] = {}
+
+    def inc(self, amount: float = 1, **labels):
+        key = _label_key(self.labelnames, labels)
+        self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels) -> float:
+        return self._values.get(_label_key(self.labelnames, labels), 0)
+
+    def _samples(self) -> list[str]:
+        return [f"{self.name}{_format_labels(self.labelnames, key)} {_format_number(value)}"
+                for key, value in self._values.items()]
+
+
+class Gauge(_Metric):
+    """
+    Valor instantâneo. Pode ser atualizado diretamente (`set`/`inc`/`dec`) ou
+    calculado na hora da coleta por `set_function` (a função retorna um
+    número ou, com labels, um dicionário {tupla de labels: número}).
+    """
+
+    kind = "gauge"
+
+    def __init__(self, name: str, description: str, labelnames: tuple = ()):
+        super().__init__(name, description, labelnames)
+        self._values: dict[tuple, float] = {}
+        self._function = None
+
+    def set(self, value: float, **labels):
+        self._values[_label_key(self.labelnames, labels)] = value
+
+    def inc(self, amount: float = 1, **labels):
+        key = _label_key(self.labelnames, labels)
+        self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount: float = 1, **labels):
+        self.inc(-amount, **labels)
+
+    def set_function(self, function):
+        self._function = function
+
+    def values(self) -> dict[tuple, float]:
+        if self._function is None:
+            return dict(self._values)
+        try:
+            result = self._function()
+        except Exception:
+            return {}
+        if isinstance(result, dict):
+            return {tuple(str(v) for v in (key if isinstance(key, tuple) else (key,))): value
+                    for key, value in result.items()}
+        return {(): result}
+
+    def value(self, **labels) -> float:
+        return self.values().get(_label_key(self.labelnames, labels), 0)
+
+    def _samples(self) -> list[str]:
+        return [f"{self.name}{_format_labels(self.labelnames, key)} {_format_number(value)}"
+                for key, value in self.values().items()]
+
+
+class Histogram(_Metric):
+    """
+    Histograma cumulativo no formato do Prometheus. Cada série também guarda
+    as últimas `WINDOW_SIZE` observações para calcular percentis no /stats.
+    """
+
+    kind = "histogram"
+
+    def __init__(self, name: str, description: str, labelnames: tuple = (), buckets: tuple = DEFAULT_BUCKETS):
+        super().__init__(name, description, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+        self._series: dict[tuple, dict] = {}
+
+    def observe(self, value: float, **labels):
+        key = _label_key(self.labelnames, labels)
+        series = self._series.get(key)
+        if series is None:
+            series = {"counts": [0] * len(self.buckets), "sum": 0.0, "count": 0,
+                      "window": deque(maxlen=WINDOW_SIZE)}
+            self._series[key] = series
+        series["counts"][bisect.bisect_left(self.buckets, value)] += 1
+        series["sum"] += value
+        series["count"] += 1
+        series["window"].append(value)
+
+    @contextmanager
+    def time(self, **labels):
+        """Mede (em segundos) a duração do bloco `with`."""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def snapshot(self, **labels) -> dict:
+        """Contagem, soma e percentis (p50/p95/p99) recentes de uma série."""
+        series = self._series.get(_label_key(self.labelnames, labels))
+        if series is None or not series["window"]:
+            return {"count": 0, "sum": 0.0, "p50": 0.0, "p95": 0.0, "p99": 0.0}
+        ordered = sorted(series["window"])
+
+        def pct(p: float) -> float:
+            return ordered[min(int(round(p / 100 * (len(ordered) - 1))), len(ordered) - 1)]
+
+        return {"count": series["count"], "sum": series["sum"], "p50": pct(50), "p95": pct(95), "p99": pct(99)}
+
+    def series(self) -> list[dict]:
+        """Labels de cada série observada."""
+        return [dict(zip(self.labelnames, key)) for key in self._series]
+
+    def _samples(self) -> list[str]:
+        lines = []
+        for key, series in self._series.items():
+            cumulative = 0
+            for bound, count in zip(self.buckets, series["counts"]):
+                cumulative += count
+                labels = _format_labels(self.labelnames, key, f'le="{_format_number(bound)}"')
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {_format_number(series['sum'])}")
+            lines.append(f"{self.name}_count{labels} {series['count']}")
+        return lines
+
+
+class MetricsRegistry:
+    """Registro de métricas do processo, exportadas no formato de texto do Prometheus."""
+
+    def __init__(self):
+        self._metrics: dict[str, _Metric] = {}
+
+    def _register(self, cls, name: str, description: str, labelnames: tuple, **kwargs):
+        metric = self._metrics.get(name)
+        if metric is None:
+            metric = cls(name, description, labelnames, **kwargs)
+            self._metrics[name] = metric
+        return metric
+
+    def counter(self, name: str, description: str, labelnames: tuple = ()) -> Counter:
+        return self._register(Counter, name, description, labelnames)
+
+    def gauge(self, name: str, description: str, labelnames: tuple = ()) -> Gauge:
+        return self._register(Gauge, name, description, labelnames)
+
+    def histogram(self, name: str, description: str, labelnames: tuple = (), buckets: tuple = DEFAULT_BUCKETS) -> Histogram:
+        return self._register(Histogram, name, description, labelnames, buckets=buckets)
+
+    def render(self) -> str:
+        return "\n".join(line for metric in self._metrics.values() for line in metric.render()) + "\n"
+
+
+metrics = MetricsRegistry()
+
+# Pontos instrumentados do bot
+EXTRACT_SECONDS = metrics.histogram(
+    "kali_extract_seconds", "Latência de extract_song_info por plataforma.", ("platform",))
+BACKEND_SECONDS = metrics.histogram(
+    "kali_backend_seconds", "Tempo gasto em cada backend de resolução (ytdlp, spotify).", ("backend",))
+BACKEND_ERRORS = metrics.counter(
+    "kali_backend_errors_total", "Falhas por backend de resolução.", ("backend",))
+FFMPEG_FIRST_PACKET_SECONDS = metrics.histogram(
+    "kali_ffmpeg_first_packet_seconds",
+    "Tempo até o primeiro pacote de áudio: desde o spawn do FFmpeg ou, se antecipado, desde o play.",
+    ("mode", "prefetched"))
+TRACK_GAP_SECONDS = metrics.histogram(
+    "kali_track_gap_seconds", "Intervalo entre o fim de uma faixa e o início da seguinte.")
+INTERACTION_SECONDS = metrics.histogram(
+    "kali_interaction_seconds", "Latência entre o defer e o followup de um comando.", ("command",))
+LOOP_LAG_SECONDS = metrics.histogram(
+    "kali_event_loop_lag_seconds", "Atraso do event loop em relação ao agendado.",
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0))
+TRACKS_PLAYED = metrics.counter(
+    "kali_tracks_played_total", "Faixas iniciadas.")
+PLAYBACK_ERRORS = metrics.counter(
+    "kali_playback_errors_total", "Falhas de reprodução por etapa.", ("stage",))
+RECOVERIES = metrics.counter(
+    "kali_stream_recoveries_total", "Tentativas de retomar faixas cujo stream caiu (resumed, failed, gave_up).",
+    ("result",))
+RECOVERY_SECONDS = metrics.histogram(
+    "kali_stream_recovery_seconds", "Tempo entre a queda do stream e a retomada da faixa.")
+SESSIONS_RESTORED = metrics.counter(
+    "kali_sessions_restored_total", "Sessões salvas retomadas após um reinício (resumed, queued, skipped, expired, failed).",
+    ("result",))
+STATUS_UPDATES = metrics.counter(
+    "kali_status_updates_total",
+    "Atualizações da mensagem de status por resultado (sent, edited, coalesced, failed).", ("result",))
+AUTOCOMPLETE_SECONDS = metrics.histogram(
+    "kali_autocomplete_seconds", "Tempo para montar as sugestões do autocomplete do /play.",
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1))
+AUDIO_NODE_EVENTS = metrics.counter(
+    "kali_audio_node_events_total",
+    "Conexão com o nó de áudio (connected, disconnected) e faixas tocadas no FFmpeg local por falta dele (fallback).",
+    ("event",))
+PLAYBACK_AUDIO_SECONDS = metrics.counter(
+    "kali_playback_audio_seconds_total", "Segundos de áudio tocados por modo de reprodução.", ("mode",))
+PLAYBACK_CPU_SECONDS = metrics.counter(
+    "kali_playback_cpu_seconds_total",
+    "CPU gasta por modo de reprodução, no FFmpeg (ffmpeg) e na thread de reprodução do discord.py (player).",
+    ("mode", "process"))
+VOICE_CLIENTS = metrics.gauge(
+    "kali_voice_clients", "Conexões de voz ativas.")
+FFMPEG_PROCESSES = metrics.gauge(
+    "kali_ffmpeg_processes", "Processos FFmpeg de reprodução abertos.")
+FFMPEG_ADMISSIONS = metrics.counter(
+    "kali_ffmpeg_admissions_total",
+    "Pedidos de vaga para o FFmpeg (immediate, queued, timeout; skipped = antecipação sem vaga livre).",
+    ("result",))
+FFMPEG_ADMISSION_SECONDS = metrics.histogram(
+    "kali_ffmpeg_admission_seconds", "Espera por uma vaga de FFmpeg, por prioridade.", ("priority",),
+    buckets=(0.001, 0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0))
+IDLE_DISCONNECTS = metrics.counter(
+    "kali_idle_disconnects_total", "Players ociosos descartados, com a conexão de voz encerrada.")
+SINGLE_FLIGHT_CALLS = metrics.counter(
+    "kali_single_flight_calls_total", "Chamadas por operação: as que executaram (leader) e as agrupadas (coalesced).",
+    ("operation", "role"))
+SEARCH_SECONDS = metrics.histogram(
+    "kali_search_seconds", "Latência das buscas por termo que não estavam em cache, por fonte.", ("source",))
+SEARCH_OUTCOMES = metrics.counter(
+    "kali_search_outcomes_total",
+    "Como cada busca foi resolvida (primary, hedge, cache_fallback, failed).", ("outcome",))
+RATE_LIMIT_WAIT_SECONDS = metrics.histogram(
+    "kali_rate_limit_wait_seconds", "Espera no governador de requisições por provedor e prioridade.",
+    ("provider", "priority"), buckets=(0.001, 0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0))
+RATE_LIMITED = metrics.counter(
+    "kali_rate_limited_total", "Recusas por excesso de requisições (HTTP 429 ou equivalente) por provedor.",
+    ("provider",))
+STARTUP_SECONDS = metrics.gauge(
+    "kali_startup_seconds", "Duração das fases da inicialização (imports, setup, ready).", ("phase",))
+LAZY_IMPORT_SECONDS = metrics.gauge(
+    "kali_lazy_import_seconds", "Tempo do import sob demanda de cada módulo.", ("module",))
+GATEWAY_EVENTS = metrics.counter(
+    "kali_gateway_events_total", "Conexões com o gateway (ready, resumed).", ("event",))
+COMMAND_TREE_SYNCS = metrics.counter(
+    "kali_command_tree_syncs_total", "Sincronizações da árvore de comandos (synced, skipped, failed).", ("result",))
+
+
+async def monitor_event_loop(interval: float = 0.5):
+    """
+    Mede continuamente o atraso do event loop: quanto um `sleep(interval)`
+    demora além do pedido. Atrasos altos indicam código bloqueando o loop.
+    """
+    while True:
+        started = time.perf_counter()
+        await asyncio.sleep(interval)
+        LOOP_LAG_SECONDS.observe(max(time.perf_counter() - started - interval, 0.0))
@@ -1,21 +1,136 @@
 # File: utils/music_utils.py
+from __future__ import annotations
+
 import re
-from services.spotify_service import get_spotify_song_info
-from services.youtube_service import get_youtube_song_info
+from utils.cache import get_song_cache, normalize_key
+from utils.lazy_import import lazy_import
+from utils.metrics import EXTRACT_SECONDS
+from utils.search_resolver import get_search_resolver
+from utils.settings import get_setting
+from utils.single_flight import SingleFlight
+from utils.track import Platform, Track
+from utils.track_index import get_track_index
+
+# Serviços importados no primeiro uso: a cog carrega sem o process pool, o
+# cliente HTTP do Spotify e o índice SQLite
+spotify_service = lazy_import("services.spotify_service")
+youtube_service = lazy_import("services.youtube_service")
+match_service = lazy_import("services.match_service")
+
+_extract_flight = SingleFlight("extract_song_info")
+
+
+def _query_platform(query: str) -> str:
+    if re.match(r'https?://', query):
+        lowered = query.lower()
+        if "spotify" in lowered:
+            return "spotify"
+        # URLs não reconhecidas também vão para o YouTube, mas são medidas à parte
+        return "youtube" if "youtube" in lowered else "url"
+    return "search"
+
 
-async def extract_song_info(query: str) -> dict:
+async def extract_song_info(query: str) -> Track:
     """
     Verifica se a query é uma URL (Spotify, YouTube, etc.) ou um termo de busca,
-    e retorna um dicionário com as informações da música.
+    e retorna a faixa (`Track`) correspondente.
+
+    Consultas ao YouTube passam pelo cache de `get_youtube_song_info`; links
+    do Spotify são guardados no mesmo cache, sem `audio_url`. Chamadas
+    simultâneas com a mesma chave normalizada (ex.: vários `/play` do mesmo
+    link) compartilham uma única extração; cada chamador recebe a sua cópia.
+    A latência é registrada por plataforma em `kali_extract_seconds`. A
+    faixa resolvida entra no índice do autocomplete do /play.
     """
-    if re.match(r'https?://', query):
-        if "spotify" in query.lower():
-            return await get_spotify_song_info(query)
-        elif "youtube" in query.lower():
-            return await get_youtube_song_info(query)
-        else:
-            # Se a URL não estiver reconhecida, utiliza o YouTube por padrão.
-            return await get_youtube_song_info(query)
+    with EXTRACT_SECONDS.time(platform=_query_platform(query)):
+        song = await _extract_flight.do(normalize_key(query), lambda: _load_song_info(query))
+    index = get_track_index()
+    if index is not None:
+        index.add(song)
+    return song.copy()
+
+
+async def _load_song_info(query: str) -> Track:
+    if _query_platform(query) == "spotify":
+        # Metadados do Spotify não têm stream próprio: basta o cache de metadados
+        return await get_song_cache().get_or_load(
+            query, lambda: spotify_service.get_spotify_song_info(query), require_stream=False
+        )
+    if _query_platform(query) == "search":
+        # Busca com prazo e requisição extra se o yt-dlp demorar (utils/search_resolver.py)
+        return await get_search_resolver().resolve(query)
+    # Links do YouTube e URLs não reconhecidas
+    return await youtube_service.get_youtube_song_info(query)
+
+
+def extraction_stats() -> dict:
+    """Chamadas de `extract_song_info` que extraíram e que foram agrupadas."""
+    return _extract_flight.stats()
+
+
+def is_playlist_url(query: str) -> bool:
+    """Indica se a query é o link de uma playlist/álbum do Spotify ou de uma playlist do YouTube."""
+    if not re.match(r'https?://', query):
+        return False
+    return spotify_service.extract_collection(query) is not None or youtube_service.is_youtube_playlist(query)
+
+
+async def extract_playlist_info(query: str) -> tuple[str, list[Track]]:
+    """
+    Retorna (nome, músicas) de uma playlist ou álbum. As músicas são entradas
+    leves: a busca no YouTube e a URL de stream só são resolvidas por
+    `resolve_stream` quando a faixa se aproxima do início da fila.
+    """
+    max_tracks = get_setting("playlist.max_tracks", 1000)
+    if spotify_service.extract_collection(query) is not None:
+        return await spotify_service.get_spotify_collection_info(query, max_tracks=max_tracks)
+    return await youtube_service.get_youtube_playlist_info(query, max_tracks=max_tracks)
+
+
+async def match_playlist(songs: list[Track], limit: int | None = None) -> int:
+    """
+    Associa em lote (`TrackMatcher.match_many`) as primeiras `limit` faixas
+    do Spotify ainda sem vídeo (padrão: `matching.playlist_batch`), para que
+    `resolve_stream` vá direto à URL do vídeo quando elas chegarem perto de
+    tocar. Retorna quantas faixas foram associadas.
+    """
+    limit = get_setting("matching.playlist_batch", 25) if limit is None else limit
+    pending = [song for song in songs
+               if song.platform == Platform.SPOTIFY and song.search_query and not song.source_url][:limit]
+    if not pending:
+        return 0
+    video_ids = await match_service.get_track_matcher().match_many(pending)
+    matched = 0
+    for song, video_id in zip(pending, video_ids):
+        # A faixa pode ter sido resolvida pelo player enquanto o lote rodava
+        if video_id and not song.source_url:
+            song.source_url = f"https://www.youtube.com/watch?v={video_id}"
+            matched += 1
+    return matched
+
+
+async def resolve_stream(song: Track, valid_for: float = 0.0) -> Track:
+    """
+    Garante que `song` tenha uma `audio_url` válida por pelo menos `valid_for`
+    segundos, trocando o stream da própria faixa:
+      - faixas com vídeo conhecido (do YouTube, ou do Spotify já associadas)
+        sem stream, ou com stream perto de expirar, são resolvidas de novo
+        pela URL do vídeo;
+      - faixas do Spotify ainda sem vídeo são associadas a um vídeo do
+        YouTube por `match_spotify_track` (índice persistente + busca).
+    """
+    if song.audio_url and song.stream_ttl() > valid_for:
+        return song
+    url = song.source_url or (song.url if song.platform != Platform.SPOTIFY else "")
+    if url:
+        if song.audio_url:
+            # A URL em cache também está perto de expirar: força uma nova extração
+            await get_song_cache().invalidate_stream(url)
+        fresh = await youtube_service.get_youtube_song_info(url)
+    elif song.search_query:
+        url = await match_service.match_spotify_track(song)
+        fresh = await youtube_service.get_youtube_song_info(url)
     else:
-        # Trata a query como termo de busca no YouTube.
-        return await get_youtube_song_info(query)
\ No newline at end of file
+        return song
+    song.set_stream(fresh.audio_url, fresh.codec, fresh.bitrate, fresh.url or url, fresh.expires_at)
+    return song
@@ -0,0 +1,178 @@
+# File: utils/playback_stats.py
+from __future__ import annotations
+
+import os
+import threading
+import time
+
+import discord
+
+from utils.logging_utils import get_logger
+from utils.metrics import FFMPEG_FIRST_PACKET_SECONDS, FFMPEG_PROCESSES, PLAYBACK_AUDIO_SECONDS, PLAYBACK_CPU_SECONDS
+
+# Modos de reprodução:
+#   - "opus_copy": o stream já é Opus e o FFmpeg apenas copia os pacotes;
+#   - "opus_transcode": o FFmpeg converte para Opus (libopus);
+#   - "pcm": o FFmpeg entrega PCM e o discord.py codifica em Opus em Python;
+#   - "node": o FFmpeg roda no nó de áudio, que entrega os pacotes Opus prontos.
+PLAYBACK_MODES = ("opus_copy", "opus_transcode", "pcm", "node")
+
+# Cada leitura do AudioPlayer do discord.py corresponde a um quadro de 20 ms
+FRAME_SECONDS = 0.02
+
+_CLOCK_TICKS = os.sysconf("SC_CLK_TCK") if hasattr(os, "sysconf") else 100
+
+logger = get_logger("playback")
+
+
+def _proc_cpu_seconds(stat_path: str) -> float | None:
+    """Lê utime + stime de um arquivo /proc/.../stat (apenas Linux)."""
+    try:
+        with open(stat_path, "r") as f:
+            # O nome do processo pode conter espaços: os campos começam após o ")"
+            fields = f.read().rsplit(")", 1)[1].split()
+        return (int(fields[11]) + int(fields[12])) / _CLOCK_TICKS
+    except (OSError, IndexError, ValueError):
+        return None
+
+
+class PlaybackStats:
+    """
+    Consumo de CPU por sessão de reprodução, agregado por modo, para comparar
+    o custo da passagem direta de Opus com o da recodificação. Os totais
+    também vão para `/metrics` e o resumo aparece no /stats.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._totals = {
+            mode: {"sessions": 0, "audio_seconds": 0.0, "ffmpeg_cpu": 0.0, "player_cpu": 0.0}
+            for mode in PLAYBACK_MODES
+        }
+
+    def record(self, mode: str, audio_seconds: float, ffmpeg_cpu: float | None, player_cpu: float | None):
+        with self._lock:
+            totals = self._totals[mode]
+            totals["sessions"] += 1
+            totals["audio_seconds"] += audio_seconds
+            totals["ffmpeg_cpu"] += ffmpeg_cpu or 0.0
+            totals["player_cpu"] += player_cpu or 0.0
+        PLAYBACK_AUDIO_SECONDS.inc(audio_seconds, mode=mode)
+        PLAYBACK_CPU_SECONDS.inc(ffmpeg_cpu or 0.0, mode=mode, process="ffmpeg")
+        PLAYBACK_CPU_SECONDS.inc(player_cpu or 0.0, mode=mode, process="player")
+
+    def summary(self) -> dict:
+        """
+        Por modo: sessões, segundos de áudio e o percentual de CPU do FFmpeg e
+        da thread de reprodução do discord.py por segundo de áudio.
+        """
+        with self._lock:
+            result = {}
+            for mode, totals in self._totals.items():
+                seconds = totals["audio_seconds"]
+                result[mode] = {
+                    "sessions": totals["sessions"],
+                    "audio_seconds": seconds,
+                    "ffmpeg_cpu_percent": totals["ffmpeg_cpu"] / seconds * 100 if seconds else 0.0,
+                    "player_cpu_percent": totals["player_cpu"] / seconds * 100 if seconds else 0.0,
+                }
+            return result
+
+
+playback_stats = PlaybackStats()
+
+
+class MeteredSource(discord.AudioSource):
+    """
+    Envolve uma fonte de áudio do FFmpeg e, ao final da sessão, registra o CPU
+    consumido pelo processo do FFmpeg e pela thread de reprodução (onde o
+    discord.py codifica PCM em Opus) em `playback_stats`. Também mede o tempo
+    até o primeiro pacote, conta os processos FFmpeg abertos e acompanha a
+    posição na faixa (`offset` + quadros de 20 ms lidos) e se o FFmpeg chegou
+    ao fim do stream, o que distingue um término real de um `stop()`. A vaga
+    do FFmpeg no governador de recursos (`slot`) é devolvida no `cleanup`.
+    """
+
+    def __init__(self, source: discord.AudioSource, mode: str, offset: float = 0.0, slot=None):
+        self.source = source
+        self.mode = mode
+        self.offset = offset
+        self.slot = slot
+        self.frames = 0
+        self.reached_eof = False
+        self._thread_id: int | None = None
+        self._thread_cpu_start: float | None = None
+        self._started_at: float | None = None
+        self._recorded = False
+        self._closed = False
+        # O FFmpeg é iniciado no construtor da fonte envolvida (ou no nó de áudio)
+        self._spawned_at = time.perf_counter()
+        self._prefetched = False
+        self._local_process = isinstance(source, discord.FFmpegAudio)
+        if self._local_process:
+            FFMPEG_PROCESSES.inc()
+
+    def mark_playing(self, prefetched: bool = False):
+        """
+        Chamado ao entregar a fonte ao player. Fontes antecipadas já estavam
+        com o FFmpeg aberto: o tempo até o primeiro pacote conta a partir daqui.
+        """
+        self._prefetched = prefetched
+        if prefetched:
+            self._spawned_at = time.perf_counter()
+
+    def read(self) -> bytes:
+        if self._thread_id is None:
+            # A primeira leitura acontece na thread do AudioPlayer
+            self._thread_id = threading.get_native_id()
+            self._thread_cpu_start = _proc_cpu_seconds(f"/proc/self/task/{self._thread_id}/stat")
+            self._started_at = time.monotonic()
+            data = self.source.read()
+            FFMPEG_FIRST_PACKET_SECONDS.observe(
+                time.perf_counter() - self._spawned_at, mode=self.mode, prefetched=str(self._prefetched).lower()
+            )
+        else:
+            data = self.source.read()
+        if data:
+            self.frames += 1
+        else:
+            self.reached_eof = True
+        return data
+
+    @property
+    def position(self) -> float:
+        """Posição (segundos) na faixa até onde o áudio já foi entregue."""
+        return self.offset + self.frames * FRAME_SECONDS
+
+    def is_opus(self) -> bool:
+        return self.source.is_opus()
+
+    def _record(self):
+        if self._recorded or self._started_at is None:
+            return
+        self._recorded = True
+        audio_seconds = time.monotonic() - self._started_at
+        process = getattr(self.source, "_process", None)
+        ffmpeg_cpu = _proc_cpu_seconds(f"/proc/{process.pid}/stat") if process else None
+        player_cpu = None
+        thread_cpu = _proc_cpu_seconds(f"/proc/self/task/{self._thread_id}/stat")
+        if thread_cpu is not None and self._thread_cpu_start is not None:
+            player_cpu = thread_cpu - self._thread_cpu_start
+        playback_stats.record(self.mode, audio_seconds, ffmpeg_cpu, player_cpu)
+        if audio_seconds > 0:
+            logger.debug("Sessão de reprodução encerrada", extra={
+                "mode": self.mode,
+                "audio_seconds": round(audio_seconds),
+                "ffmpeg_cpu_percent": round((ffmpeg_cpu or 0) / audio_seconds * 100, 1),
+                "player_cpu_percent": round((player_cpu or 0) / audio_seconds * 100, 1),
+            })
+
+    def cleanup(self):
+        self._record()
+        self.source.cleanup()
+        if not self._closed:
+            self._closed = True
+            if self._local_process:
+                FFMPEG_PROCESSES.dec()
+            if self.slot is not None:
+                self.slot.release()
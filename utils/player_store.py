@@ -0,0 +1,304 @@
+# File: utils/player_store.py
+from __future__ import annotations
+
+import asyncio
+import os
+import sqlite3
+import struct
+import threading
+import time
+from typing import Optional
+
+from utils.logging_utils import get_logger
+from utils.settings import get_setting, resolve_path
+from utils.track import Track
+
+logger = get_logger("player_store")
+
+_LENGTH = struct.Struct("<I")
+
+
+def _pack_tracks(tracks) -> bytes:
+    parts = []
+    for track in tracks:
+        raw = track.to_bytes()
+        parts.append(_LENGTH.pack(len(raw)))
+        parts.append(raw)
+    return b"".join(parts)
+
+
+def _unpack_tracks(data: bytes) -> list[bytes]:
+    tracks, offset = [], 0
+    while offset < len(data):
+        (length,) = _LENGTH.unpack_from(data, offset)
+        offset += _LENGTH.size
+        tracks.append(bytes(data[offset:offset + length]))
+        offset += length
+    return tracks
+
+
+class SavedSession:
+    """
+    Estado salvo de uma guild: fila (faixas ainda serializadas), canal de voz,
+    loop, posição e `saved_at` (epoch da última alteração registrada).
+    """
+
+    __slots__ = ("guild_id", "tracks", "channel_id", "loop_mode", "position", "saved_at")
+
+    def __init__(self, guild_id: int):
+        self.guild_id = guild_id
+        self.tracks: list[bytes] = []
+        self.channel_id: int | None = None
+        self.loop_mode = False
+        self.position = 0.0
+        self.saved_at = 0.0
+
+    def decode_tracks(self) -> list[Track]:
+        """Desserializa a fila; faixas ilegíveis (ex.: formato antigo) são descartadas."""
+        tracks = []
+        for raw in self.tracks:
+            try:
+                tracks.append(Track.from_bytes(raw))
+            except ValueError as e:
+                logger.warning("Faixa salva inválida", extra={"guild": self.guild_id, "error": str(e)})
+        return tracks
+
+
+class PlayerStore:
+    """
+    Persistência das filas e da posição de reprodução para retomar após um
+    deploy ou uma queda.
+
+    Em vez de regravar a fila inteira, cada alteração (`SongQueue.journal`)
+    vira uma linha nova em um log SQLite (append-only): "append", "insert",
+    "pop", "move"... As linhas ficam em memória e são gravadas em lote, em
+    thread, a cada `flush_interval` segundos. Quando o log de uma guild
+    passa de `compact_min_rows` linhas (e do dobro da fila), ele é trocado
+    por uma única linha "snapshot"; "clear" apaga as linhas da guild.
+
+    Se a gravação falhar, o lote volta para o início do buffer e é gravado
+    de novo no próximo ciclo (as linhas seguintes dependem dele). Se o
+    buffer passar de `max_pending` linhas, ele é descartado e as guilds
+    afetadas ficam marcadas: o próximo `checkpoint` delas grava um snapshot
+    completo (`needs_compaction`) em vez de alterações sobre uma base perdida.
+    """
+
+    def __init__(self, path: str, flush_interval: float = 1.0, compact_min_rows: int = 500,
+                 max_pending: int = 50_000):
+        self.path = path
+        self.flush_interval = flush_interval
+        self.compact_min_rows = compact_min_rows
+        self.max_pending = max_pending
+        self._conn: sqlite3.Connection | None = None
+        self._lock = threading.Lock()
+        self._pending: list[tuple] = []
+        self._flusher: asyncio.Task | None = None
+        self._rows: dict[int, int] = {}
+        # Guilds cujas alterações foram descartadas: precisam de um snapshot completo
+        self._dirty: set[int] = set()
+        self._closed = False
+        self.writes = 0
+        self.compactions = 0
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._conn = sqlite3.connect(self.path, check_same_thread=False)
+            # WAL: vários processos de cluster podem gravar no mesmo arquivo
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA busy_timeout=5000")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS player_log ("
+                "id INTEGER PRIMARY KEY AUTOINCREMENT, guild_id INTEGER NOT NULL, op TEXT NOT NULL, "
+                "a INTEGER, b INTEGER, position REAL, data BLOB, created_at REAL NOT NULL)"
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS player_log_guild ON player_log (guild_id, id)")
+            self._conn.commit()
+        return self._conn
+
+    # ------------------------------------------------------------------ #
+    # Escrita
+    # ------------------------------------------------------------------ #
+    def _append(self, guild_id: int, op: str, a=None, b=None, position=None, data=None):
+        if self._closed:
+            return
+        self._pending.append((guild_id, op, a, b, position, data, time.time()))
+        self._rows[guild_id] = self._rows.get(guild_id, 0) + 1
+        if self._flusher is None or self._flusher.done():
+            self._flusher = asyncio.get_running_loop().create_task(self._flush_later())
+
+    def record_queue(self, guild_id: int, op: str, *args):
+        """Registra uma alteração da fila (assinatura de `SongQueue.journal`)."""
+        if op == "append":
+            self._append(guild_id, "append", data=args[0].to_bytes())
+        elif op == "extend":
+            for track in args[0]:
+                self._append(guild_id, "append", data=track.to_bytes())
+        elif op == "insert":
+            self._append(guild_id, "insert", a=args[0], data=args[1].to_bytes())
+        elif op == "pop":
+            self._append(guild_id, "pop", a=args[0])
+        elif op == "move":
+            self._append(guild_id, "move", a=args[0], b=args[1])
+        elif op == "snapshot":
+            self._append(guild_id, "snapshot", data=_pack_tracks(args[0]))
+        elif op == "clear":
+            self._append(guild_id, "clear")
+            self._rows[guild_id] = 0
+
+    def record_state(self, guild_id: int, channel_id: int | None, loop_mode: bool, position: float):
+        """Registra a posição (segundos) da faixa atual, o canal de voz e o modo de loop."""
+        self._append(guild_id, "state", a=int(loop_mode), b=channel_id, position=position)
+
+    def needs_compaction(self, guild_id: int, queue_length: int) -> bool:
+        if guild_id in self._dirty:
+            return True
+        rows = self._rows.get(guild_id, 0)
+        return rows > self.compact_min_rows and rows > 2 * queue_length
+
+    def compact(self, guild_id: int, tracks, channel_id: int | None, loop_mode: bool, position: float):
+        """Substitui o log da guild por um snapshot da fila e do estado atuais."""
+        self._append(guild_id, "compact", data=_pack_tracks(tracks))
+        self.record_state(guild_id, channel_id, loop_mode, position)
+        self._rows[guild_id] = 2
+        self._dirty.discard(guild_id)
+        self.compactions += 1
+
+    async def _flush_later(self):
+        await asyncio.sleep(self.flush_interval)
+        await self.flush()
+
+    async def flush(self):
+        """Grava as linhas pendentes (em thread, para não bloquear o event loop)."""
+        while self._pending:
+            batch, self._pending = self._pending, []
+            try:
+                await asyncio.to_thread(self._write, batch)
+            except Exception as e:
+                logger.warning("Falha ao gravar o estado dos players", extra={"rows": len(batch), "error": str(e)})
+                self._requeue(batch)
+                return
+            self.writes += len(batch)
+
+    def _requeue(self, batch: list[tuple]):
+        if len(batch) + len(self._pending) <= self.max_pending:
+            # Volta para a frente: as linhas que chegaram depois dependem destas
+            self._pending[:0] = batch
+            if not self._closed:
+                self._flusher = asyncio.get_running_loop().create_task(self._flush_later())
+            return
+        # Buffer grande demais: descarta tudo e força um snapshot das guilds afetadas
+        dropped = batch + self._pending
+        self._pending = []
+        self._dirty.update(row[0] for row in dropped)
+        logger.warning("Alterações dos players descartadas; as guilds serão regravadas por completo",
+                       extra={"rows": len(dropped), "guilds": len(self._dirty)})
+
+    def _write(self, batch: list[tuple]):
+        insert = ("INSERT INTO player_log (guild_id, op, a, b, position, data, created_at) "
+                  "VALUES (?, ?, ?, ?, ?, ?, ?)")
+        with self._lock:
+            conn = self._connect()
+            with conn:
+                run: list[tuple] = []
+                for row in batch:
+                    guild_id, op = row[0], row[1]
+                    if op in ("clear", "compact"):
+                        # Tudo o que veio antes desta linha deixa de importar
+                        if run:
+                            conn.executemany(insert, run)
+                            run = []
+                        conn.execute("DELETE FROM player_log WHERE guild_id = ?", (guild_id,))
+                        if op == "clear":
+                            continue
+                        row = (guild_id, "snapshot") + row[2:]
+                    run.append(row)
+                if run:
+                    conn.executemany(insert, run)
+
+    # ------------------------------------------------------------------ #
+    # Leitura
+    # ------------------------------------------------------------------ #
+    def _read(self) -> dict[int, SavedSession]:
+        sessions: dict[int, SavedSession] = {}
+        with self._lock:
+            conn = self._connect()
+            rows = conn.execute(
+                "SELECT guild_id, op, a, b, position, data, created_at FROM player_log ORDER BY id").fetchall()
+        for guild_id, op, a, b, position, data, created_at in rows:
+            session = sessions.get(guild_id)
+            if session is None:
+                session = sessions[guild_id] = SavedSession(guild_id)
+            self._rows[guild_id] = self._rows.get(guild_id, 0) + 1
+            session.saved_at = created_at
+            tracks = session.tracks
+            if op == "append":
+                tracks.append(data)
+            elif op == "insert":
+                tracks.insert(a, data)
+            elif op == "pop":
+                if 0 <= a < len(tracks):
+                    del tracks[a]
+            elif op == "move":
+                if 0 <= a < len(tracks):
+                    tracks.insert(min(max(b, 0), len(tracks) - 1), tracks.pop(a))
+            elif op == "snapshot":
+                session.tracks = _unpack_tracks(data)
+            elif op == "state":
+                session.loop_mode = bool(a)
+                session.channel_id = b
+                session.position = position or 0.0
+            if op == "pop" and a == 0:
+                # A faixa atual mudou: a posição volta a zero até o próximo "state"
+                session.position = 0.0
+        return {guild_id: session for guild_id, session in sessions.items() if session.tracks}
+
+    async def load(self) -> dict[int, SavedSession]:
+        """Reconstrói, a partir do log, as filas salvas de cada guild (só as não vazias)."""
+        return await asyncio.to_thread(self._read)
+
+    async def close(self):
+        """Grava o que estiver pendente e fecha o banco; alterações posteriores são ignoradas."""
+        self._closed = True
+        if self._flusher is not None and not self._flusher.done():
+            self._flusher.cancel()
+        await self.flush()
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+    def stats(self) -> dict:
+        return {"pending": len(self._pending), "writes": self.writes, "compactions": self.compactions,
+                "dirty": len(self._dirty), "guilds": sum(1 for rows in self._rows.values() if rows)}
+
+
+_store: Optional[PlayerStore] = None
+
+
+def get_player_store() -> PlayerStore | None:
+    """Retorna o store compartilhado (None com `persistence.enabled: false`)."""
+    global _store
+    if _store is None and get_setting("persistence.enabled", True):
+        _store = PlayerStore(
+            resolve_path(get_setting("persistence.path", "data/player_state.sqlite3")),
+            flush_interval=get_setting("persistence.flush_interval", 1.0),
+            compact_min_rows=get_setting("persistence.compact_min_rows", 500),
+            max_pending=get_setting("persistence.max_pending", 50_000),
+        )
+    return _store
+
+
+def set_player_store(store: PlayerStore | None):
+    """Substitui o store compartilhado (ex.: um em memória nos benchmarks)."""
+    global _store
+    _store = store
+
+
+async def close_player_store():
+    global _store
+    if _store is not None:
+        await _store.close()
+        _store = None
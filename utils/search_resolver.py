@@ -0,0 +1,162 @@
+# File: utils/search_resolver.py
+from __future__ import annotations
+
+import asyncio
+import time
+from typing import Optional
+
+from utils.cache import get_song_cache
+from utils.lazy_import import lazy_import
+from utils.logging_utils import get_logger
+from utils.metrics import SEARCH_OUTCOMES, SEARCH_SECONDS
+from utils.settings import get_setting
+from utils.track import Track
+
+spotify_service = lazy_import("services.spotify_service")
+youtube_service = lazy_import("services.youtube_service")
+
+logger = get_logger("search")
+
+
+class SearchDeadlineExceeded(Exception):
+    """Nenhuma fonte respondeu dentro do prazo e não havia resultado em cache."""
+
+
+def _lazy_entry(song: Track) -> Track:
+    # Entrada leve: o player resolve a URL de stream quando a faixa for tocar
+    song = song.copy()
+    song.clear_stream()
+    return song
+
+
+class SearchResolver:
+    """
+    Resolve termos de busca com prazo e requisição "hedged":
+
+      1. consulta o cache de músicas (hit devolve na hora);
+      2. dispara a busca no YouTube (yt-dlp);
+      3. se ela não responder em `hedge_delay()` (p95 recente das buscas,
+         limitado a [min_delay, max_delay]), dispara uma segunda fonte
+         (`hedge_backend`: "spotify" para uma busca de metadados no Spotify,
+         "youtube" para uma segunda busca no yt-dlp ou null para nenhuma) e
+         fica com o primeiro resultado válido, cancelando o resto;
+      4. ao atingir `deadline`, devolve os metadados em cache (sem stream) ou
+         falha com `SearchDeadlineExceeded`. Nesse caso as buscas em andamento
+         continuam em segundo plano para aquecer o cache.
+
+    Resultados do Spotify e do fallback voltam como entradas leves
+    (`audio_url` vazia), resolvidas pelo player como as faixas de playlist.
+    """
+
+    def __init__(self, hedge_backend: str = "spotify", initial_delay: float = 1.5, min_delay: float = 0.5,
+                 max_delay: float = 3.0, deadline: float = 8.0, min_samples: int = 20):
+        self.hedge_backend = hedge_backend
+        self.initial_delay = initial_delay
+        self.min_delay = min_delay
+        self.max_delay = max_delay
+        self.deadline = deadline
+        self.min_samples = min_samples
+        self._background: set[asyncio.Task] = set()
+
+    def hedge_delay(self) -> float:
+        """Espera antes da requisição extra: p95 das buscas no YouTube, ou o valor inicial."""
+        snap = SEARCH_SECONDS.snapshot(source="youtube")
+        if snap["count"] < self.min_samples:
+            return self.initial_delay
+        return min(max(snap["p95"], self.min_delay), self.max_delay)
+
+    async def _search(self, source: str, query: str) -> Track:
+        started = time.perf_counter()
+        if source == "spotify":
+            song = _lazy_entry(await spotify_service.get_spotify_song_info(query))
+        elif source == "youtube":
+            song = await youtube_service.get_youtube_song_info(query)
+        else:
+            raise ValueError(f"Fonte de busca desconhecida: {source}")
+        SEARCH_SECONDS.observe(time.perf_counter() - started, source=source)
+        return song
+
+    def _keep_in_background(self, task: asyncio.Task):
+        self._background.add(task)
+        task.add_done_callback(self._background_done)
+
+    def _background_done(self, task: asyncio.Task):
+        self._background.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            logger.debug("Busca em segundo plano falhou", extra={"error": str(task.exception())})
+
+    async def resolve(self, query: str) -> Track:
+        cache = get_song_cache()
+        cached = await cache.get(query)
+        if cached is not None:
+            return cached
+
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        deadline = started + self.deadline
+        hedge_at = started + self.hedge_delay()
+        tasks = {asyncio.ensure_future(self._search("youtube", query)): "primary"}
+        # Sem `hedge_backend`, só a busca principal corre (ainda com prazo)
+        hedged = not self.hedge_backend
+        errors = []
+        keep_running = False
+        try:
+            while True:
+                now = loop.time()
+                if not hedged and (now >= hedge_at or not tasks):
+                    hedged = True
+                    tasks[asyncio.ensure_future(self._search(self.hedge_backend, query))] = "hedge"
+                if not tasks or now >= deadline:
+                    break
+                timeout = (deadline if hedged else min(hedge_at, deadline)) - now
+                done, _ = await asyncio.wait(tasks, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    role = tasks.pop(task)
+                    if task.exception() is None:
+                        SEARCH_OUTCOMES.inc(outcome=role)
+                        return task.result()
+                    errors.append(task.exception())
+
+            # Prazo esgotado ou todas as fontes falharam
+            keep_running = bool(tasks)
+            fallback = await cache.get(query, require_stream=False)
+            if fallback is not None:
+                SEARCH_OUTCOMES.inc(outcome="cache_fallback")
+                logger.info("Busca sem resposta no prazo; usando metadados em cache", extra={"query": query})
+                return _lazy_entry(fallback)
+            SEARCH_OUTCOMES.inc(outcome="failed")
+            if errors and not tasks:
+                raise errors[0]
+            raise SearchDeadlineExceeded(f"A busca por '{query}' demorou mais de {self.deadline:.0f}s.")
+        finally:
+            for task in tasks:
+                if keep_running:
+                    # Deixa terminar: o resultado fica no cache para a próxima tentativa
+                    self._keep_in_background(task)
+                else:
+                    task.cancel()
+
+    def stats(self) -> dict:
+        return {
+            "hedge_delay": self.hedge_delay(),
+            "background": len(self._background),
+            "outcomes": {outcome: SEARCH_OUTCOMES.value(outcome=outcome)
+                         for outcome in ("primary", "hedge", "cache_fallback", "failed")},
+        }
+
+
+_resolver: Optional[SearchResolver] = None
+
+
+def get_search_resolver() -> SearchResolver:
+    """Retorna o resolvedor de buscas compartilhado, criando-o na primeira chamada."""
+    global _resolver
+    if _resolver is None:
+        _resolver = SearchResolver(
+            hedge_backend=get_setting("search.hedge_backend", "spotify"),
+            initial_delay=get_setting("search.hedge_initial_delay", 1.5),
+            min_delay=get_setting("search.hedge_min_delay", 0.5),
+            max_delay=get_setting("search.hedge_max_delay", 3.0),
+            deadline=get_setting("search.deadline", 8.0),
+        )
+    return _resolver
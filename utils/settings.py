@@ -0,0 +1,51 @@
+# File: utils/settings.py
+from __future__ import annotations
+
+import os
+from typing import Optional
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+settings_path = os.path.join(PROJECT_ROOT, "config", "settings.yaml")
+_settings: Optional[dict] = None
+
+
+def load_settings() -> dict:
+    """
+    Carrega o config/settings.yaml na primeira chamada e devolve o mesmo
+    dicionário nas seguintes. O `yaml` só é importado aqui (usando o parser em
+    C quando disponível), para não pesar no import dos módulos.
+    """
+    global _settings
+    if _settings is None:
+        import yaml
+
+        loader = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+        with open(settings_path, "r", encoding="utf8") as config_file:
+            _settings = yaml.load(config_file, Loader=loader) or {}
+    return _settings
+
+
+def __getattr__(name: str):
+    # Compatibilidade com `from utils.settings import SETTINGS`
+    if name == "SETTINGS":
+        return load_settings()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def get_setting(path: str, default=None):
+    """
+    Retorna um valor do settings.yaml a partir de um caminho separado por pontos
+    (ex.: "player.idle_timeout"). Se alguma chave não existir, retorna `default`.
+    """
+    value = _settings if _settings is not None else load_settings()
+    for key in path.split("."):
+        if not isinstance(value, dict) or key not in value:
+            return default
+        value = value[key]
+    return value
+
+
+def resolve_path(path: str) -> str:
+    """Resolve caminhos relativos do settings.yaml a partir da raiz do projeto."""
+    return path if os.path.isabs(path) else os.path.join(PROJECT_ROOT, path)
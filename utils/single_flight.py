@@ -0,0 +1,63 @@
+# File: utils/single_flight.py
+import asyncio
+
+from utils.metrics import SINGLE_FLIGHT_CALLS
+
+
+class _Call:
+    __slots__ = ("task", "waiters")
+
+    def __init__(self, task: asyncio.Task):
+        self.task = task
+        self.waiters = 0
+
+
+class SingleFlight:
+    """
+    Agrupa chamadas simultâneas com a mesma chave: a primeira dispara
+    `factory()` em uma task e as seguintes aguardam o mesmo resultado (ou a
+    mesma exceção). A chave é liberada quando a task termina, então erros não
+    ficam guardados e a próxima chamada tenta de novo.
+
+    O cancelamento de um chamador não afeta os demais; a task compartilhada
+    só é cancelada quando todos os que a aguardavam desistiram. O resultado é
+    o mesmo objeto para todos: quem for alterá-lo deve trabalhar em uma cópia.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self._calls: dict[str, _Call] = {}
+        self.leaders = 0
+        self.coalesced = 0
+
+    def _release(self, key: str, task: asyncio.Task):
+        call = self._calls.get(key)
+        if call is not None and call.task is task:
+            del self._calls[key]
+
+    async def do(self, key: str, factory):
+        call = self._calls.get(key)
+        if call is None:
+            task = asyncio.ensure_future(factory())
+            call = self._calls[key] = _Call(task)
+            task.add_done_callback(lambda done: self._release(key, done))
+            self.leaders += 1
+            SINGLE_FLIGHT_CALLS.inc(operation=self.name, role="leader")
+        else:
+            self.coalesced += 1
+            SINGLE_FLIGHT_CALLS.inc(operation=self.name, role="coalesced")
+
+        call.waiters += 1
+        try:
+            return await asyncio.shield(call.task)
+        finally:
+            call.waiters -= 1
+            if call.waiters == 0 and not call.task.done():
+                # Ninguém mais espera pelo resultado: interrompe o trabalho
+                call.task.cancel()
+
+    def in_flight(self) -> int:
+        return len(self._calls)
+
+    def stats(self) -> dict:
+        return {"leaders": self.leaders, "coalesced": self.coalesced, "in_flight": self.in_flight()}
@@ -0,0 +1,359 @@
+# File: utils/song_queue.py
+import random
+import sys
+from collections import deque
+from itertools import islice
+
+from utils.track import Track
+
+
+class _Fenwick:
+    """Árvore de Fenwick (Binary Indexed Tree) para somas de prefixo."""
+
+    __slots__ = ("tree",)
+
+    def __init__(self, values):
+        tree = [0]
+        tree.extend(values)
+        n = len(tree)
+        for i in range(1, n):
+            j = i + (i & -i)
+            if j < n:
+                tree[j] += tree[i]
+        self.tree = tree
+
+    def add(self, index: int, delta: int):
+        i = index + 1
+        tree = self.tree
+        n = len(tree)
+        while i < n:
+            tree[i] += delta
+            i += i & -i
+
+    def prefix(self, count: int) -> int:
+        """Soma dos `count` primeiros valores."""
+        total = 0
+        tree = self.tree
+        i = count
+        while i > 0:
+            total += tree[i]
+            i -= i & -i
+        return total
+
+    def find(self, k: int) -> tuple[int, int]:
+        """
+        Retorna (índice, soma anterior) do primeiro valor cuja soma de prefixo
+        ultrapassa `k`. Usado para localizar o bloco do k-ésimo elemento.
+        """
+        tree = self.tree
+        n = len(tree)
+        pos = 0
+        before = 0
+        step = 1 << (n.bit_length() - 1)
+        while step:
+            nxt = pos + step
+            if nxt < n and before + tree[nxt] <= k:
+                pos = nxt
+                before += tree[nxt]
+            step >>= 1
+        return pos, before
+
+
+class SongQueue:
+    """
+    Fila de músicas com duração em segundos (int) calculada uma única vez, no
+    momento em que a música é enfileirada.
+
+    Internamente a fila é uma lista de blocos (`deque` de `Track`, cuja
+    duração já é um int) com duas árvores de Fenwick sobre os blocos (tamanho
+    e soma das durações). Com isso:
+
+      - `append`/`popleft`: O(1) (deque), com atualização O(log n) da árvore
+        apenas quando necessário;
+      - `eta(posição)`, `insert`, `pop(i)`, `move`: O(log n + B), onde B é o
+        tamanho máximo (constante) de um bloco;
+      - `total_duration`: O(1), mantido como total corrente;
+      - `shuffle`: O(n), reconstrói os blocos uma única vez.
+
+    Se `journal` for definido, cada alteração é informada a ele como
+    `journal(operação, *argumentos)` ("append", "extend", "insert", "pop",
+    "move", "snapshot" ou "clear"), com índices já normalizados; é assim que o
+    `PlayerStore` grava a fila de forma incremental.
+    """
+
+    BLOCK_SIZE = 256
+
+    def __init__(self, songs=()):
+        self.journal = None
+        self._reset()
+        for song in songs:
+            self.append(song)
+
+    # ------------------------------------------------------------------ #
+    # Estrutura interna
+    # ------------------------------------------------------------------ #
+    def _record(self, op: str, *args):
+        if self.journal is not None:
+            self.journal(op, *args)
+
+    def _reset(self):
+        self._blocks: list[deque] = []
+        self._block_durations: list[int] = []
+        self._len = 0
+        self._total = 0
+        self._fen_len = None
+        self._fen_dur = None
+        self._head_pops = 0
+        self._head_popped = 0
+        self._dirty = True
+
+    def _rebuild_index(self):
+        blocks = self._blocks
+        self._fen_len = _Fenwick([len(b) for b in blocks])
+        self._fen_dur = _Fenwick(self._block_durations)
+        # O bloco 0 passa a refletir exatamente o conteúdo atual
+        self._head_pops = 0
+        self._head_popped = 0
+        self._dirty = False
+
+    def _locate(self, index: int) -> tuple[int, int]:
+        """Retorna (bloco, deslocamento) do elemento na posição `index`."""
+        if self._dirty:
+            self._rebuild_index()
+        stored = index + self._head_pops
+        block_idx, before = self._fen_len.find(stored)
+        offset = stored - before
+        if block_idx == 0:
+            offset -= self._head_pops
+        return block_idx, offset
+
+    def _durations_before_block(self, block_idx: int) -> int:
+        if block_idx == 0:
+            return 0
+        return self._fen_dur.prefix(block_idx) - self._head_popped
+
+    def _normalize_index(self, index: int) -> int:
+        if index < 0:
+            index += self._len
+        if not 0 <= index < self._len:
+            raise IndexError("índice fora da fila")
+        return index
+
+    def _block_changed(self, block_idx: int, length_delta: int, duration_delta: int):
+        self._block_durations[block_idx] += duration_delta
+        if not self._dirty:
+            self._fen_len.add(block_idx, length_delta)
+            self._fen_dur.add(block_idx, duration_delta)
+
+    def _drop_block(self, block_idx: int):
+        del self._blocks[block_idx]
+        del self._block_durations[block_idx]
+        self._dirty = True
+
+    def _insert_entry(self, index: int, entry: Track):
+        if index >= self._len or not self._blocks:
+            self._append_entry(entry)
+            return
+        block_idx, offset = self._locate(index)
+        block = self._blocks[block_idx]
+        block.insert(offset, entry)
+        self._len += 1
+        self._total += entry.duration
+        self._block_changed(block_idx, 1, entry.duration)
+        if len(block) > 2 * self.BLOCK_SIZE:
+            # Divide o bloco para manter as operações em O(B)
+            half = deque()
+            for _ in range(len(block) // 2):
+                half.appendleft(block.pop())
+            self._blocks.insert(block_idx + 1, half)
+            moved = sum(entry.duration for entry in half)
+            self._block_durations[block_idx] -= moved
+            self._block_durations.insert(block_idx + 1, moved)
+            self._dirty = True
+
+    def _append_entry(self, entry: Track):
+        blocks = self._blocks
+        if not blocks or len(blocks[-1]) >= self.BLOCK_SIZE:
+            blocks.append(deque())
+            self._block_durations.append(0)
+            self._dirty = True
+        blocks[-1].append(entry)
+        self._len += 1
+        self._total += entry.duration
+        self._block_changed(len(blocks) - 1, 1, entry.duration)
+
+    def _pop_entry(self, index: int) -> Track:
+        index = self._normalize_index(index)
+        if index == 0:
+            return self._popleft_entry()
+        block_idx, offset = self._locate(index)
+        block = self._blocks[block_idx]
+        entry = block[offset]
+        del block[offset]
+        self._len -= 1
+        self._total -= entry.duration
+        if block:
+            self._block_changed(block_idx, -1, -entry.duration)
+        else:
+            self._drop_block(block_idx)
+        return entry
+
+    def _popleft_entry(self) -> Track:
+        if not self._len:
+            raise IndexError("popleft de uma fila vazia")
+        block = self._blocks[0]
+        entry = block.popleft()
+        self._len -= 1
+        self._total -= entry.duration
+        self._block_durations[0] -= entry.duration
+        if not block:
+            self._drop_block(0)
+        elif not self._dirty:
+            # A árvore do bloco 0 fica desatualizada de propósito: o desconto
+            # é aplicado nas consultas, mantendo o popleft em O(1).
+            self._head_pops += 1
+            self._head_popped += entry.duration
+        return entry
+
+    # ------------------------------------------------------------------ #
+    # API pública
+    # ------------------------------------------------------------------ #
+    def __len__(self) -> int:
+        return self._len
+
+    def __bool__(self) -> bool:
+        return self._len > 0
+
+    def __iter__(self):
+        for block in self._blocks:
+            yield from block
+
+    def __getitem__(self, index: int) -> Track:
+        index = self._normalize_index(index)
+        if index == 0:
+            return self._blocks[0][0]
+        if index == self._len - 1:
+            return self._blocks[-1][-1]
+        block_idx, offset = self._locate(index)
+        return self._blocks[block_idx][offset]
+
+    def __sizeof__(self) -> int:
+        # Só a estrutura (blocos e somas); as faixas são contadas por quem percorre a fila
+        size = object.__sizeof__(self) + sys.getsizeof(self._blocks) + sys.getsizeof(self._block_durations)
+        for block in self._blocks:
+            size += sys.getsizeof(block)
+        return size
+
+    @property
+    def total_duration(self) -> int:
+        """Soma das durações (segundos) de todas as músicas da fila."""
+        return self._total
+
+    def clear(self):
+        self._reset()
+        self._record("clear")
+
+    def copy(self) -> "SongQueue":
+        clone = SongQueue()
+        for block in self._blocks:
+            for entry in block:
+                clone._append_entry(entry)
+        return clone
+
+    def append(self, song: Track):
+        self._append_entry(song)
+        self._record("append", song)
+
+    def extend(self, songs):
+        songs = list(songs)
+        for song in songs:
+            self._append_entry(song)
+        self._record("extend", songs)
+
+    def appendleft(self, song: Track):
+        self.insert(0, song)
+
+    def insert(self, index: int, song: Track):
+        if index < 0:
+            index = max(index + self._len, 0)
+        index = min(index, self._len)
+        self._insert_entry(index, song)
+        self._record("insert", index, song)
+
+    def popleft(self) -> Track:
+        song = self._popleft_entry()
+        self._record("pop", 0)
+        return song
+
+    def pop(self, index: int = -1) -> Track:
+        index = self._normalize_index(index)
+        song = self._pop_entry(index)
+        self._record("pop", index)
+        return song
+
+    def move(self, source: int, destination: int):
+        """Move a música da posição `source` para `destination`."""
+        source = self._normalize_index(source)
+        entry = self._pop_entry(source)
+        destination = min(max(destination, 0), self._len)
+        self._insert_entry(destination, entry)
+        self._record("move", source, destination)
+
+    def shuffle(self, start: int = 1):
+        """
+        Embaralha a fila a partir de `start` (por padrão preserva a música
+        atual na posição 0).
+        """
+        entries = [entry for block in self._blocks for entry in block]
+        tail = entries[start:]
+        random.shuffle(tail)
+        entries[start:] = tail
+        self._reset()
+        for entry in entries:
+            self._append_entry(entry)
+        self._record("snapshot", entries)
+
+    def duration_at(self, index: int) -> int:
+        """Duração (segundos) da música na posição `index`."""
+        index = self._normalize_index(index)
+        if index == self._len - 1:
+            return self._blocks[-1][-1].duration
+        block_idx, offset = self._locate(index)
+        return self._blocks[block_idx][offset].duration
+
+    def eta(self, position: int) -> int:
+        """
+        Tempo (segundos) até a música da posição `position` começar, somando
+        as durações de todas as músicas anteriores a ela.
+        """
+        if position <= 0:
+            return 0
+        if position >= self._len:
+            return self._total
+        if position == self._len - 1:
+            return self._total - self._blocks[-1][-1].duration
+        block_idx, offset = self._locate(position)
+        block = self._blocks[block_idx]
+        before = self._durations_before_block(block_idx)
+        if offset <= len(block) // 2:
+            return before + sum(song.duration for song in islice(block, 0, offset))
+        after = sum(song.duration for song in islice(block, offset, None))
+        return before + self._block_durations[block_idx] - after
+
+    def page(self, start: int, stop: int):
+        """
+        Itera sobre (posição, duração, música) de `start` até `stop` sem copiar
+        a fila.
+        """
+        stop = min(stop, self._len)
+        if start >= stop:
+            return
+        block_idx, offset = self._locate(start)
+        index = start
+        for block in islice(self._blocks, block_idx, None):
+            for song in islice(block, offset, None):
+                if index >= stop:
+                    return
+                yield index, song.duration, song
+                index += 1
+            offset = 0
@@ -0,0 +1,134 @@
+# File: utils/status_board.py
+from __future__ import annotations
+
+import asyncio
+import time
+
+import discord
+
+from utils.logging_utils import get_logger
+from utils.metrics import STATUS_UPDATES
+
+logger = get_logger("status")
+
+
+class StatusBoard:
+    """
+    A mensagem de status de uma guild: uma única mensagem no canal de texto
+    do último /play, editada sempre que a fila ou a faixa atual mudam, no
+    lugar de um embed novo por comando.
+
+    `invalidate()` só marca a mensagem como desatualizada; uma task espera
+    `settle` segundos (o /play que enfileira e já inicia a faixa vira uma
+    atualização só), publica o estado do momento (`render()`, lido da fila
+    ao vivo) e espera `min_interval` segundos antes da edição seguinte.
+    Mudanças nesse intervalo (uma playlist, várias faixas pulando...) viram
+    uma edição só.
+
+    Há no máximo uma requisição em andamento por mensagem: se o Discord
+    segurar a edição por rate limit, o intervalo conta a partir da resposta,
+    e um `RateLimited` adia a próxima edição pelo `retry_after`.
+    """
+
+    def __init__(self, render, spawn, min_interval: float = 5.0, settle: float = 1.0, enabled: bool = True):
+        # render() -> embed; spawn(coro) -> task (tasks do player, canceladas no teardown)
+        self.render = render
+        self._spawn = spawn
+        self.min_interval = min_interval
+        self.settle = settle
+        self.enabled = enabled
+        self.closed = False
+        self.channel = None
+        self.message = None
+        self._stale = None
+        self._dirty = False
+        self._dirty_since = 0.0
+        self._task: asyncio.Task | None = None
+        self._next_edit = 0.0
+        self.edits = 0
+        self.coalesced = 0
+
+    def bind(self, channel):
+        """Usa `channel` para a mensagem; trocar de canal move a mensagem para ele."""
+        if not self.enabled or self.closed or channel is None:
+            return
+        if self.channel is not None and self.channel.id == channel.id:
+            return
+        self.channel = channel
+        if self.message is not None:
+            self._stale, self.message = self.message, None
+        self.invalidate()
+
+    def invalidate(self):
+        """Agenda uma atualização; chamadas antes dela sair são agrupadas."""
+        if self.channel is None or self.closed:
+            return
+        running = self._task is not None and not self._task.done()
+        if self._dirty and running:
+            self.coalesced += 1
+            STATUS_UPDATES.inc(result="coalesced")
+            return
+        self._dirty = True
+        self._dirty_since = time.monotonic()
+        if not running:
+            self._task = self._spawn(self._run())
+
+    async def _run(self):
+        while self._dirty and self.channel is not None:
+            delay = max(self._next_edit, self._dirty_since + self.settle) - time.monotonic()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            # O que mudar daqui em diante entra na próxima edição
+            self._dirty = False
+            try:
+                await self._publish()
+                self._next_edit = time.monotonic() + self.min_interval
+            except discord.RateLimited as e:
+                STATUS_UPDATES.inc(result="failed")
+                self._dirty = True
+                self._next_edit = time.monotonic() + max(e.retry_after, self.min_interval)
+            except discord.NotFound:
+                STATUS_UPDATES.inc(result="failed")
+                if self.message is None:
+                    # O canal foi apagado: só volta a publicar no próximo bind
+                    self.channel = None
+                else:
+                    # Alguém apagou a mensagem: publica outra
+                    self.message = None
+                    self._dirty = True
+            except discord.HTTPException as e:
+                STATUS_UPDATES.inc(result="failed")
+                if isinstance(e, discord.Forbidden):
+                    self.channel = None
+                logger.warning("Falha ao atualizar a mensagem de status", extra={"status": e.status, "error": str(e)})
+                self._next_edit = time.monotonic() + self.min_interval
+
+    async def _publish(self):
+        embed = self.render()
+        if self.message is None:
+            self.message = await self.channel.send(embed=embed)
+            STATUS_UPDATES.inc(result="sent")
+            if self._stale is not None:
+                stale, self._stale = self._stale, None
+                try:
+                    await stale.delete()
+                except discord.HTTPException:
+                    pass
+        else:
+            await self.message.edit(embed=embed)
+            STATUS_UPDATES.inc(result="edited")
+        self.edits += 1
+
+    def close(self):
+        """Cancela a atualização pendente; depois disso o painel não publica mais nada."""
+        self.closed = True
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        self._dirty = False
+        self.channel = None
+        self.message = None
+        self._stale = None
+
+    def stats(self) -> dict:
+        return {"edits": self.edits, "coalesced": self.coalesced, "pending": self._dirty}
@@ -0,0 +1,214 @@
+# File: utils/track.py
+from __future__ import annotations
+
+import re
+import struct
+import time
+from enum import IntEnum
+from urllib.parse import parse_qs, urlparse
+
+# Margem de segurança (segundos) antes do `expire` de uma URL de stream
+STREAM_EXPIRY_MARGIN = 300
+# TTL usado quando a URL de stream não informa `expire`
+DEFAULT_STREAM_TTL = 1800
+
+# Versão do formato binário de `Track.to_bytes`
+_FORMAT_VERSION = 1
+# versão, plataforma, duração (s), bitrate (kbps), expiração do stream (unix, 0 = sem stream)
+_HEADER = struct.Struct("<BBIHI")
+_LENGTH = struct.Struct("<I")
+
+
+def parse_duration(value) -> int:
+    """
+    Converte a duração de uma música para segundos (int).
+
+    Aceita inteiros, strings no formato "213 sec", "MM:SS", "H:MM:SS" ou apenas
+    dígitos. Valores inválidos retornam 0.
+    """
+    if isinstance(value, bool):
+        return 0
+    if isinstance(value, (int, float)):
+        return max(int(value), 0)
+    try:
+        text = str(value).strip()
+        if "sec" in text:
+            return int(text.split()[0])
+        parts = [int(p) for p in text.split(":")]
+        if len(parts) == 2:
+            return parts[0] * 60 + parts[1]
+        if len(parts) == 3:
+            return parts[0] * 3600 + parts[1] * 60 + parts[2]
+        return int(text)
+    except (ValueError, IndexError):
+        return 0
+
+
+def stream_ttl(audio_url: str, now: float | None = None) -> int:
+    """
+    Calcula por quanto tempo uma URL de stream pode ser usada, a partir do
+    parâmetro `expire` (query string ou segmento "/expire/<ts>/" das URLs do
+    googlevideo). Retorna 0 se a URL já estiver perto de expirar.
+    """
+    now = time.time() if now is None else now
+    parsed = urlparse(audio_url)
+    expire = parse_qs(parsed.query).get("expire", [None])[0]
+    if expire is None:
+        m = re.search(r"/expire/(\d+)", parsed.path)
+        expire = m.group(1) if m else None
+    if expire is None:
+        return DEFAULT_STREAM_TTL
+    try:
+        return max(int(expire) - int(now) - STREAM_EXPIRY_MARGIN, 0)
+    except ValueError:
+        return DEFAULT_STREAM_TTL
+
+
+class Platform(IntEnum):
+    """Plataforma de origem de uma faixa (o valor é o byte usado no formato binário)."""
+
+    UNKNOWN = 0
+    YOUTUBE = 1
+    SPOTIFY = 2
+
+    @property
+    def key(self) -> str:
+        """Chave usada no `platform_icons` do settings.yaml ("youtube", "spotify")."""
+        return self.name.lower()
+
+    @property
+    def label(self) -> str:
+        return _PLATFORM_LABELS[self]
+
+
+_PLATFORM_LABELS = {Platform.UNKNOWN: "Desconhecida", Platform.YOUTUBE: "YouTube", Platform.SPOTIFY: "Spotify"}
+
+# Campos que só mudam quando o stream é resolvido de novo
+_STREAM_SLOTS = frozenset(("audio_url", "codec", "bitrate", "source_url", "expires_at"))
+_STRING_SLOTS = ("title", "url", "thumbnail", "spotify_id", "isrc", "search_query",
+                 "audio_url", "codec", "source_url")
+_set = object.__setattr__
+
+
+class Track:
+    """
+    Uma faixa na fila ou no cache. Os metadados (título, plataforma, duração
+    em segundos, links e ids usados na correspondência com o YouTube) são
+    imutáveis; apenas o stream, resolvido sob demanda e com validade
+    (`expires_at`), pode ser trocado com `set_stream`/`clear_stream`.
+
+    Com `__slots__` e a duração já como int, cada faixa ocupa uma fração de
+    um dicionário equivalente, o que importa em filas de playlists grandes.
+    A igualdade é por identidade: o player depende disso para saber se a
+    faixa antecipada ainda é a próxima da fila.
+    """
+
+    __slots__ = ("title", "platform", "duration", "url", "thumbnail", "spotify_id", "isrc", "search_query",
+                 "audio_url", "codec", "bitrate", "source_url", "expires_at")
+
+    def __init__(self, title: str, platform: Platform = Platform.UNKNOWN, duration: int = 0, url: str = "",
+                 thumbnail: str = "", spotify_id: str = "", isrc: str = "", search_query: str = ""):
+        _set(self, "title", title or "Título desconhecido")
+        _set(self, "platform", Platform(platform))
+        _set(self, "duration", parse_duration(duration))
+        _set(self, "url", url or "")
+        _set(self, "thumbnail", thumbnail or "")
+        _set(self, "spotify_id", spotify_id or "")
+        _set(self, "isrc", isrc or "")
+        _set(self, "search_query", search_query or "")
+        _set(self, "audio_url", "")
+        _set(self, "codec", "")
+        _set(self, "bitrate", 0)
+        _set(self, "source_url", "")
+        _set(self, "expires_at", 0)
+
+    def __setattr__(self, name: str, value):
+        if name not in _STREAM_SLOTS:
+            raise AttributeError(f"O campo '{name}' de Track é imutável")
+        _set(self, name, value)
+
+    def __repr__(self) -> str:
+        return f"<Track {self.title!r} ({self.platform.label}, {self.duration}s{', com stream' if self.audio_url else ''})>"
+
+    # ------------------------------------------------------------------ #
+    # Stream
+    # ------------------------------------------------------------------ #
+    @property
+    def link(self) -> str:
+        """Link exibido nos embeds: a página da faixa ou, para faixas do Spotify já resolvidas, o vídeo."""
+        return self.url or self.source_url
+
+    def set_stream(self, audio_url: str, codec: str = "", bitrate: float = 0, source_url: str = "",
+                   expires_at: int | None = None):
+        """Associa uma URL de stream à faixa, com validade derivada do `expire` da URL."""
+        _set(self, "audio_url", audio_url or "")
+        _set(self, "codec", codec or "")
+        _set(self, "bitrate", int(bitrate or 0))
+        _set(self, "source_url", source_url or self.source_url)
+        if expires_at is None:
+            expires_at = int(time.time()) + stream_ttl(audio_url) if audio_url else 0
+        _set(self, "expires_at", expires_at)
+
+    def clear_stream(self):
+        """Descarta a URL de stream (ex.: expirou ou falhou); o vídeo associado é mantido."""
+        _set(self, "audio_url", "")
+        _set(self, "expires_at", 0)
+
+    def stream_ttl(self, now: float | None = None) -> float:
+        """Segundos de validade que restam à URL de stream (0 sem stream)."""
+        if not self.audio_url:
+            return 0.0
+        now = time.time() if now is None else now
+        return max(self.expires_at - now, 0.0)
+
+    def copy(self, stream: bool = True) -> "Track":
+        """Cópia rasa (as strings são compartilhadas); com `stream=False`, só os metadados."""
+        clone = Track.__new__(Track)
+        for name in self.__slots__:
+            _set(clone, name, getattr(self, name))
+        if not stream:
+            clone.clear_stream()
+            _set(clone, "codec", "")
+            _set(clone, "bitrate", 0)
+        return clone
+
+    # ------------------------------------------------------------------ #
+    # Serialização
+    # ------------------------------------------------------------------ #
+    def to_bytes(self) -> bytes:
+        """
+        Formato binário compacto (cache compartilhado, persistência): um
+        cabeçalho fixo de `struct` seguido das strings em UTF-8, cada uma
+        prefixada pelo tamanho.
+        """
+        parts = [_HEADER.pack(_FORMAT_VERSION, self.platform, self.duration, min(self.bitrate, 0xFFFF),
+                              int(self.expires_at) if self.audio_url else 0)]
+        for name in _STRING_SLOTS:
+            raw = getattr(self, name).encode("utf8")
+            parts.append(_LENGTH.pack(len(raw)))
+            parts.append(raw)
+        return b"".join(parts)
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> "Track":
+        """Inverso de `to_bytes`. Levanta ValueError para dados de outra versão ou corrompidos."""
+        try:
+            version, platform, duration, bitrate, expires_at = _HEADER.unpack_from(data, 0)
+            if version != _FORMAT_VERSION:
+                raise ValueError(f"Versão de Track desconhecida: {version}")
+            offset = _HEADER.size
+            values = {}
+            for name in _STRING_SLOTS:
+                (length,) = _LENGTH.unpack_from(data, offset)
+                offset += _LENGTH.size
+                values[name] = bytes(data[offset:offset + length]).decode("utf8")
+                offset += length
+        except (struct.error, UnicodeDecodeError) as e:
+            raise ValueError(f"Track serializada inválida: {e}") from e
+        track = cls(values["title"], Platform(platform), duration, values["url"], values["thumbnail"],
+                    values["spotify_id"], values["isrc"], values["search_query"])
+        if values["audio_url"]:
+            track.set_stream(values["audio_url"], values["codec"], bitrate, values["source_url"], expires_at)
+        elif values["source_url"]:
+            track.source_url = values["source_url"]
+        return track
@@ -0,0 +1,201 @@
+# File: utils/track_index.py
+from __future__ import annotations
+
+import bisect
+import heapq
+import itertools
+import re
+import unicodedata
+from collections import OrderedDict
+from typing import Optional
+
+from utils.cache import normalize_key
+from utils.settings import get_setting
+from utils.track import Track
+
+# Limites do autocomplete do Discord (nome e valor de cada opção)
+CHOICE_MAX_LENGTH = 100
+
+_WORD = re.compile(r"\w+")
+
+
+def tokenize(text: str) -> list[str]:
+    """Palavras de `text` em minúsculas e sem acentos ("Canção" -> "cancao")."""
+    decomposed = unicodedata.normalize("NFKD", text.lower())
+    return _WORD.findall("".join(ch for ch in decomposed if not unicodedata.combining(ch)))
+
+
+class _Entry:
+    __slots__ = ("track", "tokens", "plays", "guild_plays", "last_used")
+
+    def __init__(self, track: Track, tokens: tuple[str, ...]):
+        self.track = track
+        self.tokens = tokens
+        self.plays = 0
+        self.guild_plays: dict[int, int] = {}
+        self.last_used = 0
+
+
+class TrackIndex:
+    """
+    Índice em memória das faixas já resolvidas, usado no autocomplete do
+    /play.
+
+    Cada palavra do título aponta para as faixas que a contêm (índice
+    invertido); as palavras também ficam em uma lista ordenada, então a
+    busca por prefixo ("never gon") é uma busca binária. As faixas de cada
+    termo da consulta são intersectadas, começando pelo termo mais raro. O
+    resultado é ordenado pelas reproduções na guild (peso `guild_weight`) e
+    no total, e depois pelo uso mais recente. Para a resposta caber com
+    folga na janela do autocomplete mesmo com termos muito comuns, só as
+    `scan_limit` faixas usadas mais recentemente entre as encontradas são
+    ordenadas (as tocadas com frequência estão sempre entre elas).
+
+    O índice guarda no máximo `max_tracks` faixas (só os metadados, sem
+    stream); ao passar disso, sai a usada há mais tempo. O valor de cada
+    opção é o link da faixa, e `get(link)` devolve a faixa indexada para o
+    /play sem passar pela extração.
+    """
+
+    def __init__(self, max_tracks: int = 5000, max_results: int = 25, guild_weight: float = 3.0,
+                 scan_limit: int = 1000):
+        self.max_tracks = max_tracks
+        self.max_results = max_results
+        self.guild_weight = guild_weight
+        self.scan_limit = scan_limit
+        self._entries: OrderedDict[str, _Entry] = OrderedDict()
+        self._postings: dict[str, set[str]] = {}
+        self._tokens: list[str] = []
+        self._clock = itertools.count(1)
+        self.evictions = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    # ------------------------------------------------------------------ #
+    # Inserção
+    # ------------------------------------------------------------------ #
+    def _link_token(self, token: str, key: str):
+        keys = self._postings.get(token)
+        if keys is None:
+            keys = self._postings[token] = set()
+            bisect.insort(self._tokens, token)
+        keys.add(key)
+
+    def _unlink_token(self, token: str, key: str):
+        keys = self._postings.get(token)
+        if keys is None:
+            return
+        keys.discard(key)
+        if not keys:
+            del self._postings[token]
+            del self._tokens[bisect.bisect_left(self._tokens, token)]
+
+    def add(self, track: Track) -> _Entry | None:
+        """Indexa (ou marca como usada) uma faixa resolvida. Faixas sem link são ignoradas."""
+        link = track.link
+        if not link or len(link) > CHOICE_MAX_LENGTH:
+            return None
+        key = normalize_key(link)
+        entry = self._entries.get(key)
+        if entry is None:
+            entry = self._entries[key] = _Entry(track.copy(stream=False), tuple(dict.fromkeys(tokenize(track.title))))
+            for token in entry.tokens:
+                self._link_token(token, key)
+            while len(self._entries) > self.max_tracks:
+                self._evict()
+        else:
+            self._entries.move_to_end(key)
+        entry.last_used = next(self._clock)
+        return entry
+
+    def _evict(self):
+        key, entry = self._entries.popitem(last=False)
+        for token in entry.tokens:
+            self._unlink_token(token, key)
+        self.evictions += 1
+
+    def record_play(self, guild_id: int, track: Track):
+        """Conta uma reprodução da faixa na guild (indexando-a, se preciso)."""
+        entry = self.add(track)
+        if entry is not None:
+            entry.plays += 1
+            entry.guild_plays[guild_id] = entry.guild_plays.get(guild_id, 0) + 1
+
+    # ------------------------------------------------------------------ #
+    # Consulta
+    # ------------------------------------------------------------------ #
+    def get(self, query: str) -> Track | None:
+        """A faixa indexada cujo link é `query` (cópia, sem stream), ou None."""
+        entry = self._entries.get(normalize_key(query))
+        return entry.track.copy() if entry is not None else None
+
+    def _prefix_keys(self, prefix: str) -> set[str]:
+        start = bisect.bisect_left(self._tokens, prefix)
+        # "\uffff" ordena depois de qualquer continuação do prefixo
+        end = bisect.bisect_right(self._tokens, prefix + "\uffff", lo=start)
+        if end - start == 1:
+            return self._postings[self._tokens[start]]
+        keys: set[str] = set()
+        for token in itertools.islice(self._tokens, start, end):
+            keys |= self._postings[token]
+        return keys
+
+    def search(self, query: str, guild_id: int | None = None, limit: int | None = None) -> list[Track]:
+        """As faixas cujas palavras começam pelos termos de `query`, das mais tocadas para as menos."""
+        limit = limit or self.max_results
+        terms = tokenize(query)
+        if not terms:
+            # Sem texto: as mais tocadas entre as usadas recentemente
+            candidates = itertools.islice(reversed(self._entries.values()), self.scan_limit)
+        else:
+            # Interseção dos conjuntos de cada termo, do menor para o maior
+            key_sets = sorted((self._prefix_keys(term) for term in set(terms)), key=len)
+            keys = key_sets[0]
+            for other in key_sets[1:]:
+                if not keys:
+                    break
+                keys = keys & other
+            if len(keys) > self.scan_limit:
+                candidates = itertools.islice(
+                    (entry for key, entry in reversed(self._entries.items()) if key in keys), self.scan_limit)
+            else:
+                candidates = (self._entries[key] for key in keys)
+        weight = self.guild_weight
+        best = heapq.nlargest(limit, candidates, key=lambda entry: (
+            entry.plays + weight * entry.guild_plays.get(guild_id, 0), entry.last_used))
+        return [entry.track for entry in best]
+
+    def suggest(self, query: str, guild_id: int | None = None) -> list[tuple[str, str]]:
+        """Opções do autocomplete: (título com a duração, link da faixa)."""
+        choices = []
+        for track in self.search(query, guild_id):
+            minutes, seconds = divmod(track.duration, 60)
+            suffix = f" ({minutes}:{seconds:02})" if track.duration else ""
+            title = track.title[:CHOICE_MAX_LENGTH - len(suffix)]
+            choices.append((title + suffix, track.link))
+        return choices
+
+    def stats(self) -> dict:
+        return {"tracks": len(self._entries), "tokens": len(self._tokens), "evictions": self.evictions}
+
+
+_index: Optional[TrackIndex] = None
+
+
+def get_track_index() -> TrackIndex | None:
+    """Retorna o índice compartilhado (None com `autocomplete.enabled: false`)."""
+    global _index
+    if _index is None and get_setting("autocomplete.enabled", True):
+        _index = TrackIndex(
+            max_tracks=get_setting("autocomplete.max_tracks", 5000),
+            max_results=get_setting("autocomplete.max_results", 25),
+            guild_weight=get_setting("autocomplete.guild_weight", 3.0),
+        )
+    return _index
+
+
+def set_track_index(index: TrackIndex | None):
+    """Substitui o índice compartilhado (ex.: um novo a cada benchmark)."""
+    global _index
+    _index = index